@@ -0,0 +1,83 @@
+"""Disk cache of intermediate results that are expensive to compute.
+
+Intermediate results, like the time ranges read from input files, can be
+stored below the directory set with the ``cache_dir`` option in the user
+configuration file, so they are reused by later runs. Nothing is stored on
+disk if ``cache_dir`` is not set. When the cache grows larger than
+``cache_dir_size`` GB, the least recently used files are removed.
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Directory of the cache, None if caching on disk is disabled
+CACHE_DIR = None
+# Maximum size (GB) of the cache, None for no limit
+MAX_CACHE_SIZE = None
+
+
+def configure(cache_dir, max_size=None):
+    """Configure the disk cache.
+
+    Parameters
+    ----------
+    cache_dir: str or None
+        Directory of the cache, None to disable caching on disk.
+    max_size: float or None
+        Maximum size (GB) of the cache, None for no limit.
+    """
+    global CACHE_DIR, MAX_CACHE_SIZE
+    CACHE_DIR = cache_dir
+    MAX_CACHE_SIZE = max_size
+
+
+def get_cache_path(*names):
+    """Return the path of an entry in the cache.
+
+    Returns None if caching on disk is disabled.
+    """
+    if CACHE_DIR is None:
+        return None
+    return os.path.join(CACHE_DIR, *names)
+
+
+def touch(path):
+    """Mark the cache entry `path` as recently used."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune():
+    """Remove the least recently used files until the cache is small enough.
+
+    Databases (``.sqlite`` files) are counted, but never removed, because
+    they may be in use.
+    """
+    if CACHE_DIR is None or MAX_CACHE_SIZE is None:
+        return
+    entries = []
+    total = 0
+    for dirname, _, filenames in os.walk(CACHE_DIR):
+        for filename in filenames:
+            path = os.path.join(dirname, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            total += stat.st_size
+            if not filename.endswith('.sqlite'):
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+    excess = total - MAX_CACHE_SIZE * 2**30
+    for _, size, path in sorted(entries):
+        if excess <= 0:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        logger.debug("Removed %s from the cache", path)
+        excess -= size
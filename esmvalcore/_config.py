@@ -7,6 +7,7 @@ from pathlib import Path
 
 import yaml
 
+from . import _cache
 from .cmor.table import CMOR_TABLES, read_cmor_tables
 
 logger = logging.getLogger(__name__)
@@ -80,9 +81,17 @@ def read_config_user_file(config_file, folder_name, options=None):
         'save_intermediary_cubes': False,
         'remove_preproc_dir': True,
         'max_parallel_tasks': None,
+        'max_memory': None,
+        'dask': {},
+        'max_load_workers': None,
         'run_diagnostic': True,
         'profile_diagnostic': False,
         'config_developer_file': None,
+        'data_index': None,
+        'product_cache': None,
+        'product_cache_size': 100,
+        'cache_dir': None,
+        'cache_dir_size': 10,
         'drs': {},
         # DEPRECATED: remove default settings below in v2.4
         'write_plots': True,
@@ -101,6 +110,9 @@ def read_config_user_file(config_file, folder_name, options=None):
 
     cfg['config_developer_file'] = _normalize_path(
         cfg['config_developer_file'])
+    cfg['data_index'] = _normalize_path(cfg['data_index'])
+    cfg['product_cache'] = _normalize_path(cfg['product_cache'])
+    cfg['cache_dir'] = _normalize_path(cfg['cache_dir'])
 
     for key in cfg['rootpath']:
         root = cfg['rootpath'][key]
@@ -120,6 +132,9 @@ def read_config_user_file(config_file, folder_name, options=None):
     cfg['plot_dir'] = os.path.join(cfg['output_dir'], 'plots')
     cfg['run_dir'] = os.path.join(cfg['output_dir'], 'run')
 
+    # Cache intermediate results on disk if configured
+    _cache.configure(cfg['cache_dir'], cfg['cache_dir_size'])
+
     # Read developer configuration file
     load_config_developer(cfg['config_developer_file'])
 
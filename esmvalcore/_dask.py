@@ -0,0 +1,154 @@
+"""Configuration of the dask scheduler used by preprocessing tasks.
+
+The scheduler is configured in the ``dask`` section of the user configuration
+file, e.g.
+
+.. code-block:: yaml
+
+    dask:
+      scheduler: local
+      n_workers: 4
+      threads_per_worker: 2
+
+Possible values for ``scheduler`` are
+
+* ``threads`` (the default) or ``synchronous``: each task uses the dask
+  scheduler of that name in its own process, with at most
+  ``threads_per_worker`` threads;
+* ``local``: start a :class:`dask.distributed.LocalCluster` with
+  ``n_workers`` worker processes with ``threads_per_worker`` threads each,
+  that is shared by all tasks;
+* the address of a running :mod:`dask.distributed` scheduler, e.g.
+  ``tcp://127.0.0.1:8786``, that is shared by all tasks.
+"""
+import contextlib
+import logging
+from functools import partial
+
+import dask
+import dask.array as da
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LOCAL_SCHEDULERS = ('threads', 'synchronous')
+
+
+def _is_distributed(settings):
+    """Check if the settings describe a distributed scheduler."""
+    scheduler = settings.get('scheduler')
+    return scheduler is not None and scheduler not in LOCAL_SCHEDULERS
+
+
+def _import_distributed():
+    """Import :mod:`dask.distributed`, which is an optional dependency."""
+    try:
+        import dask.distributed
+    except ImportError as exc:
+        raise ImportError(
+            "Using a distributed dask scheduler requires the Python package "
+            "'distributed', please install it.") from exc
+    return dask.distributed
+
+
+def get_task_threads(settings):
+    """Return the number of threads a task uses with these settings."""
+    if _is_distributed(settings):
+        # The computations run on the cluster, not in the task process
+        return 1
+    if settings.get('scheduler') == 'synchronous':
+        return 1
+    return settings.get('threads_per_worker') or 1
+
+
+@contextlib.contextmanager
+def start_scheduler(settings):
+    """Start or connect to a distributed scheduler for use by all tasks.
+
+    Yields the address of the scheduler, or `None` if no distributed
+    scheduler is configured.
+    """
+    if not _is_distributed(settings):
+        yield None
+        return
+
+    distributed = _import_distributed()
+    scheduler = settings['scheduler']
+    cluster = None
+    if scheduler == 'local':
+        cluster = distributed.LocalCluster(
+            n_workers=settings.get('n_workers'),
+            threads_per_worker=settings.get('threads_per_worker'),
+        )
+        address = cluster.scheduler_address
+        logger.info("Started dask LocalCluster with dashboard at %s",
+                    cluster.dashboard_link)
+    else:
+        address = scheduler
+    logger.info("Using dask distributed scheduler at %s", address)
+    try:
+        yield address
+    finally:
+        if cluster is not None:
+            cluster.close()
+
+
+@contextlib.contextmanager
+def use_scheduler(settings, address=None):
+    """Use the configured scheduler for dask computations in a task.
+
+    If `address` is given, connect to the distributed scheduler at that
+    address.
+    """
+    if address is not None:
+        distributed = _import_distributed()
+        with distributed.Client(address, set_as_default=True):
+            yield
+    elif settings.get('scheduler', 'threads') in LOCAL_SCHEDULERS:
+        with dask.config.set(scheduler=settings.get('scheduler', 'threads'),
+                             num_workers=settings.get('threads_per_worker')):
+            yield
+    else:
+        yield
+
+
+def get_distributed_client():
+    """Return the distributed client in use, or `None`."""
+    try:
+        from dask.distributed import default_client
+    except ImportError:
+        return None
+    try:
+        return default_client()
+    except ValueError:
+        return None
+
+
+def _fetch_future(future):
+    """Return the result of `future`, computed on the cluster."""
+    return future.result()
+
+
+def fetch_from_cluster(client, data):
+    """Return a lazy array that fetches the chunks of `data` from the cluster.
+
+    The computation of `data` is started on the cluster once, so work that
+    is shared by several chunks is not repeated, and each chunk of the
+    returned array fetches the corresponding chunk of the result from the
+    cluster. This makes it possible to write the result to file chunk by
+    chunk from the local process, because file handles cannot be sent to
+    the cluster.
+    """
+    distributed = _import_distributed()
+    data = client.persist(data)
+    futures = {
+        future.key: future
+        for future in distributed.futures_of(data)
+    }
+    name = 'fetch-' + data.name
+    dsk = {
+        (name, ) + index:
+        (partial(_fetch_future, futures[(data.name, ) + index]), )
+        for index in np.ndindex(data.numblocks)
+    }
+    return da.Array(dsk, name, chunks=data.chunks, meta=data._meta)
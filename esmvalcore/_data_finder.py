@@ -4,26 +4,56 @@
 # Valeriu Predoi (URead, UK - valeriu.predoi@ncas.ac.uk)
 # Mattia Righi (DLR, Germany - mattia.righi@dlr.de)
 
+import atexit
 import fnmatch
 import glob
 import logging
 import os
 import re
+import sqlite3
+from functools import lru_cache
 from pathlib import Path
 
-import iris
+import numpy as np
+from cf_units import Unit
+from netCDF4 import Dataset
 
+from . import _cache
 from ._config import get_project_config
+from ._data_index import DataIndex
 
 logger = logging.getLogger(__name__)
 
 
-def find_files(dirnames, filenames):
-    """Find files matching filenames in dirnames."""
+@lru_cache()
+def _get_data_index(filename):
+    """Open the input data index stored in `filename` for reading.
+
+    Returns None if the index does not exist.
+    """
+    if not os.path.exists(filename):
+        logger.warning(
+            "Input data index %s does not exist, create it using the "
+            "command 'esmvaltool data index'", filename)
+        return None
+    data_index = DataIndex(filename, read_only=True)
+    atexit.register(data_index.close)
+    return data_index
+
+
+def find_files(dirnames, filenames, data_index=None):
+    """Find files matching filenames in dirnames.
+
+    If a :class:`esmvalcore._data_index.DataIndex` is given, directories
+    covered by the index are searched in the index instead of on disk.
+    """
     logger.debug("Looking for files matching %s in %s", filenames, dirnames)
 
     result = []
     for dirname in dirnames:
+        if data_index is not None and data_index.covers(dirname):
+            result.extend(data_index.find_files([dirname], filenames))
+            continue
         for path, _, files in os.walk(dirname, followlinks=True):
             for filename in filenames:
                 matches = fnmatch.filter(files, filename)
@@ -56,17 +86,7 @@ def get_start_end_year(filename):
 
     # As final resort, try to get the dates from the file contents
     if start_year is None or end_year is None:
-        cubes = iris.load(filename)
-
-        for cube in cubes:
-            logger.debug(cube)
-            try:
-                time = cube.coord('time')
-            except iris.exceptions.CoordinateNotFoundError:
-                continue
-            start_year = time.cell(0).point.year
-            end_year = time.cell(-1).point.year
-            break
+        start_year, end_year = _get_time_range_from_file(filename)
 
     if start_year is None or end_year is None:
         raise ValueError(f'File {filename} dates do not match a recognized'
@@ -76,6 +96,86 @@ def get_start_end_year(filename):
     return int(start_year), int(end_year)
 
 
+@lru_cache()
+def _get_time_range_cache(filename):
+    """Open the persistent cache of file time ranges.
+
+    Returns None if the cache is disabled or cannot be used, e.g. because
+    the location is not writable.
+    """
+    if filename is None:
+        return None
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        connection = sqlite3.connect(filename, timeout=60)
+        connection.execute("CREATE TABLE IF NOT EXISTS time_ranges ("
+                           "path TEXT PRIMARY KEY, size INTEGER, "
+                           "mtime_ns INTEGER, start_year INTEGER, "
+                           "end_year INTEGER)")
+    except (OSError, sqlite3.Error) as exc:
+        logger.debug("Not using time range cache %s: %s", filename, exc)
+        return None
+    return connection
+
+
+def _read_time_range(filename):
+    """Read the start and end year from the time variable in a file.
+
+    Only the first and last value of the time variable are read.
+    """
+    with Dataset(filename, 'r') as dataset:
+        for var_name, variable in dataset.variables.items():
+            names = (var_name, getattr(variable, 'standard_name', None),
+                     getattr(variable, 'long_name', None))
+            if ('time' not in names or variable.size == 0
+                    or not hasattr(variable, 'units')):
+                continue
+            if variable.ndim == 0:
+                points = np.ravel(variable[...])
+            else:
+                points = np.ravel(
+                    [np.ravel(variable[0])[0],
+                     np.ravel(variable[-1])[-1]])
+            calendar = getattr(variable, 'calendar', 'standard')
+            dates = Unit(variable.units, calendar=calendar).num2date(points)
+            return dates[0].year, dates[-1].year
+    return None, None
+
+
+def _get_time_range_from_file(filename):
+    """Get the start and end year from the file contents.
+
+    If the disk cache is enabled, the result is stored there, keyed by the
+    path, size and modification time of the file, so each file is only read
+    once.
+    """
+    stat = os.stat(filename)
+    path = os.path.abspath(filename)
+    cache = _get_time_range_cache(
+        _cache.get_cache_path('time_ranges.sqlite'))
+    if cache is not None:
+        row = cache.execute(
+            "SELECT start_year, end_year FROM time_ranges "
+            "WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row is not None:
+            return row
+
+    start_year, end_year = _read_time_range(filename)
+
+    if cache is not None and start_year is not None:
+        try:
+            with cache:
+                cache.execute(
+                    "INSERT OR REPLACE INTO time_ranges "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime_ns, start_year,
+                     end_year))
+        except sqlite3.Error as exc:
+            logger.debug("Unable to update time range cache: %s", exc)
+    return start_year, end_year
+
+
 def select_files(filenames, start_year, end_year):
     """Select files containing data between start_year and end_year.
 
@@ -143,7 +243,7 @@ def _apply_caps(original, lower, upper):
     return original
 
 
-def _resolve_latestversion(dirname_template):
+def _resolve_latestversion(dirname_template, data_index=None):
     """Resolve the 'latestversion' tag.
 
     This implementation avoid globbing on centralized clusters with very
@@ -152,15 +252,21 @@ def _resolve_latestversion(dirname_template):
     if '{latestversion}' not in dirname_template:
         return dirname_template
 
+    if data_index is None:
+        exists, listdir, isdir = os.path.exists, os.listdir, os.path.isdir
+    else:
+        exists = isdir = data_index.isdir
+        listdir = data_index.listdir
+
     # Find latest version
     part1, part2 = dirname_template.split('{latestversion}')
     part2 = part2.lstrip(os.sep)
-    if os.path.exists(part1):
-        versions = os.listdir(part1)
+    if exists(part1):
+        versions = listdir(part1)
         versions.sort(reverse=True)
         for version in ['latest'] + versions:
             dirname = os.path.join(part1, version, part2)
-            if os.path.isdir(dirname):
+            if isdir(dirname):
                 return dirname
 
     return dirname_template
@@ -191,7 +297,7 @@ def get_rootpath(rootpath, project):
     raise KeyError('default rootpath must be specified in config-user file')
 
 
-def _find_input_dirs(variable, rootpath, drs):
+def _find_input_dirs(variable, rootpath, drs, data_index=None):
     """Return a the full paths to input directories."""
     project = variable['project']
 
@@ -202,9 +308,13 @@ def _find_input_dirs(variable, rootpath, drs):
     for dirname_template in _replace_tags(path_template, variable):
         for base_path in root:
             dirname = os.path.join(base_path, dirname_template)
-            dirname = _resolve_latestversion(dirname)
-            matches = glob.glob(dirname)
-            matches = [match for match in matches if os.path.isdir(match)]
+            if data_index is not None and data_index.covers(base_path):
+                dirname = _resolve_latestversion(dirname, data_index)
+                matches = data_index.glob_dirs(dirname)
+            else:
+                dirname = _resolve_latestversion(dirname)
+                matches = glob.glob(dirname)
+                matches = [match for match in matches if os.path.isdir(match)]
             if matches:
                 for match in matches:
                     logger.debug("Found %s", match)
@@ -222,23 +332,31 @@ def _get_filenames_glob(variable, drs):
     return filenames_glob
 
 
-def _find_input_files(variable, rootpath, drs):
+def _find_input_files(variable, rootpath, drs, data_index=None):
     short_name = variable['short_name']
     variable['short_name'] = variable['original_short_name']
-    input_dirs = _find_input_dirs(variable, rootpath, drs)
+    input_dirs = _find_input_dirs(variable, rootpath, drs, data_index)
     filenames_glob = _get_filenames_glob(variable, drs)
-    files = find_files(input_dirs, filenames_glob)
+    files = find_files(input_dirs, filenames_glob, data_index)
     variable['short_name'] = short_name
     return (files, input_dirs, filenames_glob)
 
 
-def get_input_filelist(variable, rootpath, drs):
-    """Return the full path to input files."""
+def get_input_filelist(variable, rootpath, drs, data_index=None):
+    """Return the full path to input files.
+
+    If `data_index` is the path to an input data index created with
+    ``esmvaltool data index``, files below the indexed rootpaths are looked
+    up in the index instead of on disk.
+    """
     # change ensemble to fixed r0i0p0 for fx variables
     # this is needed and is not a duplicate effort
     if variable['project'] == 'CMIP5' and variable['frequency'] == 'fx':
         variable['ensemble'] = 'r0i0p0'
-    (files, dirnames, filenames) = _find_input_files(variable, rootpath, drs)
+    if data_index is not None:
+        data_index = _get_data_index(data_index)
+    (files, dirnames, filenames) = _find_input_files(variable, rootpath, drs,
+                                                     data_index)
     # do time gating only for non-fx variables
     if variable['frequency'] != 'fx':
         files = select_files(files, variable['start_year'],
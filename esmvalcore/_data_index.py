@@ -0,0 +1,239 @@
+"""Persistent index of the input data directories.
+
+Looking for input data with :func:`os.walk` and :func:`glob.glob` requires
+a large number of metadata system calls, which can be very slow on large
+(parallel) file systems. The index stores the directory tree below each
+rootpath in an SQLite database, so the data finder can answer its queries
+without touching the file system.
+
+The index is built and refreshed with the command ``esmvaltool data index``.
+When refreshing, only directories whose modification time changed since
+the previous run are listed again.
+"""
+import fnmatch
+import glob
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+CREATE TABLE IF NOT EXISTS files (
+    directory TEXT,
+    name TEXT,
+    PRIMARY KEY (directory, name)
+);
+"""
+
+
+def _subtree_range(path):
+    """Return the bounds of all paths below `path` in lexical ordering."""
+    # '0' is the character directly following os.sep ('/') in ASCII.
+    return (path + os.sep, path + chr(ord(os.sep) + 1))
+
+
+def _is_loop(dirname, link):
+    """Check if the symbolic link `link` in `dirname` points upwards."""
+    target = os.path.realpath(link)
+    dirname = os.path.realpath(dirname)
+    return dirname == target or dirname.startswith(target + os.sep)
+
+
+class DataIndex:
+    """Index of the directories and files below a number of rootpaths.
+
+    Parameters
+    ----------
+    filename: str
+        Path to the SQLite database storing the index. It is created if it
+        does not exist yet, unless `read_only` is set.
+    read_only: bool
+        Open an existing index for looking up files only.
+    """
+    def __init__(self, filename, read_only=False):
+        self.filename = filename
+        if read_only:
+            uri = f"file:{os.path.abspath(filename)}?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True)
+        else:
+            self._connection = sqlite3.connect(filename)
+            self._connection.executescript(_SCHEMA)
+        self.roots = self._get_roots()
+
+    def __repr__(self):
+        """Return canonical string representation."""
+        return f"{self.__class__.__name__}({self.filename!r})"
+
+    def close(self):
+        """Close the connection to the database."""
+        self._connection.close()
+
+    def _get_roots(self):
+        query = "SELECT path FROM roots"
+        return {row[0] for row in self._connection.execute(query)}
+
+    def covers(self, path):
+        """Check if `path` is located below one of the indexed roots."""
+        path = os.path.normpath(path)
+        return any(path == root or path.startswith(root + os.sep)
+                   for root in self.roots)
+
+    def update(self, root):
+        """Add `root` to the index or refresh the index of `root`.
+
+        Directories are only listed if their modification time changed
+        since the previous update.
+
+        Returns
+        -------
+        int
+            The number of directories that were listed.
+        """
+        root = os.path.normpath(os.path.abspath(root))
+        n_listed = 0
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO roots (path) VALUES (?)", (root, ))
+            self._connection.execute(
+                "INSERT OR IGNORE INTO directories (path, parent) "
+                "VALUES (?, NULL)", (root, ))
+            todo = [root]
+            while todo:
+                dirname = todo.pop()
+                try:
+                    stat = os.stat(dirname)
+                except OSError:
+                    self._remove_tree(dirname)
+                    continue
+                if stat.st_mtime_ns == self._get_mtime(dirname):
+                    todo.extend(self._get_subdirs(dirname))
+                else:
+                    todo.extend(self._list(dirname, stat.st_mtime_ns))
+                    n_listed += 1
+        self.roots.add(root)
+        logger.debug("Listed %s directories while updating index of %s",
+                     n_listed, root)
+        return n_listed
+
+    def _get_mtime(self, dirname):
+        query = "SELECT mtime_ns FROM directories WHERE path = ?"
+        row = self._connection.execute(query, (dirname, )).fetchone()
+        return None if row is None else row[0]
+
+    def _get_subdirs(self, dirname):
+        query = "SELECT path FROM directories WHERE parent = ?"
+        rows = self._connection.execute(query, (dirname, ))
+        return [row[0] for row in rows]
+
+    def _list(self, dirname, mtime_ns):
+        """Store the contents of `dirname` and return its subdirectories."""
+        files = []
+        subdirs = []
+        with os.scandir(dirname) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if not (entry.is_symlink()
+                            and _is_loop(dirname, entry.path)):
+                        subdirs.append(entry.path)
+                else:
+                    files.append(entry.name)
+
+        for subdir in set(self._get_subdirs(dirname)) - set(subdirs):
+            self._remove_tree(subdir)
+        self._connection.execute("DELETE FROM files WHERE directory = ?",
+                                 (dirname, ))
+        self._connection.executemany(
+            "INSERT INTO files (directory, name) VALUES (?, ?)",
+            ((dirname, name) for name in files))
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO directories (path, parent) VALUES (?, ?)",
+            ((subdir, dirname) for subdir in subdirs))
+        self._connection.execute(
+            "UPDATE directories SET mtime_ns = ? WHERE path = ?",
+            (mtime_ns, dirname))
+        return subdirs
+
+    def _remove_tree(self, dirname):
+        """Remove `dirname` and everything below it from the index."""
+        lower, upper = _subtree_range(dirname)
+        self._connection.execute(
+            "DELETE FROM directories "
+            "WHERE path = ? OR (path >= ? AND path < ?)",
+            (dirname, lower, upper))
+        self._connection.execute(
+            "DELETE FROM files "
+            "WHERE directory = ? OR (directory >= ? AND directory < ?)",
+            (dirname, lower, upper))
+
+    def isdir(self, path):
+        """Check if `path` is an indexed directory."""
+        query = "SELECT 1 FROM directories WHERE path = ?"
+        rows = self._connection.execute(query, (os.path.normpath(path), ))
+        return rows.fetchone() is not None
+
+    def listdir(self, path):
+        """Return the names of the directories and files in `path`."""
+        path = os.path.normpath(path)
+        names = [os.path.basename(p) for p in self._get_subdirs(path)]
+        query = "SELECT name FROM files WHERE directory = ?"
+        rows = self._connection.execute(query, (path, ))
+        names.extend(row[0] for row in rows)
+        return names
+
+    def glob_dirs(self, pattern):
+        """Return the indexed directories matching a :mod:`glob` pattern."""
+        # Like glob.glob, keep a trailing separator in the results
+        suffix = os.sep if pattern.endswith(os.sep) else ''
+        pattern = os.path.normpath(pattern)
+        parts = pattern.split(os.sep)
+        prefix = []
+        for part in parts:
+            if glob.has_magic(part):
+                break
+            prefix.append(part)
+        prefix = os.sep.join(prefix)
+        if prefix == pattern:
+            return [pattern + suffix] if self.isdir(pattern) else []
+
+        lower, upper = _subtree_range(prefix)
+        query = "SELECT path FROM directories WHERE path >= ? AND path < ?"
+        matches = []
+        for (path, ) in self._connection.execute(query, (lower, upper)):
+            path_parts = path.split(os.sep)
+            if len(path_parts) == len(parts) and all(
+                    fnmatch.fnmatchcase(name, part)
+                    for name, part in zip(path_parts, parts)):
+                matches.append(path + suffix)
+        return sorted(matches)
+
+    def find_files(self, dirnames, filenames):
+        """Find files matching filenames in dirnames or their subdirectories.
+
+        This is the indexed equivalent of
+        :func:`esmvalcore._data_finder.find_files`.
+        """
+        result = []
+        query = ("SELECT directory, name FROM files WHERE directory = ? "
+                 "OR (directory >= ? AND directory < ?) "
+                 "ORDER BY directory")
+        for dirname in dirnames:
+            dirname = os.path.normpath(dirname)
+            files = {}
+            for path, name in self._connection.execute(
+                    query, (dirname, ) + _subtree_range(dirname)):
+                files.setdefault(path, []).append(name)
+            for path, names in files.items():
+                for filename in filenames:
+                    matches = fnmatch.filter(names, filename)
+                    result.extend(os.path.join(path, f) for f in matches)
+        return result
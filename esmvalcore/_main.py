@@ -267,6 +267,119 @@ class Recipes():
             print(recipe_file.read())
 
 
+class Data():
+    """Manage the index of input data.
+
+    This group contains utilities to speed up finding input data on large
+    file systems. See the ``data_index`` option in the user configuration
+    file.
+    """
+
+    @staticmethod
+    def index(config_file=None):
+        """Create or update the index of the input data.
+
+        The directory trees below all root paths in the user configuration
+        file are stored in the index configured with the ``data_index``
+        option. When updating an existing index, only directories that were
+        modified since the previous run are listed again.
+
+        Parameters
+        ----------
+        config_file: str, optional
+            Configuration file to use. If not provided the file
+            ${HOME}/.esmvaltool/config-user.yml will be used.
+        """
+        from ._config import read_config_user_file
+        from ._data_index import DataIndex
+        from ._logging import configure_logging
+        configure_logging(console_log_level='info')
+        cfg = read_config_user_file(config_file, 'data_index')
+        if cfg['data_index'] is None:
+            raise ValueError(
+                "No 'data_index' specified in the user configuration file")
+
+        roots = sorted({
+            path
+            for paths in cfg['rootpath'].values() for path in paths
+        })
+        data_index = DataIndex(cfg['data_index'])
+        try:
+            for root in roots:
+                logger.info("Indexing %s", root)
+                n_listed = data_index.update(root)
+                logger.info("Listed %s changed directories", n_listed)
+        finally:
+            data_index.close()
+        logger.info("Index %s is up to date", cfg['data_index'])
+
+
+class Cache():
+    """Manage the cache of preprocessed files.
+
+    This group contains utilities to inspect and prune the cache of
+    preprocessed files. See the ``product_cache`` option in the user
+    configuration file.
+    """
+
+    @staticmethod
+    def _open(config_file):
+        from ._config import read_config_user_file
+        from ._logging import configure_logging
+        from ._product_cache import ProductCache
+        configure_logging(console_log_level='info')
+        cfg = read_config_user_file(config_file, 'product_cache')
+        if cfg['product_cache'] is None:
+            raise ValueError(
+                "No 'product_cache' specified in the user configuration file")
+        return ProductCache(cfg['product_cache'])
+
+    @classmethod
+    def list(cls, config_file=None):
+        """List the cached files, least recently used first.
+
+        Parameters
+        ----------
+        config_file: str, optional
+            Configuration file to use. If not provided the file
+            ${HOME}/.esmvaltool/config-user.yml will be used.
+        """
+        import datetime
+
+        cache = cls._open(config_file)
+        try:
+            entries = cache.entries()
+            for key, name, size, last_used in entries:
+                last_used = datetime.datetime.fromtimestamp(last_used)
+                print(f"{last_used:%Y-%m-%d %H:%M:%S} {size / 2**20:10.1f} MB "
+                      f"{key[:12]} {name}")
+            print(f"{len(entries)} files, {cache.size() / 2**30:.2f} GB in "
+                  f"{cache.dirname}")
+        finally:
+            cache.close()
+
+    @classmethod
+    def prune(cls, max_size=0., config_file=None):
+        """Remove the least recently used files from the cache.
+
+        Parameters
+        ----------
+        max_size: float, optional
+            Size (GB) of the cache after pruning. By default, all files are
+            removed.
+        config_file: str, optional
+            Configuration file to use. If not provided the file
+            ${HOME}/.esmvaltool/config-user.yml will be used.
+        """
+        cache = cls._open(config_file)
+        try:
+            n_removed = cache.prune(max_size)
+            logger.info("Removed %s files, the cache %s now uses %.2f GB",
+                        n_removed, cache.dirname, cache.size() / 2**30)
+        finally:
+            cache.close()
+
+
 class ESMValTool():
     """A community tool for routine evaluation of Earth system models.
 
@@ -285,6 +398,8 @@ class ESMValTool():
     def __init__(self):
         self.recipes = Recipes()
         self.config = Config()
+        self.data = Data()
+        self.cache = Cache()
         self._extra_packages = {}
         for entry_point in iter_entry_points('esmvaltool_commands'):
             self._extra_packages[entry_point.dist.project_name] = \
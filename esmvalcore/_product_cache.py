@@ -0,0 +1,299 @@
+"""Persistent cache of preprocessed files.
+
+When a recipe is run again with the same input data and preprocessor
+settings, the preprocessed files of the previous run can be reused instead
+of computing them again. The cache is enabled with the ``product_cache``
+option in the user configuration file and is inspected and pruned with the
+command ``esmvaltool cache``.
+
+Every preprocessed file is stored under a key that is a hash of
+
+* the path, size and modification time of the input files, or the key of
+  the input file if it is itself a preprocessed file (e.g. the input
+  variables of a derived variable);
+* the preprocessor settings, except for the output paths, with the size and
+  modification time of the files they refer to, like fx files, shapefiles
+  and target grids;
+* the source code of the fixes applied to the data;
+* the version of ESMValCore.
+
+The least recently used files are removed when the cache grows larger than
+``product_cache_size`` GB.
+"""
+import enum
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+
+from ._version import __version__
+from .cmor._fixes.fix import Fix
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    size INTEGER,
+    last_used REAL
+);
+"""
+
+# Preprocessor settings that do not affect the content of the output file
+_IGNORED_SETTINGS = {
+    'fix_file': ('output_dir', ),
+    'save': ('filename', ),
+}
+_IGNORED_STEPS = ('cleanup', )
+_FIX_STEPS = ('fix_file', 'fix_metadata', 'fix_data')
+
+
+def _encode(value):
+    """Encode objects that are not supported by :func:`json.dumps`."""
+    if isinstance(value, enum.Enum):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if callable(value) and hasattr(value, '__qualname__'):
+        return f"{value.__module__}.{value.__qualname__}"
+    return repr(value)
+
+
+def _describe_files(value):
+    """Add the size and modification time to the files in `value`.
+
+    Files are used by some settings, e.g. fx files, shapefiles or target
+    grids, and a file that changes must change the key as well.
+    """
+    if isinstance(value, dict):
+        return {key: _describe_files(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_describe_files(item) for item in value]
+    if isinstance(value, str) and os.path.isfile(value):
+        stat = os.stat(value)
+        return [os.path.realpath(value), stat.st_size, stat.st_mtime_ns]
+    return value
+
+
+def _get_settings(product):
+    """Return the preprocessor settings that determine the output file."""
+    settings = {}
+    for step, kwargs in product.settings.items():
+        if step in _IGNORED_STEPS:
+            continue
+        ignored = _IGNORED_SETTINGS.get(step, ())
+        settings[step] = {
+            key: value
+            for key, value in kwargs.items() if key not in ignored
+        }
+    return settings
+
+
+def _get_fix_sources(settings):
+    """Return the source code files of the fixes used by the settings."""
+    sources = set()
+    for step in _FIX_STEPS:
+        if step not in settings:
+            continue
+        kwargs = settings[step]
+        fixes = Fix.get_fixes(kwargs['project'], kwargs['dataset'],
+                              kwargs['mip'], kwargs['short_name'])
+        for fix in fixes:
+            for cls in type(fix).__mro__:
+                if cls.__module__.startswith('esmvalcore.cmor._fixes.'):
+                    sources.add(inspect.getsourcefile(cls))
+    return sorted(sources)
+
+
+def get_product_key(product):
+    """Compute the cache key of a preprocessor output file.
+
+    Parameters
+    ----------
+    product: esmvalcore.preprocessor.PreprocessorFile
+        The output file.
+
+    Returns
+    -------
+    str or None
+        The key, or `None` if the file cannot be cached because one of the
+        input files does not exist (yet).
+    """
+    inputs = []
+    for ancestor in product._ancestors:
+        if hasattr(ancestor, 'settings'):
+            key = get_product_key(ancestor)
+        elif os.path.isfile(ancestor.filename):
+            stat = os.stat(ancestor.filename)
+            key = (os.path.realpath(ancestor.filename), stat.st_size,
+                   stat.st_mtime_ns)
+        else:
+            key = None
+        if key is None:
+            return None
+        inputs.append(key)
+
+    settings = _get_settings(product)
+    fixes = []
+    for filename in _get_fix_sources(settings):
+        with open(filename, 'rb') as file:
+            fixes.append(hashlib.sha256(file.read()).hexdigest())
+
+    description = json.dumps(
+        {
+            'version': __version__,
+            'inputs': inputs,
+            'settings': _describe_files(settings),
+            'fixes': fixes,
+        },
+        sort_keys=True,
+        default=_encode,
+    )
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+class ProductCache:
+    """Cache of preprocessed files.
+
+    Parameters
+    ----------
+    dirname: str
+        Directory where the cached files are stored. It is created if it
+        does not exist yet.
+    max_size: float, optional
+        Maximum size (GB) of the cache. If the cache grows larger, the least
+        recently used files are removed.
+    """
+    def __init__(self, dirname, max_size=None):
+        self.dirname = dirname
+        self.max_size = max_size
+        os.makedirs(dirname, exist_ok=True)
+        filename = os.path.join(dirname, 'products.sqlite')
+        self._connection = sqlite3.connect(filename, timeout=60)
+        self._connection.executescript(_SCHEMA)
+
+    def __repr__(self):
+        """Return canonical string representation."""
+        return f"{self.__class__.__name__}({self.dirname!r})"
+
+    def close(self):
+        """Close the connection to the database."""
+        self._connection.close()
+
+    def _get_path(self, key, name):
+        extension = os.path.splitext(name)[1]
+        return os.path.join(self.dirname, key[:2], key + extension)
+
+    def restore(self, key, filename):
+        """Create `filename` as a copy of the cached file with `key`.
+
+        Returns
+        -------
+        bool
+            `True` if the file was found in the cache, `False` otherwise.
+        """
+        query = "SELECT name FROM products WHERE key = ?"
+        row = self._connection.execute(query, (key, )).fetchone()
+        if row is None:
+            return False
+        path = self._get_path(key, row[0])
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        try:
+            _copy(path, filename)
+        except OSError as exc:
+            logger.debug("Unable to restore %s from cache: %s", filename,
+                         exc)
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM products WHERE key = ?", (key, ))
+            return False
+        with self._connection:
+            self._connection.execute(
+                "UPDATE products SET last_used = ? WHERE key = ?",
+                (time.time(), key))
+        return True
+
+    def store(self, key, filename):
+        """Add `filename` to the cache under `key`."""
+        name = os.path.basename(filename)
+        path = self._get_path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Add the file under a temporary name first, so other processes
+        # never use an incomplete file
+        tmp_file = f'{path}.{os.getpid()}.tmp'
+        _copy(filename, tmp_file)
+        os.replace(tmp_file, path)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO products (key, name, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, name, os.path.getsize(path), time.time()))
+        if self.max_size is not None:
+            self.prune(self.max_size)
+
+    def entries(self):
+        """Return the cached files, least recently used first.
+
+        Returns
+        -------
+        list of tuple
+            The key, original file name, size (bytes) and time of last use
+            (seconds since the epoch) of each cached file.
+        """
+        query = ("SELECT key, name, size, last_used FROM products "
+                 "ORDER BY last_used")
+        return self._connection.execute(query).fetchall()
+
+    def size(self):
+        """Return the total size (bytes) of the cached files."""
+        query = "SELECT TOTAL(size) FROM products"
+        return int(self._connection.execute(query).fetchone()[0])
+
+    def prune(self, max_size=0.):
+        """Remove the least recently used files until the cache is small.
+
+        Parameters
+        ----------
+        max_size: float
+            Maximum size (GB) of the cache after pruning.
+
+        Returns
+        -------
+        int
+            The number of removed files.
+        """
+        excess = self.size() - max_size * 2**30
+        removed = []
+        for key, name, size, _ in self.entries():
+            if excess <= 0:
+                break
+            try:
+                os.remove(self._get_path(key, name))
+            except FileNotFoundError:
+                pass
+            removed.append(key)
+            excess -= size
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM products WHERE key = ?",
+                ((key, ) for key in removed))
+        if removed:
+            logger.debug("Removed %s files from cache %s", len(removed),
+                         self.dirname)
+        return len(removed)
+
+
+def _copy(source, target):
+    """Create `target` as a copy of `source`.
+
+    The file is copied rather than hard linked, so modifying the
+    preprocessed file can never change the cached file or vice versa.
+    """
+    if os.path.lexists(target):
+        os.remove(target)
+    shutil.copy2(source, target)
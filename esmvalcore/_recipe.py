@@ -25,7 +25,7 @@ from ._data_finder import (
 )
 from ._provenance import TrackedFile, get_recipe_provenance
 from ._recipe_checks import RecipeError
-from ._task import DiagnosticTask, TaskSet
+from ._task import DiagnosticTask, TaskSet, get_memory_record
 from .cmor.check import CheckLevels
 from .cmor.table import CMOR_TABLES
 from .preprocessor import (
@@ -489,7 +489,8 @@ def _get_input_files(variable, config_user):
     (input_files, dirnames,
      filenames) = get_input_filelist(variable=variable,
                                      rootpath=config_user['rootpath'],
-                                     drs=config_user['drs'])
+                                     drs=config_user['drs'],
+                                     data_index=config_user.get('data_index'))
 
     # Set up downloading using synda if requested.
     # Do not download if files are already available locally.
@@ -700,6 +701,7 @@ def _get_preprocessor_products(variables, profile, order, ancestor_products,
             attributes=variable,
             settings=settings,
             ancestors=ancestors,
+            max_load_workers=config_user.get('max_load_workers'),
         )
         products.add(product)
 
@@ -770,6 +772,9 @@ def _get_single_preprocessor_task(variables,
         order=order,
         debug=config_user['save_intermediary_cubes'],
         write_ncl_interface=config_user['write_ncl_interface'],
+        dask=config_user.get('dask'),
+        product_cache=config_user.get('product_cache'),
+        product_cache_size=config_user.get('product_cache_size'),
     )
 
     logger.info("PreprocessingTask %s created. It will create the files:\n%s",
@@ -919,6 +924,7 @@ class Recipe:
         self._cfg = deepcopy(config_user)
         self._cfg['write_ncl_interface'] = self._need_ncl(
             raw_recipe['diagnostics'])
+        self._recipe_file = recipe_file
         self._filename = os.path.basename(recipe_file)
         self._preprocessors = raw_recipe.get('preprocessors', {})
         if 'default' not in self._preprocessors:
@@ -1368,7 +1374,16 @@ class Recipe:
         if not self.tasks:
             raise RecipeError('No tasks to run!')
 
-        self.tasks.run(max_parallel_tasks=self._cfg['max_parallel_tasks'])
+        max_memory = self._cfg.get('max_memory')
+        memory_record = None
+        if max_memory is not None:
+            memory_record = get_memory_record(self._recipe_file)
+            self.tasks.estimate_memory(memory_record)
+        self.tasks.run(max_parallel_tasks=self._cfg['max_parallel_tasks'],
+                       max_memory=max_memory,
+                       dask_settings=self._cfg.get('dask'))
+        if memory_record is not None:
+            self.tasks.save_memory_record(memory_record)
 
     def get_product_output(self) -> dict:
         """Return the paths to the output plots and data.
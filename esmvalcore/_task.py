@@ -2,15 +2,20 @@
 import abc
 import contextlib
 import datetime
+import hashlib
+import heapq
+import itertools
 import logging
 import numbers
 import os
 import pprint
+import queue
 import subprocess
 import sys
 import threading
 import time
 from copy import deepcopy
+from functools import partial
 from multiprocessing import Pool
 from pathlib import Path, PosixPath
 from shutil import which
@@ -18,8 +23,10 @@ from shutil import which
 import psutil
 import yaml
 
+from . import _cache
 from ._citation import _write_citation_files
 from ._config import DIAGNOSTICS_PATH, TAGS, replace_tags
+from ._dask import start_scheduler
 from ._provenance import TrackedFile, get_task_provenance
 
 
@@ -38,6 +45,19 @@ DATASET_KEYS = {
 }
 
 
+def get_memory_record(recipe_file):
+    """Return the file recording the peak memory use of a recipe's tasks.
+
+    The file is named after the recipe and a hash of its absolute path, so
+    different recipes with the same name do not share it. Returns None if
+    caching on disk is disabled.
+    """
+    recipe_file = os.path.abspath(recipe_file)
+    name = os.path.splitext(os.path.basename(recipe_file))[0]
+    key = hashlib.sha256(recipe_file.encode()).hexdigest()[:16]
+    return _cache.get_cache_path('task_memory', f'{name}_{key}.yml')
+
+
 def _get_resource_usage(process, start_time, children=True):
     """Get resource usage."""
     # yield header first
@@ -137,6 +157,38 @@ def resource_usage_logger(pid, filename, interval=1, children=True):
         thread.join()
 
 
+@contextlib.contextmanager
+def peak_memory_monitor(interval=0.1, children=True):
+    """Measure the peak memory use (GB) of this process.
+
+    The memory used when entering the context is subtracted, so memory
+    that is still held by a worker process from earlier tasks is not
+    counted.
+    """
+    halt = threading.Event()
+    usage = {'memory': 0.}
+    process = psutil.Process(os.getpid())
+    # Skip the header
+    samples = itertools.islice(
+        _get_resource_usage(process, time.time(), children), 1, None)
+    _, start_mem = next(samples)
+
+    def _monitor():
+        for _, max_mem in samples:
+            usage['memory'] = max(max_mem - start_mem, 0.)
+            if halt.is_set():
+                return
+            halt.wait(interval)
+
+    thread = threading.Thread(target=_monitor, daemon=True)
+    thread.start()
+    try:
+        yield usage
+    finally:
+        halt.set()
+        thread.join()
+
+
 def _py2ncl(value, var_name=''):
     """Format a structure of Python list/dict/etc items as NCL."""
     txt = var_name + ' = ' if var_name else ''
@@ -220,6 +272,13 @@ class BaseTask:
         self.name = name
         self.activity = None
         self.priority = 0
+        # Resource hints used to decide which tasks can run at the same time
+        self.threads = 1
+        self.memory = 0.
+        self.monitor_memory = False
+        self.peak_memory = None
+        # Address of the distributed dask scheduler, set when running
+        self.scheduler_address = None
 
     def initialize_provenance(self, recipe_entity):
         """Initialize task provenance activity."""
@@ -246,7 +305,14 @@ class BaseTask:
             logger.info("Starting task %s in process [%s]", self.name,
                         os.getpid())
             start = datetime.datetime.now()
-            self.output_files = self._run(input_files)
+            if self.monitor_memory:
+                with peak_memory_monitor() as usage:
+                    self.output_files = self._run(input_files)
+                self.peak_memory = usage['memory']
+                logger.debug("Task %s used at most %.1f GB of memory",
+                             self.name, self.peak_memory)
+            else:
+                self.output_files = self._run(input_files)
             runtime = datetime.datetime.now() - start
             logger.info("Successfully completed task %s (priority %s) in %s",
                         self.name, self.priority, runtime)
@@ -257,6 +323,10 @@ class BaseTask:
     def _run(self, input_files):
         """Run task."""
 
+    def estimate_memory(self) -> float:
+        """Estimate the peak memory use (GB) of the task."""
+        return 0.
+
     def get_product_attributes(self) -> dict:
         """Return a mapping of product attributes."""
         return {
@@ -663,35 +733,106 @@ class TaskSet(set):
                 independent_tasks.add(task)
         return independent_tasks
 
-    def run(self, max_parallel_tasks: int = None) -> None:
+    def estimate_memory(self, memory_record: str = None) -> None:
+        """Set the memory hint of all tasks.
+
+        Parameters
+        ----------
+        memory_record : str
+            File with the peak memory use of tasks recorded in a previous
+            run, see :meth:`save_memory_record`. The recorded peak is used
+            for tasks that are listed there, other tasks are estimated.
+        """
+        recorded = {}
+        if memory_record is not None and os.path.exists(memory_record):
+            with open(memory_record, 'r') as file:
+                recorded = yaml.safe_load(file) or {}
+            _cache.touch(memory_record)
+        for task in self.flatten():
+            if task.name in recorded:
+                task.memory = recorded[task.name]
+            else:
+                task.memory = task.estimate_memory()
+            logger.debug("Estimated memory use of task %s is %.1f GB",
+                         task.name, task.memory)
+
+    def save_memory_record(self, memory_record: str) -> None:
+        """Save the peak memory use of all tasks that were run."""
+        recorded = {
+            task.name: round(task.peak_memory, 3)
+            for task in self.flatten() if task.peak_memory is not None
+        }
+        try:
+            os.makedirs(os.path.dirname(memory_record), exist_ok=True)
+            with open(memory_record, 'w') as file:
+                yaml.safe_dump(recorded, file)
+        except OSError as exc:
+            logger.debug("Unable to save memory use of tasks to %s: %s",
+                         memory_record, exc)
+        else:
+            _cache.prune()
+
+    def run(self,
+            max_parallel_tasks: int = None,
+            max_memory: float = None,
+            dask_settings: dict = None) -> None:
         """Run tasks.
 
         Parameters
         ----------
         max_parallel_tasks : int
             Number of processes to run. If `1`, run the tasks sequentially.
+        max_memory : float
+            Maximum amount of memory (GB) that the running tasks are
+            estimated to use at the same time. If `None`, memory use is not
+            limited and the peak memory use of the tasks is not measured.
+        dask_settings : dict
+            The ``dask`` section of the user configuration. If it configures
+            a distributed scheduler, it is started or connected to for the
+            time the tasks run, see :func:`esmvalcore._dask.start_scheduler`.
         """
+        for task in self.flatten():
+            task.monitor_memory = max_memory is not None
         if max_parallel_tasks == 1:
-            self._run_sequential()
+            self._run_sequential(dask_settings)
         else:
-            self._run_parallel(max_parallel_tasks)
+            self._run_parallel(max_parallel_tasks, max_memory, dask_settings)
 
-    def _run_sequential(self) -> None:
+    def _set_scheduler_address(self, address: str) -> None:
+        """Set the address of the distributed scheduler of all tasks."""
+        for task in self.flatten():
+            task.scheduler_address = address
+
+    def _run_sequential(self, dask_settings: dict = None) -> None:
         """Run tasks sequentially."""
         n_tasks = len(self.flatten())
         logger.info("Running %s tasks sequentially", n_tasks)
 
         tasks = self.get_independent()
-        for task in sorted(tasks, key=lambda t: t.priority):
-            task.run()
-
-    def _run_parallel(self, max_parallel_tasks: int = None) -> None:
-        """Run tasks in parallel."""
-        scheduled = self.flatten()
-        running = {}
-
-        n_tasks = n_scheduled = len(scheduled)
-        n_running = 0
+        with start_scheduler(dask_settings or {}) as address:
+            self._set_scheduler_address(address)
+            for task in sorted(tasks, key=lambda t: t.priority):
+                task.run()
+
+    def _run_parallel(self,
+                      max_parallel_tasks: int = None,
+                      max_memory: float = None,
+                      dask_settings: dict = None) -> None:
+        """Run tasks in parallel.
+
+        A task becomes ready when all its ancestors have completed. Ready
+        tasks are started in order of priority, as long as their resource
+        hints (threads and memory) fit in the available resources. Tasks
+        that do not fit are skipped in favour of tasks that do, so no
+        process is left idle while a ready task fits. A task that does not
+        fit in the memory budget on its own is started when no other tasks
+        are running.
+
+        A distributed scheduler is only started after the worker processes,
+        so they are not forked from a process with a running cluster.
+        """
+        tasks = self.flatten()
+        n_tasks = len(tasks)
 
         if max_parallel_tasks is None:
             max_parallel_tasks = os.cpu_count()
@@ -699,48 +840,92 @@ class TaskSet(set):
         logger.info("Running %s tasks using %s processes", n_tasks,
                     max_parallel_tasks)
 
-        def done(task):
-            """Assume a task is done if it not scheduled or running."""
-            return not (task in scheduled or task in running)
-
-        with Pool(processes=max_parallel_tasks) as pool:
-            while scheduled or running:
-                # Submit new tasks to pool
-                for task in sorted(scheduled, key=lambda t: t.priority):
-                    if len(running) >= max_parallel_tasks:
-                        break
-                    if all(done(t) for t in task.ancestors):
-                        future = pool.apply_async(_run_task, [task])
-                        running[task] = future
-                        scheduled.remove(task)
-
-                # Handle completed tasks
-                ready = {t for t in running if running[t].ready()}
-                for task in ready:
-                    _copy_results(task, running[task])
-                    running.pop(task)
-
-                # Wait if there are still tasks running
-                if running:
-                    time.sleep(0.1)
-
-                # Log progress message
-                if len(scheduled) != n_scheduled or len(running) != n_running:
-                    n_scheduled, n_running = len(scheduled), len(running)
-                    n_done = n_tasks - n_scheduled - n_running
-                    logger.info(
-                        "Progress: %s tasks running, %s tasks waiting for "
-                        "ancestors, %s/%s done", n_running, n_scheduled,
-                        n_done, n_tasks)
+        # Index the task graph
+        n_waiting_for = {task: len(set(task.ancestors)) for task in tasks}
+        dependents = {task: [] for task in tasks}
+        for task in tasks:
+            for ancestor in set(task.ancestors):
+                dependents[ancestor].append(task)
+
+        ready = []
+        counter = itertools.count()
+
+        def make_ready(task):
+            heapq.heappush(ready, (task.priority, next(counter), task))
+
+        for task in tasks:
+            if not n_waiting_for[task]:
+                make_ready(task)
+
+        def fits(task):
+            """Check if task fits in the resources left by running tasks."""
+            if not running:
+                return True
+            threads = task.threads + sum(t.threads for t in running)
+            if threads > max_parallel_tasks:
+                return False
+            if max_memory is None:
+                return True
+            memory = task.memory + sum(t.memory for t in running)
+            return memory <= max_memory
+
+        running = set()
+        completed = queue.SimpleQueue()
+        n_done = 0
+
+        with Pool(processes=max_parallel_tasks) as pool, \
+                start_scheduler(dask_settings or {}) as address:
+            self._set_scheduler_address(address)
+            while n_done < n_tasks:
+                # Submit ready tasks that fit to the pool
+                skipped = []
+                while ready and len(running) < max_parallel_tasks:
+                    item = heapq.heappop(ready)
+                    task = item[-1]
+                    if not fits(task):
+                        skipped.append(item)
+                        continue
+                    pool.apply_async(
+                        _run_task,
+                        [task],
+                        callback=partial(_put_result, completed, task),
+                        error_callback=partial(_put_result, completed, task),
+                    )
+                    running.add(task)
+                for item in skipped:
+                    heapq.heappush(ready, item)
+
+                # Wait for a task to complete
+                task, result = completed.get()
+                running.remove(task)
+                if isinstance(result, BaseException):
+                    raise result
+                _copy_results(task, result)
+                n_done += 1
+                for dependent in dependents[task]:
+                    n_waiting_for[dependent] -= 1
+                    if not n_waiting_for[dependent]:
+                        make_ready(dependent)
+
+                logger.info(
+                    "Progress: %s tasks running, %s tasks waiting for "
+                    "ancestors, %s/%s done", len(running),
+                    n_tasks - n_done - len(running) - len(ready), n_done,
+                    n_tasks)
 
             logger.info("Successfully completed all tasks.")
             pool.close()
             pool.join()
 
 
-def _copy_results(task, future):
+def _put_result(completed, task, result):
+    """Report the result of a task that completed in the pool."""
+    completed.put((task, result))
+
+
+def _copy_results(task, result):
     """Update task with the results from the remote process."""
-    task.output_files, updated_products = future.get()
+    task.output_files, updated_products, task.peak_memory = result
     for updated in updated_products:
         for original in task.products:
             if original.filename == updated.filename:
@@ -753,4 +938,4 @@ def _copy_results(task, future):
 def _run_task(task):
     """Run task and return the result."""
     output_files = task.run()
-    return output_files, task.products
+    return output_files, task.products, task.peak_memory
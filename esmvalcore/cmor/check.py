@@ -3,12 +3,15 @@ import logging
 from enum import IntEnum
 
 import cf_units
+import dask
+import dask.array as da
 import iris.coord_categorisation
 import iris.coords
 import iris.exceptions
 import iris.util
 import numpy as np
 
+from ..iris_helpers import date_components
 from .table import CMOR_TABLES
 
 CheckLevels = IntEnum(
@@ -29,6 +32,37 @@ class CMORCheckError(Exception):
     """Exception raised when a cube does not pass the CMORCheck."""
 
 
+def _get_min_max(array):
+    """Compute the minimum and maximum of an array in a single pass.
+
+    Lazy arrays are reduced chunk by chunk, without realizing them.
+    """
+    if isinstance(array, da.Array):
+        return dask.compute(da.nanmin(array), da.nanmax(array))
+    return np.nanmin(array), np.nanmax(array)
+
+
+def _is_monotonic(coord):
+    """Check if a coordinate is strictly monotonic, without realizing it."""
+    if not (coord.has_lazy_points() or coord.has_lazy_bounds()):
+        return coord.is_monotonic()
+    arrays = [coord.core_points()]
+    if coord.has_bounds():
+        bounds = coord.core_bounds()
+        arrays.extend(bounds[..., i] for i in range(coord.nbounds))
+    checks = []
+    for array in arrays:
+        diff = da.diff(da.asarray(array))
+        checks.append(da.all(diff > 0) | da.all(diff < 0))
+    return all(dask.compute(*checks))
+
+
+def _get_years_and_months(coord):
+    """Get the year and month of the points of a time coordinate."""
+    components = date_components(coord.units, coord.points)
+    return components[..., 0], components[..., 1]
+
+
 class CMORCheck():
     """Class used to check the CMOR-compliance of the data.
 
@@ -522,20 +556,21 @@ class CMORCheck():
             return
         if coord.dtype.kind == 'U':
             return
-        if not coord.is_monotonic():
+        if not _is_monotonic(coord):
             self.report_critical(self._is_msg, var_name, 'monotonic')
-        if len(coord.points) == 1:
+        if coord.shape[0] == 1:
             return
         if cmor.stored_direction:
+            first, second = np.asarray(coord.core_points()[:2])
             if cmor.stored_direction == 'increasing':
-                if coord.points[0] > coord.points[1]:
+                if first > second:
                     if not self.automatic_fixes or coord.ndim > 1:
                         self.report_critical(
                             self._is_msg, var_name, 'increasing')
                     else:
                         self._reverse_coord(coord)
             elif cmor.stored_direction == 'decreasing':
-                if coord.points[0] < coord.points[1]:
+                if first < second:
                     if not self.automatic_fixes or coord.ndim > 1:
                         self.report_critical(
                             self._is_msg, var_name, 'decreasing')
@@ -556,13 +591,16 @@ class CMORCheck():
         l_fix_coord_value = False
 
         # Check coordinate value ranges
+        if coord_info.valid_min or coord_info.valid_max:
+            points_min, points_max = _get_min_max(coord.core_points())
+
         if coord_info.valid_min:
             valid_min = float(coord_info.valid_min)
-            if np.any(coord.points < valid_min):
+            if points_min < valid_min:
                 if coord_info.standard_name == 'longitude' and \
                         self.automatic_fixes:
                     l_fix_coord_value = self._check_longitude_min(
-                        coord, var_name)
+                        points_min, var_name)
                 else:
                     self.report_critical(
                         self._vals_msg, var_name,
@@ -570,11 +608,11 @@ class CMORCheck():
 
         if coord_info.valid_max:
             valid_max = float(coord_info.valid_max)
-            if np.any(coord.points > valid_max):
+            if points_max > valid_max:
                 if coord_info.standard_name == 'longitude' and \
                         self.automatic_fixes:
                     l_fix_coord_value = self._check_longitude_max(
-                        coord, var_name)
+                        points_max, var_name)
                 else:
                     self.report_critical(
                         self._vals_msg, var_name,
@@ -598,16 +636,16 @@ class CMORCheck():
                 self._cube.remove_coord(coord)
                 self._cube.add_aux_coord(new_coord, dims)
 
-    def _check_longitude_max(self, coord, var_name):
-        if np.any(coord.points > 720):
+    def _check_longitude_max(self, points_max, var_name):
+        if points_max > 720:
             self.report_critical(
                 f'{var_name} longitude coordinate has values > 720 degrees'
             )
             return False
         return True
 
-    def _check_longitude_min(self, coord, var_name):
-        if np.any(coord.points < -360):
+    def _check_longitude_min(self, points_min, var_name):
+        if points_min < -360:
             self.report_critical(
                 f'{var_name} longitude coordinate has values < -360 degrees'
             )
@@ -628,7 +666,7 @@ class CMORCheck():
                 cmor_points = [float(val) for val in coord_info.requested]
             except ValueError:
                 cmor_points = coord_info.requested
-            coord_points = list(coord.points)
+            coord_points = set(coord.points.tolist())
             for point in cmor_points:
                 if point not in coord_points:
                     self.report_warning(self._contain_msg, var_name,
@@ -696,28 +734,15 @@ class CMORCheck():
         if freq.lower().endswith('pt'):
             freq = freq[:-2]
         if freq in ['mon', 'mo']:
-            for i in range(len(coord.points) - 1):
-                first = coord.cell(i).point
-                second = coord.cell(i + 1).point
-                second_month = first.month + 1
-                second_year = first.year
-                if second_month == 13:
-                    second_month = 1
-                    second_year += 1
-                if second_month != second.month or \
-                   second_year != second.year:
-                    msg = '{}: Frequency {} does not match input data'
-                    self.report_error(msg, var_name, freq)
-                    break
+            years, months = _get_years_and_months(coord)
+            if np.any(np.diff(12 * years + months) != 1):
+                msg = '{}: Frequency {} does not match input data'
+                self.report_error(msg, var_name, freq)
         elif freq == 'yr':
-            for i in range(len(coord.points) - 1):
-                first = coord.cell(i).point
-                second = coord.cell(i + 1).point
-                second_month = first.month + 1
-                if first.year + 1 != second.year:
-                    msg = '{}: Frequency {} does not match input data'
-                    self.report_error(msg, var_name, freq)
-                    break
+            years, _ = _get_years_and_months(coord)
+            if np.any(np.diff(years) != 1):
+                msg = '{}: Frequency {} does not match input data'
+                self.report_error(msg, var_name, freq)
         else:
             if freq in intervals:
                 interval = intervals[freq]
@@ -734,13 +759,11 @@ class CMORCheck():
                 msg = '{}: Frequency {} not supported by checker'
                 self.report_error(msg, var_name, freq)
                 return
-            for i in range(len(coord.points) - 1):
-                interval = coord.points[i + 1] - coord.points[i]
-                if (interval < target_interval[0]
-                        or interval > target_interval[1]):
-                    msg = '{}: Frequency {} does not match input data'
-                    self.report_error(msg, var_name, freq)
-                    break
+            steps = np.diff(coord.points)
+            if np.any((steps < target_interval[0])
+                      | (steps > target_interval[1])):
+                msg = '{}: Frequency {} does not match input data'
+                self.report_error(msg, var_name, freq)
 
         # remove time_origin from attributes
         coord.attributes.pop('time_origin', None)
@@ -7,18 +7,65 @@ available for the other components of ESMValTool
 import copy
 import errno
 import glob
+import hashlib
 import json
 import logging
 import os
-from functools import total_ordering
+import pickle
+import tempfile
+import threading
+from functools import partial, total_ordering
 from collections import Counter
 from pathlib import Path
 
 import yaml
 
+from .. import _cache
+from .._version import __version__
+
 logger = logging.getLogger(__name__)
 
-CMOR_TABLES = {}
+
+class _CMORTables(dict):
+    """Dictionary of CMOR info objects that are read on first access.
+
+    The values are stored as a :class:`functools.partial` that reads the
+    tables until the project is first retrieved. All tables of a project
+    are read at once, because looking up alternative names and derived
+    variables searches all tables, and reading them from the cache takes
+    little time compared to reading them one by one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.RLock()
+
+    def __getitem__(self, project):
+        info = super().__getitem__(project)
+        if isinstance(info, partial):
+            with self._lock:
+                info = super().__getitem__(project)
+                if isinstance(info, partial):
+                    info = info()
+                    self[project] = info
+        return info
+
+    def get(self, project, default=None):
+        """Return the info object for `project` or `default`."""
+        if project in self:
+            return self[project]
+        return default
+
+    def values(self):
+        """Return a list of all info objects."""
+        return [self[project] for project in self]
+
+    def items(self):
+        """Return a list of all (project, info object) pairs."""
+        return [(project, self[project]) for project in self]
+
+
+CMOR_TABLES = _CMORTables()
 """dict of str, obj: CMOR info objects."""
 
 
@@ -56,16 +103,22 @@ def read_cmor_tables(cfg_developer=None):
     with open(var_alt_names_file, 'r') as yfile:
         alt_names = yaml.safe_load(yfile)
 
-    custom = CustomInfo()
+    # The tables are read when a project is first used
     CMOR_TABLES.clear()
-    CMOR_TABLES['custom'] = custom
+    CMOR_TABLES['custom'] = partial(_read_custom_table)
     install_dir = os.path.dirname(os.path.realpath(__file__))
     for table in cfg_developer:
-        CMOR_TABLES[table] = _read_table(
-            cfg_developer, table, install_dir, custom, alt_names)
+        CMOR_TABLES[table] = partial(_read_table, cfg_developer, table,
+                                     install_dir, alt_names)
+
 
+def _read_custom_table():
+    cwd = os.path.dirname(os.path.realpath(__file__))
+    tables_dir = os.path.join(cwd, 'tables', 'custom')
+    return _read_cached_info(CustomInfo, tables_dir)
 
-def _read_table(cfg_developer, table, install_dir, custom, alt_names):
+
+def _read_table(cfg_developer, table, install_dir, alt_names):
     project = cfg_developer[table]
     cmor_type = project.get('cmor_type', 'CMIP5')
     default_path = os.path.join(install_dir, 'tables', cmor_type.lower())
@@ -75,30 +128,118 @@ def _read_table(cfg_developer, table, install_dir, custom, alt_names):
     default_table_prefix = project.get('cmor_default_table_prefix', '')
 
     if cmor_type == 'CMIP3':
-        return CMIP3Info(
-            table_path,
-            default=custom,
-            strict=cmor_strict,
-            alt_names=alt_names,
-        )
+        info_class = CMIP3Info
+        kwargs = {}
+    elif cmor_type == 'CMIP5':
+        info_class = CMIP5Info
+        kwargs = {}
+    elif cmor_type == 'CMIP6':
+        info_class = CMIP6Info
+        kwargs = {'default_table_prefix': default_table_prefix}
+    else:
+        raise ValueError(f'Unsupported CMOR type {cmor_type}')
+
+    tables_dir = os.path.join(info_class._get_cmor_path(table_path), 'Tables')
+    return _read_cached_info(
+        info_class,
+        tables_dir,
+        default=CMOR_TABLES['custom'],
+        cmor_tables_path=table_path,
+        strict=cmor_strict,
+        alt_names=alt_names,
+        **kwargs,
+    )
+
+
+def _get_cache_file(info_class, tables_dir, kwargs):
+    """Get the cache file of the tables read by `info_class`.
+
+    The name of the file consists of a hash of the arguments and of the
+    path of `tables_dir`, followed by a hash of the size and modification
+    time of the files in `tables_dir`, so a different file is used as soon
+    as one of the tables changes. Returns None if caching is disabled.
+    """
+    if _cache.CACHE_DIR is None or not os.path.isdir(tables_dir):
+        return None
+    stats = []
+    for entry in sorted(os.scandir(tables_dir), key=lambda e: e.name):
+        stat = entry.stat()
+        stats.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    identity = repr((info_class.__name__, os.path.realpath(tables_dir),
+                     sorted(kwargs.items())))
+    version = repr((__version__, stats))
+    digests = [
+        hashlib.sha256(key.encode()).hexdigest()[:32]
+        for key in (identity, version)
+    ]
+    return _cache.get_cache_path(
+        'cmor_tables', '_'.join([info_class.__name__, *digests]) + '.pickle')
+
+
+def _remove_stale_cache_files(cache_file):
+    """Remove cache files of older versions of the same tables."""
+    prefix = os.path.basename(cache_file).rsplit('_', 1)[0] + '_'
+    for filename in glob.glob(
+            os.path.join(os.path.dirname(cache_file), prefix + '*.pickle')):
+        if filename != cache_file:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            else:
+                logger.debug("Removed outdated CMOR table cache %s",
+                             filename)
 
-    if cmor_type == 'CMIP5':
-        return CMIP5Info(
-            table_path,
-            default=custom,
-            strict=cmor_strict,
-            alt_names=alt_names
-        )
 
-    if cmor_type == 'CMIP6':
-        return CMIP6Info(
-            table_path,
-            default=custom,
-            strict=cmor_strict,
-            default_table_prefix=default_table_prefix,
-            alt_names=alt_names,
-        )
-    raise ValueError(f'Unsupported CMOR type {cmor_type}')
+def _load_cached_info(cache_file):
+    """Load an info object from `cache_file`, return None on failure."""
+    if cache_file is None or not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as file:
+            info = pickle.load(file)
+    except (OSError, EOFError, AttributeError, ImportError,
+            pickle.UnpicklingError) as exc:
+        logger.debug("Unable to read CMOR table cache %s: %s", cache_file,
+                     exc)
+        return None
+    _cache.touch(cache_file)
+    return info
+
+
+def _save_cached_info(cache_file, info):
+    """Save an info object to `cache_file`, if possible."""
+    if cache_file is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        # Write to a temporary file first, so other processes never read
+        # an incomplete cache file
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(cache_file),
+                                         suffix='.tmp',
+                                         delete=False) as file:
+            pickle.dump(info, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(file.name, cache_file)
+    except (OSError, pickle.PicklingError) as exc:
+        logger.debug("Unable to update CMOR table cache %s: %s", cache_file,
+                     exc)
+        return
+    _remove_stale_cache_files(cache_file)
+    _cache.prune()
+
+
+def _read_cached_info(info_class, tables_dir, default=None, **kwargs):
+    """Read the tables in `tables_dir` with `info_class`, using the cache."""
+    cache_file = _get_cache_file(info_class, tables_dir, kwargs)
+    info = _load_cached_info(cache_file)
+    if info is None:
+        if default is not None:
+            kwargs['default'] = default
+        info = info_class(**kwargs)
+        _save_cached_info(cache_file, info)
+    elif default is not None:
+        info.default = default
+    return info
 
 
 class InfoBase():
@@ -129,6 +270,14 @@ class InfoBase():
         self.strict = strict
         self.tables = {}
 
+    def __getstate__(self):
+        """Get the state for pickling, without the default tables."""
+        state = self.__dict__.copy()
+        state.pop('_current_table', None)
+        if 'default' in state:
+            state['default'] = None
+        return state
+
     def get_table(self, table):
         """
         Search and return the table info.
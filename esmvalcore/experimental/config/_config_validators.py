@@ -169,6 +169,9 @@ validate_pathlist = _listify_validator(validate_path,
 validate_int_positive = _chain_validator(validate_int, validate_positive)
 validate_int_positive_or_none = _make_type_validator(validate_int_positive,
                                                      allow_none=True)
+validate_float_positive = _chain_validator(validate_float, validate_positive)
+validate_float_positive_or_none = _make_type_validator(
+    validate_float_positive, allow_none=True)
 
 
 def validate_oldstyle_rootpath(value):
@@ -263,7 +266,15 @@ _validators = {
     'save_intermediary_cubes': validate_bool,
     'remove_preproc_dir': validate_bool,
     'max_parallel_tasks': validate_int_or_none,
+    'max_memory': validate_float_positive_or_none,
+    'dask': validate_dict,
+    'max_load_workers': validate_int_positive_or_none,
     'config_developer_file': validate_config_developer,
+    'data_index': validate_path_or_none,
+    'product_cache': validate_path_or_none,
+    'product_cache_size': validate_float_positive_or_none,
+    'cache_dir': validate_path_or_none,
+    'cache_dir_size': validate_float_positive_or_none,
     'profile_diagnostic': validate_bool,
     'run_diagnostic': validate_bool,
     'output_file_type': validate_string,
@@ -1,5 +1,174 @@
 """Auxiliary functions for :mod:`iris`."""
 import iris
+import numpy as np
+
+# Length of the months of the calendars where all years have the same length
+_MONTH_LENGTHS = {
+    '360_day': (30, ) * 12,
+    '365_day': (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31),
+    '366_day': (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31),
+}
+_MONTH_LENGTHS['noleap'] = _MONTH_LENGTHS['365_day']
+_MONTH_LENGTHS['all_leap'] = _MONTH_LENGTHS['366_day']
+
+# Calendars that are decoded with numpy.datetime64
+_GREGORIAN = ('standard', 'gregorian', 'proleptic_gregorian')
+
+# First day of the Gregorian calendar in the standard calendar
+_REFORM = np.datetime64('1582-10-15')
+
+# Length of the time units in microseconds
+_MICROSECONDS = {
+    'microsecond': 1,
+    'millisecond': 10**3,
+    'second': 10**6,
+    'minute': 60 * 10**6,
+    'hour': 3600 * 10**6,
+    'day': 86400 * 10**6,
+}
+
+
+def _to_microseconds(units, points):
+    """Convert time points to whole microseconds since the reference date.
+
+    The rounding is the same as that of :func:`cftime.num2date`.
+
+    Returns
+    -------
+    numpy.ndarray or None
+        64 bit integer microseconds, or `None` if the units or points are not
+        supported.
+    """
+    unit = units.origin.split(' since ')[0].strip().lower()
+    factor = _MICROSECONDS.get(unit[:-1] if unit.endswith('s') else unit)
+    if factor is None or points.dtype.kind not in 'iuf':
+        return None
+    if points.dtype.kind != 'f':
+        return points.astype(np.int64) * factor
+    if not np.all(np.isfinite(points)):
+        return None
+    scaled = points.astype(np.longdouble) * factor
+    microseconds = np.rint(scaled).astype(np.int64)
+    if factor > _MICROSECONDS['millisecond']:
+        # Like cftime, round to whole seconds if 1 microsecond off
+        second = _MICROSECONDS['second']
+        microseconds = np.where(microseconds % second == 1,
+                                np.floor(scaled).astype(np.int64),
+                                microseconds)
+        microseconds = np.where(microseconds % second == second - 1,
+                                np.ceil(scaled).astype(np.int64),
+                                microseconds)
+    return microseconds
+
+
+def _decode_fixed_calendar(units, microseconds):
+    """Decode time points of a calendar where all years have the same length.
+
+    Returns
+    -------
+    numpy.ndarray
+        The year, month, day, hour and day of the year of each time point
+        along the last axis.
+    """
+    month_lengths = _MONTH_LENGTHS[units.calendar]
+
+    # Microseconds since the start of year 0
+    days_per_year = sum(month_lengths)
+    origin = units.num2date(0)
+    microseconds = microseconds + (
+        (origin.year * days_per_year + origin.dayofyr - 1) * 86400 +
+        origin.hour * 3600 + origin.minute * 60 +
+        origin.second) * _MICROSECONDS['second'] + origin.microsecond
+    days, microseconds = np.divmod(microseconds, _MICROSECONDS['day'])
+    year, day_of_year = np.divmod(days, days_per_year)
+    months = np.repeat(np.arange(1, 13), month_lengths)
+    days_of_month = np.concatenate(
+        [np.arange(1, n + 1) for n in month_lengths])
+    return np.stack([
+        year,
+        months[day_of_year],
+        days_of_month[day_of_year],
+        microseconds // _MICROSECONDS['hour'],
+        day_of_year + 1,
+    ], axis=-1)
+
+
+def _decode_gregorian_calendar(units, microseconds):
+    """Decode time points of the (proleptic) Gregorian calendar.
+
+    The dates are computed with :class:`numpy.datetime64`, which uses the
+    proleptic Gregorian calendar. For the standard calendar, this is only
+    correct for dates after the switch from the Julian calendar.
+
+    Returns
+    -------
+    numpy.ndarray or None
+        The year, month, day, hour and day of the year of each time point
+        along the last axis, or `None` if there are dates before
+        1582-10-15 in the standard calendar.
+    """
+    date = units.num2date(0)
+    origin = (np.datetime64('1970', 'M') +
+              np.timedelta64((date.year - 1970) * 12 + date.month - 1, 'M'))
+    origin = origin.astype('M8[D]') + np.timedelta64(date.day - 1, 'D')
+    time_of_day = ((date.hour * 3600 + date.minute * 60 + date.second) *
+                   _MICROSECONDS['second'] + date.microsecond)
+    origin = origin.astype('M8[us]') + np.timedelta64(time_of_day, 'us')
+    dates = origin + microseconds.astype('m8[us]')
+    if units.calendar in ('standard', 'gregorian') and min(
+            origin, dates.min(initial=origin)) < _REFORM:
+        return None
+
+    days = dates.astype('M8[D]')
+    months = dates.astype('M8[M]')
+    years = dates.astype('M8[Y]')
+    return np.stack([
+        years.astype(np.int64) + 1970,
+        months.astype(np.int64) % 12 + 1,
+        (days - months).astype(np.int64) + 1,
+        (dates - days).astype(np.int64) // _MICROSECONDS['hour'],
+        (days - years).astype(np.int64) + 1,
+    ], axis=-1)
+
+
+def date_components(units, points):
+    """Decode time points into their date components.
+
+    Parameters
+    ----------
+    units: cf_units.Unit
+        Units of the time points, including the calendar.
+    points: numpy.ndarray
+        Time points.
+
+    Returns
+    -------
+    numpy.ndarray
+        Integer array with the shape of `points` and an extra last axis with
+        the year, month, day, hour and day of the year of each point.
+    """
+    points = np.asarray(points)
+    components = None
+    microseconds = None
+    if units.calendar in _MONTH_LENGTHS or units.calendar in _GREGORIAN:
+        microseconds = _to_microseconds(units, points)
+    if microseconds is not None:
+        if units.calendar in _MONTH_LENGTHS:
+            components = _decode_fixed_calendar(units, microseconds)
+        else:
+            components = _decode_gregorian_calendar(units, microseconds)
+    if components is None:
+        # The dates are before the switch from the Julian to the Gregorian
+        # calendar or the calendar is not supported, so leave the conversion
+        # to cftime.
+        dates = units.num2date(np.ravel(points),
+                               only_use_cftime_datetimes=True)
+        components = np.array(
+            [(date.year, date.month, date.day, date.hour, date.dayofyr)
+             for date in dates],
+            dtype=np.int64,
+        ).reshape(np.shape(points) + (5, ))
+    return components
 
 
 def var_name_constraint(var_name):
@@ -2,10 +2,16 @@
 import copy
 import inspect
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pprint import pformat
 
 from iris.cube import Cube
 
+from .._dask import get_task_threads, use_scheduler
+from .._product_cache import ProductCache, get_product_key
 from .._provenance import TrackedFile
 from .._task import BaseTask
 from ..cmor.check import cmor_check_data, cmor_check_metadata
@@ -313,9 +319,57 @@ def get_step_blocks(steps, order):
     return blocks
 
 
+def _get_file_steps(settings):
+    """Get the initial steps that can be applied to each file separately."""
+    steps = [step for step in ('fix_file', 'load')
+             if step in settings or step == 'load']
+    # Derivation needs the cubes from all files before fixing the metadata
+    if 'fix_metadata' in settings and 'derive' not in settings:
+        steps.append('fix_metadata')
+    return steps
+
+
+def _apply_file_steps(file, steps, settings):
+    """Apply the initial preprocessor steps to a single input file.
+
+    Returns the (fixed) file and the cubes loaded from it.
+    """
+    if 'fix_file' in steps:
+        file = preprocess([file], 'fix_file', **settings['fix_file'])[0]
+    cubes = preprocess([file], 'load', **settings.get('load', {}))
+    if 'fix_metadata' in steps:
+        cubes = preprocess(cubes, 'fix_metadata', **settings['fix_metadata'])
+    return file, cubes
+
+
+def _load_files(files, steps, settings, max_workers=None):
+    """Apply the initial preprocessor steps to each of the input files.
+
+    The files are processed concurrently by at most `max_workers` processes.
+    Threads are not used, because the netCDF4 library is not thread-safe.
+    The results are in the same order as `files`.
+    """
+    function = partial(_apply_file_steps, steps=steps, settings=settings)
+    max_workers = min(max_workers or 1, len(files))
+    if max_workers > 1 and multiprocessing.current_process().daemon:
+        logger.debug(
+            "Loading files one after another, because daemonic processes "
+            "are not allowed to have children")
+        max_workers = 1
+    if max_workers < 2:
+        return [function(file) for file in files]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(function, files))
+
+
 class PreprocessorFile(TrackedFile):
     """Preprocessor output file."""
-    def __init__(self, attributes, settings, ancestors=None):
+    def __init__(self,
+                 attributes,
+                 settings,
+                 ancestors=None,
+                 max_load_workers=None):
         super(PreprocessorFile, self).__init__(attributes['filename'],
                                                attributes, ancestors)
 
@@ -325,9 +379,11 @@ class PreprocessorFile(TrackedFile):
         self.settings['save']['filename'] = self.filename
 
         self.files = [a.filename for a in ancestors or ()]
+        self.max_load_workers = max_load_workers
 
         self._cubes = None
-        self._prepared = False
+        # Steps that were applied to each input file separately while loading
+        self._file_steps = ()
 
     def check(self):
         """Check preprocessor settings."""
@@ -339,28 +395,37 @@ class PreprocessorFile(TrackedFile):
             raise ValueError(
                 "PreprocessorFile {} has no settings for step {}".format(
                     self, step))
-        self.cubes = preprocess(self.cubes, step, **self.settings[step])
+        # Loading the input files may already apply the step
+        cubes = self.cubes
+        if step not in self._file_steps:
+            self.cubes = preprocess(cubes, step, **self.settings[step])
         if debug:
             logger.debug("Result %s", self.cubes)
             filename = _get_debug_filename(self.filename, step)
             save(self.cubes, filename)
 
-    def prepare(self):
-        """Apply preliminary file operations on product."""
-        if not self._prepared:
-            for step in DEFAULT_ORDER[:DEFAULT_ORDER.index('load')]:
-                if step in self.settings:
-                    self.files = preprocess(self.files, step,
-                                            **self.settings[step])
-            self._prepared = True
+    def _load_input_files(self):
+        """Download, fix and load the input files."""
+        if 'download' in self.settings:
+            self.files = preprocess(self.files, 'download',
+                                    **self.settings['download'])
+        steps = _get_file_steps(self.settings)
+        results = _load_files(self.files, steps, self.settings,
+                              self.max_load_workers)
+        self.files = [file for file, _ in results]
+        self._file_steps = tuple(steps)
+        return [cube for _, cubes in results for cube in cubes]
 
     @property
     def cubes(self):
         """Cubes."""
         if self.is_closed:
-            self.prepare()
-            self._cubes = preprocess(self.files, 'load',
-                                     **self.settings.get('load', {}))
+            if self._file_steps:
+                # The input files were already downloaded and fixed
+                self._cubes = preprocess(self.files, 'load',
+                                         **self.settings.get('load', {}))
+            else:
+                self._cubes = self._load_input_files()
         return self._cubes
 
     @cubes.setter
@@ -428,6 +493,9 @@ class PreprocessingTask(BaseTask):
         order=DEFAULT_ORDER,
         debug=None,
         write_ncl_interface=False,
+        dask=None,
+        product_cache=None,
+        product_cache_size=None,
     ):
         """Initialize."""
         _check_multi_model_settings(products)
@@ -435,6 +503,10 @@ class PreprocessingTask(BaseTask):
         self.order = list(order)
         self.debug = debug
         self.write_ncl_interface = write_ncl_interface
+        self.dask = {} if dask is None else dict(dask)
+        self.threads = get_task_threads(self.dask)
+        self.product_cache = product_cache
+        self.product_cache_size = product_cache_size
 
     def _initialize_product_provenance(self):
         """Initialize product provenance."""
@@ -450,10 +522,80 @@ class PreprocessingTask(BaseTask):
             for product in statistic_products:
                 product.initialize_provenance(self.activity)
 
+    def estimate_memory(self):
+        """Estimate the peak memory use (GB) of the task.
+
+        The estimate is based on the size of the input files, see
+        :ref:`Memory use` in the documentation.
+        """
+        sizes = []
+        for product in self.products:
+            sizes.append(
+                sum(
+                    os.path.getsize(filename) for filename in product.files
+                    if os.path.exists(filename)) / 2**30)
+        if not sizes:
+            return 0.
+        n_datasets = len(sizes)
+        efficiency = 3
+        if any(step in MULTI_MODEL_FUNCTIONS for product in self.products
+               for step in product.settings):
+            size = sum(sizes) / n_datasets
+            return (2 * efficiency + n_datasets - 2) * size
+        return efficiency * max(sizes)
+
     def _run(self, _):
         """Run the preprocessor."""
+        with use_scheduler(self.dask, self.scheduler_address):
+            return self._run_steps()
+
+    def _open_product_cache(self):
+        """Open the product cache, or return `None` if it is not used."""
+        if self.product_cache is None or self.debug:
+            return None
+        # The output of multi-model steps depends on all products together
+        if any(step in MULTI_MODEL_FUNCTIONS for product in self.products
+               for step in product.settings):
+            return None
+        return ProductCache(self.product_cache, self.product_cache_size)
+
+    def _restore_cached_products(self, cache):
+        """Restore the products found in the cache.
+
+        Returns the cache keys of the products that still need to be
+        computed. The key is `None` for products that cannot be cached.
+        """
+        keys = {}
+        for product in self.products:
+            key = get_product_key(product)
+            if key is not None and cache.restore(key, product.filename):
+                logger.info("Using cached %s", product.filename)
+            else:
+                keys[product] = key
+        return keys
+
+    def _run_steps(self):
+        """Run the preprocessor steps on all products."""
         self._initialize_product_provenance()
 
+        cache = self._open_product_cache()
+        if cache is None:
+            return self._run_products(self.products)
+        try:
+            keys = self._restore_cached_products(cache)
+            metadata_files = self._run_products(set(keys))
+            for product, key in keys.items():
+                if key is not None:
+                    cache.store(key, product.filename)
+        finally:
+            cache.close()
+        return metadata_files
+
+    def _run_products(self, products):
+        """Run the preprocessor steps on `products`.
+
+        The other products of the task are assumed to be done already.
+        """
         steps = {
             step
             for product in self.products for step in product.settings
@@ -466,7 +608,7 @@ class PreprocessingTask(BaseTask):
                     self.products = _apply_multimodel(self.products, step,
                                                       self.debug)
             else:
-                for product in self.products:
+                for product in self.products & products:
                     logger.debug("Applying single-model steps to %s", product)
                     for step in block:
                         if step in product.settings:
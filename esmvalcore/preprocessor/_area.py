@@ -3,24 +3,36 @@
 Allows for selecting data subsets using certain latitude and longitude
 bounds; selecting geographical regions; constructing area averages; etc.
 """
+import hashlib
 import logging
+import os
+from collections import OrderedDict
 
 import fiona
 import iris
 import numpy as np
 import shapely
-import shapely.ops
+import shapely.geometry
+import shapely.vectorized
 from dask import array as da
 from iris.exceptions import CoordinateNotFoundError
 
 from ._shared import (
+    build_collapsed_cube,
+    get_area_weights,
     get_iris_analysis_operation,
     guess_bounds,
+    load_last_fx_data,
     operator_accept_weights,
+    weighted_statistic,
 )
 
 logger = logging.getLogger(__name__)
 
+# The most recently used region selections computed by extract_shape.
+_SHAPE_SELECTIONS = OrderedDict()
+_MAX_CACHED_SHAPE_SELECTIONS = 8
+
 
 # slice cube over a restricted area (box)
 def extract_region(cube, start_longitude, end_longitude, start_latitude,
@@ -157,44 +169,6 @@ def meridional_statistics(cube, operator):
         raise ValueError(msg)
 
 
-def tile_grid_areas(cube, fx_files):
-    """Tile the grid area data to match the dataset cube.
-
-    Parameters
-    ----------
-    cube: iris.cube.Cube
-        input cube.
-    fx_files: dict
-        dictionary of field:filename for the fx_files
-
-    Returns
-    -------
-    iris.cube.Cube
-        Freshly tiled grid areas cube.
-    """
-    grid_areas = None
-    if fx_files:
-        for key, fx_file in fx_files.items():
-            if not fx_file:
-                continue
-            logger.info('Attempting to load %s from file: %s', key, fx_file)
-            fx_cube = iris.load_cube(fx_file)
-
-            grid_areas = fx_cube.core_data()
-            if cube.ndim == 4 and grid_areas.ndim == 2:
-                grid_areas = da.tile(grid_areas,
-                                     [cube.shape[0], cube.shape[1], 1, 1])
-            elif cube.ndim == 4 and grid_areas.ndim == 3:
-                grid_areas = da.tile(grid_areas, [cube.shape[0], 1, 1, 1])
-            elif cube.ndim == 3 and grid_areas.ndim == 2:
-                grid_areas = da.tile(grid_areas, [cube.shape[0], 1, 1])
-            else:
-                raise ValueError('Grid and dataset number of dimensions not '
-                                 'recognised: {} and {}.'
-                                 ''.format(cube.ndim, grid_areas.ndim))
-    return grid_areas
-
-
 # get the area average
 def area_statistics(cube, operator, fx_variables=None):
     """Apply a statistical operator in the horizontal direction.
@@ -248,18 +222,18 @@ def area_statistics(cube, operator, fx_variables=None):
     ValueError
         if input data cube has different shape than grid area weights
     """
-    grid_areas = tile_grid_areas(cube, fx_variables)
+    grid_areas = load_last_fx_data(fx_variables)
 
     if not fx_variables and cube.coord('latitude').points.ndim == 2:
         coord_names = [coord.standard_name for coord in cube.coords()]
         if 'grid_latitude' in coord_names and 'grid_longitude' in coord_names:
             cube = guess_bounds(cube, ['grid_latitude', 'grid_longitude'])
-            cube_tmp = cube.copy()
+            cube_tmp = cube.copy(cube.lazy_data())
             cube_tmp.remove_coord('latitude')
             cube_tmp.coord('grid_latitude').rename('latitude')
             cube_tmp.remove_coord('longitude')
             cube_tmp.coord('grid_longitude').rename('longitude')
-            grid_areas = iris.analysis.cartography.area_weights(cube_tmp)
+            grid_areas = get_area_weights(cube_tmp)
             logger.info('Calculated grid area shape: %s', grid_areas.shape)
         else:
             logger.error(
@@ -271,10 +245,14 @@ def area_statistics(cube, operator, fx_variables=None):
     coord_names = ['longitude', 'latitude']
     if grid_areas is None or not grid_areas.any():
         cube = guess_bounds(cube, coord_names)
-        grid_areas = iris.analysis.cartography.area_weights(cube)
+        grid_areas = get_area_weights(cube)
         logger.info('Calculated grid area shape: %s', grid_areas.shape)
 
-    if cube.shape != grid_areas.shape:
+    try:
+        shape = np.broadcast_shapes(cube.shape, grid_areas.shape)
+    except ValueError:
+        shape = None
+    if shape != cube.shape:
         raise ValueError('Cube shape ({}) doesn`t match grid area shape '
                          '({})'.format(cube.shape, grid_areas.shape))
 
@@ -283,11 +261,21 @@ def area_statistics(cube, operator, fx_variables=None):
     # TODO: implement weighted stdev, median, s var when available in iris.
     # See iris issue: https://github.com/SciTools/iris/issues/3208
 
-    if operator_accept_weights(operator):
-        return cube.collapsed(coord_names, operation, weights=grid_areas)
+    if not operator_accept_weights(operator):
+        # Many IRIS analysis functions do not accept weights arguments.
+        return cube.collapsed(coord_names, operation)
 
-    # Many IRIS analysis functions do not accept weights arguments.
-    return cube.collapsed(coord_names, operation)
+    axis = tuple(
+        sorted(
+            set(cube.coord_dims('latitude') + cube.coord_dims('longitude'))))
+    data = weighted_statistic(cube.lazy_data(), grid_areas, axis,
+                              operator.lower())
+    result = build_collapsed_cube(cube, coord_names, operation, data)
+    if not cube.has_lazy_data():
+        result.data = result.data
+        if result.ndim == 0 and not np.ma.is_masked(result.data):
+            result.data = result.data.filled()
+    return result
 
 
 def extract_named_regions(cube, regions):
@@ -377,14 +365,46 @@ def _crop_cube(cube,
 def _select_representative_point(shape, lon, lat):
     """Select a representative point for `shape` from `lon` and `lat`."""
     representative_point = shape.representative_point()
-    points = shapely.geometry.MultiPoint(np.stack((lon.flat, lat.flat),
-                                                  axis=1))
-    nearest_point = shapely.ops.nearest_points(points, representative_point)[0]
-    nearest_lon, nearest_lat = nearest_point.coords[0]
+    # Find the grid point nearest to the representative point, this is the
+    # same as shapely.ops.nearest_points, but without creating a shapely
+    # point for every grid point.
+    distance = np.hypot(lon - representative_point.x,
+                        lat - representative_point.y)
+    index = np.unravel_index(np.argmin(distance), distance.shape)
+    nearest_lon, nearest_lat = lon[index], lat[index]
     select = (lon == nearest_lon) & (lat == nearest_lat)
     return select
 
 
+def _get_candidate_points(shape, lon, lat):
+    """Get an index of the points that are inside the envelope of `shape`.
+
+    On rectilinear grids, the index selects the rows and columns that
+    intersect the envelope, on other grids it is a boolean array.
+    """
+    lon_min, lat_min, lon_max, lat_max = shape.bounds
+    if (lon.ndim == 2 and (lon == lon[:1, :]).all()
+            and (lat == lat[:, :1]).all()):
+        rows = np.nonzero((lat[:, 0] >= lat_min) & (lat[:, 0] <= lat_max))
+        cols = np.nonzero((lon[0, :] >= lon_min) & (lon[0, :] <= lon_max))
+        return np.ix_(rows[0], cols[0])
+    return ((lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) &
+            (lat <= lat_max))
+
+
+def _select_contained_points(shape, lon, lat):
+    """Select the points from `lon` and `lat` that are inside `shape`.
+
+    Only the points inside the envelope of the shape are tested.
+    """
+    select = np.zeros(lon.shape, dtype=bool)
+    candidates = _get_candidate_points(shape, lon, lat)
+    if select[candidates].size:
+        select[candidates] = shapely.vectorized.contains(
+            shape, lon[candidates], lat[candidates])
+    return select
+
+
 def _correct_coords_from_shapefile(cube, cmor_coords, pad_north_pole,
                                    pad_hawaii):
     """Get correct lat and lon from shapefile."""
@@ -425,7 +445,7 @@ def _get_masks_from_geometries(geometries,
     for i, item in enumerate(geometries):
         shape = shapely.geometry.shape(item['geometry'])
         if method == 'contains':
-            select = shapely.vectorized.contains(shape, lon, lat)
+            select = _select_contained_points(shape, lon, lat)
         if method == 'representative' or not select.any():
             select = _select_representative_point(shape, lon, lat)
         if 'ID' in item['properties']:
@@ -447,6 +467,51 @@ def _get_masks_from_geometries(geometries,
     return selections
 
 
+def _get_selections_key(shapefile, lon, lat, method, decomposed):
+    """Compute a hash of everything that determines the selections."""
+    stat = os.stat(shapefile)
+    key = hashlib.sha256()
+    key.update(
+        repr((os.path.realpath(shapefile), stat.st_size, stat.st_mtime_ns,
+              method, decomposed)).encode())
+    for points in (lon, lat):
+        points = np.ascontiguousarray(points, dtype=np.float64)
+        key.update(repr(points.shape).encode())
+        key.update(points.tobytes())
+    return key.hexdigest()
+
+
+def _get_cached_masks_from_geometries(shapefile, geometries, lon, lat,
+                                      method, decomposed):
+    """Get the selections for the geometries, from the cache if possible.
+
+    The selections are stored as the indices of the selected points, so the
+    memory needed by the cache does not grow with the number of regions.
+    """
+    key = _get_selections_key(shapefile, lon, lat, method, decomposed)
+    if key in _SHAPE_SELECTIONS:
+        _SHAPE_SELECTIONS.move_to_end(key)
+    else:
+        selections = _get_masks_from_geometries(geometries,
+                                                lon,
+                                                lat,
+                                                method=method,
+                                                decomposed=decomposed)
+        _SHAPE_SELECTIONS[key] = {
+            id_: np.flatnonzero(select)
+            for id_, select in selections.items()
+        }
+        while len(_SHAPE_SELECTIONS) > _MAX_CACHED_SHAPE_SELECTIONS:
+            _SHAPE_SELECTIONS.popitem(last=False)
+
+    selections = {}
+    for id_, indices in _SHAPE_SELECTIONS[key].items():
+        select = np.zeros(lon.shape, dtype=bool)
+        select.flat[indices] = True
+        selections[id_] = select
+    return selections
+
+
 def fix_coordinate_ordering(cube):
     """Transpose the dimensions.
 
@@ -549,11 +614,8 @@ def extract_shape(cube,
         lon, lat = _correct_coords_from_shapefile(cube, cmor_coords,
                                                   pad_north_pole, pad_hawaii)
 
-        selections = _get_masks_from_geometries(geometries,
-                                                lon,
-                                                lat,
-                                                method=method,
-                                                decomposed=decomposed)
+        selections = _get_cached_masks_from_geometries(
+            shapefile, geometries, lon, lat, method, decomposed)
 
     cubelist = iris.cube.CubeList()
 
@@ -4,6 +4,8 @@ import logging
 import iris
 import iris.coord_categorisation
 
+from ._groupby import aggregated_by_all
+
 logger = logging.getLogger(__name__)
 
 
@@ -63,8 +65,8 @@ def amplitude(cube, coords):
                 f"iris.coord_categorisation")
 
     # Calculate amplitude
-    max_cube = cube.aggregated_by(coords, iris.analysis.MAX)
-    min_cube = cube.aggregated_by(coords, iris.analysis.MIN)
+    max_cube, min_cube = aggregated_by_all(
+        cube, coords, [iris.analysis.MAX, iris.analysis.MIN])
     amplitude_cube = max_cube - min_cube
     amplitude_cube.metadata = cube.metadata
 
@@ -2,7 +2,9 @@
 import logging
 
 import dask.array as da
-import scipy.signal
+import numpy as np
+
+from ._shared import linear_regression
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +13,10 @@ def detrend(cube, dimension='time', method='linear'):
     """
     Detrend data along a given dimension.
 
+    The trend is fitted to the unmasked points against their index along
+    the dimension, with the same result as :func:`scipy.signal.detrend`
+    for unmasked data.
+
     Parameters
     ----------
     cube: iris.cube.Cube
@@ -25,14 +31,34 @@ def detrend(cube, dimension='time', method='linear'):
     -------
     iris.cube.Cube
         Detrended cube
+
+    Raises
+    ------
+    ValueError
+        If method is not available.
     """
     coord = cube.coord(dimension)
     axis = cube.coord_dims(coord)[0]
-    detrended = da.apply_along_axis(
-        scipy.signal.detrend,
-        axis=axis,
-        arr=cube.lazy_data(),
-        type=method,
-        shape=(cube.shape[axis],)
-    )
+    data = cube.lazy_data()
+    dtype = data.dtype
+    if not np.issubdtype(dtype, np.floating):
+        dtype = np.float64
+
+    mean = data.astype(np.float64).mean(axis=axis, keepdims=True)
+    if method == 'constant':
+        trend = mean
+    elif method == 'linear':
+        x_data = np.arange(cube.shape[axis])
+        fit = linear_regression(data, axis, x_data)
+        slope = da.expand_dims(fit['slope'], axis)
+        intercept = da.expand_dims(fit['intercept'], axis)
+        shape = [1] * cube.ndim
+        shape[axis] = -1
+        # Points with a single value have no slope, remove the mean instead
+        trend = da.where(da.isnan(slope), mean,
+                         intercept + slope * x_data.reshape(shape))
+    else:
+        raise ValueError(f"Detrend method '{method}' not available, choose "
+                         "one of 'linear', 'constant'")
+    detrended = (data - trend).astype(dtype)
     return cube.copy(detrended)
@@ -0,0 +1,481 @@
+"""Fast aggregation of cubes over groups of coordinate values.
+
+This is a replacement for :meth:`iris.cube.Cube.aggregated_by` for the most
+common statistics. Instead of slicing the cube group by group, the group of
+every point along the aggregated dimension is computed once and the data
+is reduced in two blockwise passes: first every chunk is reduced to partial
+statistics (count, sum, ...) of the groups in that chunk, then the partial
+statistics of groups that span several chunks are combined. The size of the
+task graph therefore depends on the number of chunks, not on the number of
+groups, and several statistics can be computed in a single pass.
+"""
+import itertools
+import logging
+from operator import getitem
+
+import dask.array as da
+import iris
+import numpy as np
+from dask.base import tokenize
+from dask.highlevelgraph import HighLevelGraph
+
+logger = logging.getLogger(__name__)
+
+# The partial statistics needed to compute each (iris) aggregator.
+_STATISTICS = {
+    'mean': ('count', 'sum'),
+    'sum': ('count', 'sum'),
+    'minimum': ('count', 'min'),
+    'maximum': ('count', 'max'),
+    'standard_deviation': ('count', 'sum', 'm2'),
+    'variance': ('count', 'sum', 'm2'),
+    'root_mean_square': ('count', 'sumsq'),
+}
+
+
+def _get_group_dim(cube, coords):
+    """Get the dimension to aggregate, or `None` if not supported."""
+    dims = {cube.coord_dims(coord) for coord in coords}
+    if len(dims) != 1:
+        return None
+    dims = dims.pop()
+    if len(dims) != 1:
+        return None
+    dim = dims[0]
+    for coord in cube.coords(contains_dimension=dim):
+        if cube.coord_dims(coord) != (dim, ):
+            return None
+    if cube.aux_factories:
+        return None
+    return dim
+
+
+def _get_labels(coords):
+    """Number the groups in `coords` in order of first occurrence.
+
+    This is the order of the groups in the result of
+    :meth:`iris.cube.Cube.aggregated_by`.
+    """
+    combined = np.zeros(coords[0].shape, dtype=np.int64)
+    for coord in coords:
+        uniques, codes = np.unique(coord.points, return_inverse=True)
+        _, combined = np.unique(combined * len(uniques) + codes.ravel(),
+                                return_inverse=True)
+    _, first, inverse = np.unique(combined,
+                                  return_index=True,
+                                  return_inverse=True)
+    rank = np.empty_like(first)
+    rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+    return rank[inverse.ravel()]
+
+
+def _get_starts(labels):
+    """Get the start index of every run of equal labels."""
+    return np.concatenate(([0], np.flatnonzero(np.diff(labels)) + 1))
+
+
+def _align_chunks(labels, chunks):
+    """Move chunk boundaries so no run of equal `labels` spans two chunks."""
+    starts = _get_starts(labels)
+    bounds = np.cumsum(chunks)[:-1]
+    bounds = starts[np.searchsorted(starts, bounds, side='right') - 1]
+    bounds = np.unique(np.concatenate(([0], bounds, [len(labels)])))
+    return tuple(np.diff(bounds).tolist())
+
+
+def _count_groups(labels, chunks):
+    """Count the different labels in each chunk."""
+    bounds = np.cumsum((0, ) + tuple(chunks))
+    return tuple(
+        len(np.unique(labels[start:stop]))
+        for start, stop in zip(bounds[:-1], bounds[1:]))
+
+
+def _segment_statistics(values, valid, starts, statistics):
+    """Compute statistics of the segments of `values` that begin at `starts`.
+
+    The statistics are computed along the first axis.
+    """
+    lengths = np.diff(np.append(starts, len(values)))
+    count = np.add.reduceat(valid, starts, axis=0, dtype=np.float64)
+    values = np.where(valid, values, 0.)
+    result = {'count': count}
+    if 'sum' in statistics:
+        result['sum'] = np.add.reduceat(values, starts, axis=0)
+    if 'm2' in statistics:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = result['sum'] / count
+        deviation = np.where(valid, values - np.repeat(mean, lengths, axis=0),
+                             0.)
+        result['m2'] = np.add.reduceat(deviation**2, starts, axis=0)
+    if 'sumsq' in statistics:
+        result['sumsq'] = np.add.reduceat(values**2, starts, axis=0)
+    if 'min' in statistics:
+        result['min'] = np.minimum.reduceat(np.where(valid, values, np.inf),
+                                            starts,
+                                            axis=0)
+    if 'max' in statistics:
+        result['max'] = np.maximum.reduceat(np.where(valid, values, -np.inf),
+                                            starts,
+                                            axis=0)
+    return np.stack([result[name] for name in statistics])
+
+
+def _partial_statistics(block, labels, chunk_starts, statistics,
+                        block_info=None):
+    """Compute the statistics of the groups in one chunk of data.
+
+    The result contains the groups in the chunk, sorted by label.
+    """
+    start = chunk_starts[block_info[0]['chunk-location'][0]]
+    labels = labels[start:start + block.shape[0]]
+    order = np.argsort(labels, kind='stable')
+    labels = labels[order]
+    block = block[order]
+    values = np.ma.getdata(block).astype(np.float64)
+    valid = ~np.ma.getmaskarray(block)
+    starts = _get_starts(labels)
+    return _segment_statistics(values, valid, starts, statistics)
+
+
+def _combine_statistics(block, labels, chunk_starts, statistics,
+                        block_info=None):
+    """Combine partial statistics of the same group."""
+    start = chunk_starts[block_info[0]['chunk-location'][1]]
+    labels = labels[start:start + block.shape[1]]
+    return _reduce_statistics(block, labels, statistics)
+
+
+def _merge_statistics(blocks, block_labels, statistics):
+    """Merge the partial statistics of groups from several chunks.
+
+    The result contains every group in `blocks` once, sorted by label.
+    """
+    labels = np.concatenate(block_labels)
+    order = np.argsort(labels, kind='stable')
+    block = np.concatenate(blocks, axis=1)[:, order]
+    return _reduce_statistics(block, labels[order], statistics)
+
+
+def _reduce_statistics(block, labels, statistics):
+    """Reduce partial statistics of runs of equal sorted `labels`."""
+    starts = _get_starts(labels)
+    partial = dict(zip(statistics, block))
+    count = np.add.reduceat(partial['count'], starts, axis=0)
+    result = {'count': count}
+    if 'sum' in statistics:
+        result['sum'] = np.add.reduceat(partial['sum'], starts, axis=0)
+    if 'm2' in statistics:
+        # Combine the sums of squared deviations from the mean of each part
+        # into the sum of squared deviations from the overall mean.
+        lengths = np.diff(np.append(starts, len(labels)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            partial_mean = partial['sum'] / partial['count']
+            mean = np.repeat(result['sum'] / count, lengths, axis=0)
+        correction = np.where(partial['count'] > 0,
+                              partial['count'] * (partial_mean - mean)**2, 0.)
+        result['m2'] = np.add.reduceat(partial['m2'] + correction,
+                                       starts,
+                                       axis=0)
+    if 'sumsq' in statistics:
+        result['sumsq'] = np.add.reduceat(partial['sumsq'], starts, axis=0)
+    if 'min' in statistics:
+        result['min'] = np.minimum.reduceat(partial['min'], starts, axis=0)
+    if 'max' in statistics:
+        result['max'] = np.maximum.reduceat(partial['max'], starts, axis=0)
+    return np.stack([result[name] for name in statistics])
+
+
+def _finalize(stats, statistics, operator):
+    """Compute the result of `operator` from the statistics of each group."""
+    stats = dict(zip(statistics, stats))
+    count = stats['count']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if operator == 'mean':
+            result = stats['sum'] / count
+        elif operator == 'sum':
+            result = stats['sum']
+        elif operator == 'minimum':
+            result = stats['min']
+        elif operator == 'maximum':
+            result = stats['max']
+        elif operator == 'variance':
+            result = stats['m2'] / (count - 1)
+        elif operator == 'standard_deviation':
+            result = np.sqrt(stats['m2'] / (count - 1))
+        elif operator == 'root_mean_square':
+            result = np.sqrt(stats['sumsq'] / count)
+    # Like iris, mask groups with too few valid values for the statistic
+    if operator in ('variance', 'standard_deviation'):
+        invalid = count < 2
+    else:
+        invalid = count == 0
+    if np.any(invalid):
+        result = np.ma.masked_where(invalid, result)
+    return result
+
+
+def _aggregate_data(data, labels, operators):
+    """Aggregate `data` along the first axis over groups given by `labels`.
+
+    Returns
+    -------
+    list of dask.array.Array
+        The result of each operator, as float64 masked arrays.
+    """
+    statistics = []
+    for operator in operators:
+        for name in _STATISTICS[operator]:
+            if name not in statistics:
+                statistics.append(name)
+
+    chunk_starts = np.cumsum((0, ) + data.chunks[0])
+    partial_labels = np.concatenate([
+        np.unique(labels[start:stop])
+        for start, stop in zip(chunk_starts[:-1], chunk_starts[1:])
+    ])
+    if np.any(np.diff(partial_labels) < 0):
+        # The groups are not contiguous, e.g. the months of a climatology:
+        # merge the statistics of the groups in every chunk by label.
+        stats = _aggregate_scattered(data, labels, chunk_starts, statistics)
+    else:
+        stats = _aggregate_contiguous(data, labels, partial_labels,
+                                      chunk_starts, statistics)
+
+    return [
+        da.map_blocks(_finalize,
+                      stats,
+                      statistics,
+                      operator,
+                      drop_axis=0,
+                      dtype=np.float64,
+                      meta=np.ma.array((), dtype=np.float64))
+        for operator in operators
+    ]
+
+
+def _aggregate_contiguous(data, labels, partial_labels, chunk_starts,
+                          statistics):
+    """Compute the statistics of contiguous groups."""
+    # Reduce every chunk to the statistics of the groups in that chunk.
+    partial = da.map_blocks(
+        _partial_statistics,
+        data,
+        labels,
+        chunk_starts,
+        statistics,
+        new_axis=0,
+        chunks=((len(statistics), ), _count_groups(labels, data.chunks[0])) +
+        data.chunks[1:],
+        dtype=np.float64,
+        meta=np.array((), dtype=np.float64),
+    )
+
+    # Combine the statistics of groups that span more than one chunk.
+    chunks = _align_chunks(partial_labels, partial.chunks[1])
+    partial = partial.rechunk({1: chunks})
+    return da.map_blocks(
+        _combine_statistics,
+        partial,
+        partial_labels,
+        np.cumsum((0, ) + chunks),
+        statistics,
+        chunks=((len(statistics), ), _count_groups(partial_labels, chunks)) +
+        partial.chunks[2:],
+        dtype=np.float64,
+        meta=np.array((), dtype=np.float64),
+    )
+
+
+def _aggregate_scattered(data, labels, chunk_starts, statistics,
+                         split_every=4):
+    """Compute the statistics of groups that are spread over the chunks.
+
+    Every chunk is reduced to the statistics of the groups it contains.
+    The result is chunked along the groups like `data` along the first
+    axis, and the statistics in each of those chunks are merged by label
+    in a tree of `split_every` inputs per node, so no task holds more
+    groups than a chunk of the result.
+    """
+    partial = da.map_blocks(
+        _partial_statistics,
+        data,
+        labels,
+        chunk_starts,
+        statistics,
+        new_axis=0,
+        chunks=((len(statistics), ), _count_groups(labels, data.chunks[0])) +
+        data.chunks[1:],
+        dtype=np.float64,
+        meta=np.array((), dtype=np.float64),
+    )
+    chunk_labels = [
+        np.unique(labels[start:stop])
+        for start, stop in zip(chunk_starts[:-1], chunk_starts[1:])
+    ]
+    n_groups = labels.max() + 1
+    group_chunks = da.core.normalize_chunks(max(data.chunks[0]),
+                                            (n_groups, ))[0]
+    group_starts = np.cumsum((0, ) + group_chunks)
+
+    token = tokenize(partial, labels, statistics, split_every)
+    name = f'aggregate-scattered-{token}'
+    graph = {}
+    for index in itertools.product(*(range(n)
+                                     for n in partial.numblocks[2:])):
+        for chunk, (low, high) in enumerate(
+                zip(group_starts[:-1], group_starts[1:])):
+            # Select the groups of this chunk of the result from every
+            # chunk of partial statistics.
+            nodes = []
+            for i, chunk_label in enumerate(chunk_labels):
+                start, stop = np.searchsorted(chunk_label, (low, high))
+                if start < stop:
+                    nodes.append(((getitem,
+                                   (partial.name, 0, i) + index,
+                                   (slice(None), slice(start, stop))),
+                                  chunk_label[start:stop]))
+            depth = 0
+            while len(nodes) > split_every:
+                merged = []
+                for i in range(0, len(nodes), split_every):
+                    keys, group_labels = zip(*nodes[i:i + split_every])
+                    key = (f'{name}-{depth}', chunk, i // split_every) + index
+                    graph[key] = (_merge_statistics, list(keys),
+                                  list(group_labels), statistics)
+                    merged.append((key, np.unique(
+                        np.concatenate(group_labels))))
+                nodes = merged
+                depth += 1
+            keys, group_labels = zip(*nodes)
+            graph[(name, 0, chunk) + index] = (_merge_statistics, list(keys),
+                                               list(group_labels), statistics)
+
+    graph = HighLevelGraph.from_collections(name,
+                                            graph,
+                                            dependencies=[partial])
+    return da.Array(graph,
+                    name,
+                    chunks=((len(statistics), ), group_chunks) +
+                    partial.chunks[2:],
+                    meta=np.array((), dtype=np.float64))
+
+
+def _get_dtype(cube, dim, operator):
+    """Get the data type of the result of iris for `operator`."""
+    sample = cube.core_data()[(slice(0, 1), ) * cube.ndim]
+    if cube.has_lazy_data():
+        return operator.lazy_aggregate(sample, axis=dim).dtype
+    return operator.aggregate(sample, axis=dim).dtype
+
+
+def _get_template(cube, coords, dim, operator):
+    """Aggregate a cube with only the coordinates along `dim` using iris.
+
+    This provides the coordinates and metadata of the aggregated cube.
+    """
+    template = iris.cube.Cube(np.zeros(cube.shape[dim], dtype=cube.dtype),
+                              **cube.metadata._asdict())
+    for coord in cube.coords(contains_dimension=dim):
+        if coord in cube.dim_coords:
+            template.add_dim_coord(coord, 0)
+        else:
+            template.add_aux_coord(coord, 0)
+    return template.aggregated_by([c.name() for c in coords], operator)
+
+
+def _build_cube(cube, template, dim, data):
+    """Create the aggregated cube from `template` and `cube`."""
+    result = iris.cube.Cube(data, **template.metadata._asdict())
+    for coord in cube.dim_coords:
+        if cube.coord_dims(coord) != (dim, ):
+            result.add_dim_coord(coord.copy(), cube.coord_dims(coord))
+    for coord in template.dim_coords:
+        result.add_dim_coord(coord, dim)
+    for coord in cube.aux_coords:
+        if dim not in cube.coord_dims(coord):
+            result.add_aux_coord(coord.copy(), cube.coord_dims(coord))
+    for coord in template.aux_coords:
+        result.add_aux_coord(coord, (dim, ) if template.coord_dims(coord)
+                             else ())
+    for measure in cube.cell_measures():
+        if dim not in cube.cell_measure_dims(measure):
+            result.add_cell_measure(measure.copy(),
+                                    cube.cell_measure_dims(measure))
+    for ancillary in cube.ancillary_variables():
+        if dim not in cube.ancillary_variable_dims(ancillary):
+            result.add_ancillary_variable(
+                ancillary.copy(), cube.ancillary_variable_dims(ancillary))
+    return result
+
+
+def aggregated_by_all(cube, coords, operators):
+    """Aggregate `cube` over groups of equal values of `coords`.
+
+    The result is the same as that of :meth:`iris.cube.Cube.aggregated_by`
+    for each operator, but the data is only read once for all operators.
+    If the cube or one of the operators is not supported,
+    :meth:`iris.cube.Cube.aggregated_by` is used.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        Input cube.
+    coords: str or iris.coords.Coord or list
+        Coordinate(s) to group by.
+    operators: list of iris.analysis.Aggregator
+        Operators to apply.
+
+    Returns
+    -------
+    list of iris.cube.Cube
+        Aggregated cube for each operator.
+    """
+    if isinstance(coords, (str, iris.coords.Coord)):
+        coords = [coords]
+    coords = [cube.coord(coord) for coord in coords]
+    dim = _get_group_dim(cube, coords)
+    if dim is None or any(operator.name() not in _STATISTICS
+                          for operator in operators):
+        logger.debug("Using iris to aggregate cube %s by %s",
+                     cube.summary(shorten=True),
+                     ', '.join(c.name() for c in coords))
+        return [cube.aggregated_by(coords, operator) for operator in operators]
+
+    labels = _get_labels(coords)
+    data = da.moveaxis(cube.lazy_data(), dim, 0)
+    results = _aggregate_data(data, labels,
+                              [operator.name() for operator in operators])
+
+    cubes = []
+    for operator, result in zip(operators, results):
+        template = _get_template(cube, coords, dim, operator)
+        result = da.moveaxis(result, 0, dim).astype(
+            _get_dtype(cube, dim, operator))
+        result = _build_cube(cube, template, dim, result)
+        if not cube.has_lazy_data():
+            result.data = result.data
+        cubes.append(result)
+    return cubes
+
+
+def aggregated_by(cube, coords, operator):
+    """Aggregate `cube` over groups of equal values of `coords`.
+
+    See :func:`aggregated_by_all`.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        Input cube.
+    coords: str or iris.coords.Coord or list
+        Coordinate(s) to group by.
+    operator: iris.analysis.Aggregator
+        Operator to apply.
+
+    Returns
+    -------
+    iris.cube.Cube
+        Aggregated cube.
+    """
+    return aggregated_by_all(cube, coords, [operator])[0]
@@ -6,11 +6,13 @@ import shutil
 from itertools import groupby
 from warnings import catch_warnings, filterwarnings
 
+import dask
 import iris
 import iris.exceptions
 import numpy as np
 import yaml
 
+from .._dask import fetch_from_cluster, get_distributed_client
 from .._task import write_ncl_settings
 from ..cmor._fixes.shared import AtmosphereSigmaFactory
 from ._time import extract_time
@@ -141,19 +143,6 @@ def _fix_cube_attributes(cubes):
         cube.attributes = attributes
 
 
-def _by_two_concatenation(cubes):
-    """Perform a by-2 concatenation to avoid gaps."""
-    concatenated = iris.cube.CubeList(cubes).concatenate()
-    if len(concatenated) == 1:
-        return concatenated[0]
-
-    concatenated = _concatenate_overlapping_cubes(concatenated)
-    if len(concatenated) == 2:
-        _get_concatenation_error(concatenated)
-    else:
-        return concatenated[0]
-
-
 def _get_concatenation_error(cubes):
     """Raise an error for concatenation."""
     # Concatenation not successful -> retrieve exact error message
@@ -171,6 +160,155 @@ def _get_concatenation_error(cubes):
     raise ValueError(f'Can not concatenate cubes: {msg}')
 
 
+def _check_time_units(cubes):
+    """Check that all cubes have the same time units."""
+    time_1 = cubes[0].coord('time')
+    for cube in cubes[1:]:
+        time_2 = cube.coord('time')
+        if time_1.units != time_2.units:
+            raise ValueError(
+                f"Cubes\n{cubes[0]}\nand\n{cube}\ncan not be concatenated: "
+                f"time units {time_1.units}, calendar "
+                f"{time_1.units.calendar} and {time_2.units}, calendar "
+                f"{time_2.units.calendar} differ")
+
+
+def _get_first_common_point(points_list, points):
+    """Return the first value in `points_list` that is also in `points`."""
+    # Only the last arrays can overlap with points
+    first = len(points_list)
+    while first > 0 and points_list[first - 1][-1] >= points[0]:
+        first -= 1
+    for candidates in points_list[first:]:
+        candidates = candidates[candidates >= points[0]]
+        common = candidates[np.isin(candidates, points)]
+        if common.size:
+            return common[0]
+    return None
+
+
+def _slice_time(cube, index):
+    """Slice a cube along its time dimension."""
+    slices = [slice(None)] * cube.ndim
+    slices[cube.coord_dims('time')[0]] = index
+    return cube[tuple(slices)]
+
+
+def _trim_time(cubes, points_list, end):
+    """Remove the time points from the day of `end` onwards.
+
+    The cubes must be sorted and their time coordinates must not overlap.
+    """
+    units = cubes[0].coord('time').units
+    end = units.num2date(end)
+    end_day = units.date2num(
+        end.replace(hour=0, minute=0, second=0, microsecond=0))
+    n_keep = sum(1 for points in points_list if points[-1] < end_day)
+
+    if n_keep == 0:
+        cube = cubes[0]
+        start = cube.coord('time').cell(0).point
+        logger.debug(
+            "Extracting time slice between %s-%s-%s and %s-%s-%s from cube "
+            "%s", start.year, start.month, start.day, end.year, end.month,
+            end.day, cube)
+        return [
+            extract_time(cube, start.year, start.month, start.day, end.year,
+                         end.month, end.day)
+        ]
+
+    trimmed = list(cubes[:n_keep])
+    if n_keep < len(cubes):
+        n_last = np.searchsorted(points_list[n_keep], end_day)
+        if n_last > 0:
+            trimmed.append(_slice_time(cubes[n_keep], slice(None, n_last)))
+
+    if (len(trimmed) == 1 and len(points_list[0]) == 1
+            and trimmed[0].coord_dims('time')):
+        # Like extract_time, turn a single remaining time point into a
+        # scalar coordinate
+        trimmed = [_slice_time(trimmed[0], 0)]
+    return trimmed
+
+
+def _concatenate_trimmed(cubes):
+    """Concatenate cubes after removing time overlaps."""
+    try:
+        return iris.cube.CubeList(cubes).concatenate_cube()
+    except iris.exceptions.ConcatenateError as exc:
+        logger.error('Can not concatenate cubes: %s', exc)
+        logger.error('Cubes:')
+        for cube in cubes:
+            logger.error(cube)
+        raise
+
+
+def _remove_time_overlaps(cubes):
+    """Select the (parts of) cubes that together cover the time range.
+
+    The cubes must be sorted by their first time point and have the same
+    time units. Where cubes overlap in time, the data from the cube that
+    starts later is used, unless it lies completely within the time range
+    covered by the cubes before it or it starts at the same time as the first
+    cube and ends earlier. The overlap is resolved using the time points only,
+    so every cube is sliced at most once.
+
+    Returns
+    -------
+    tuple(list, bool)
+        The cubes that can be concatenated and a flag indicating whether any
+        of them were trimmed.
+    """
+    selected = [cubes[0]]
+    points_list = [cubes[0].coord('time').points]
+    trimmed = False
+    for cube in cubes[1:]:
+        points = cube.coord('time').points
+        start, end = points[0], points[-1]
+        result_start = points_list[0][0]
+        result_end = points_list[-1][-1]
+
+        # No overlap
+        if start > result_end:
+            selected.append(cube)
+            points_list.append(points)
+            continue
+
+        # Both start at the same time -> use the one that ends last
+        if start == result_start:
+            if result_end <= end:
+                logger.debug("Cube %s contains all needed data so using it "
+                             "fully", cube)
+                selected = [cube]
+                points_list = [points]
+            continue
+
+        overlap = _get_first_common_point(points_list, points)
+        if overlap is None:
+            logger.debug(
+                "Unable to concatenate non-overlapping cubes\n%s\nand\n%s"
+                "separated in time.", selected, cube)
+            _get_concatenation_error(selected + [cube])
+
+        # Cube lies within the time range covered so far -> ignore it
+        if result_end > end:
+            logger.debug("Ignoring cube %s", cube)
+            continue
+
+        # Cube ends last -> use it fully and shorten the cubes before it
+        selected = _trim_time(selected, points_list, overlap)
+        if not selected[-1].coord_dims('time'):
+            _concatenate_trimmed(selected + [cube])
+        # Only the last of the remaining cubes may have been changed
+        points_list = points_list[:len(selected) - 1]
+        points_list.append(selected[-1].coord('time').points)
+        selected.append(cube)
+        points_list.append(points)
+        trimmed = True
+
+    return selected, trimmed
+
+
 def concatenate(cubes):
     """Concatenate all cubes after fixing metadata."""
     if len(cubes) == 1:
@@ -187,10 +325,18 @@ def concatenate(cubes):
                   " time coordinate: {}".format(str(exc))
             raise ValueError(msg)
 
-        # iteratively concatenate starting with first cube
-        result = cubes[0]
-        for cube in cubes[1:]:
-            result = _by_two_concatenation([result, cube])
+        _check_time_units(cubes)
+        cubes, trimmed = _remove_time_overlaps(cubes)
+        if len(cubes) == 1:
+            result = cubes[0]
+        else:
+            if trimmed:
+                result = _concatenate_trimmed(cubes)
+            else:
+                try:
+                    result = iris.cube.CubeList(cubes).concatenate_cube()
+                except iris.exceptions.ConcatenateError:
+                    _get_concatenation_error(cubes)
 
     _fix_aux_factories(result)
 
@@ -269,11 +415,34 @@ def save(cubes, filename, optimize_access='', compress=False, alias='',
             logger.debug(
                 'Changing var_name from %s to %s', cube.var_name, alias)
             cube.var_name = alias
-    iris.save(cubes, **kwargs)
+
+    client = get_distributed_client()
+    if client is None:
+        iris.save(cubes, **kwargs)
+    else:
+        _save_distributed(client, cubes, kwargs)
 
     return filename
 
 
+def _save_distributed(client, cubes, kwargs):
+    """Save cubes with lazy data computed by a distributed scheduler.
+
+    The lazy data is computed on the cluster and written to file chunk by
+    chunk from this process, because open files cannot be sent to the
+    workers.
+    """
+    cubes = [cube.copy(fetch_from_cluster(client, cube.lazy_data()))
+             if cube.has_lazy_data() else cube for cube in cubes]
+    with catch_warnings(), dask.config.set(scheduler='threads'):
+        filterwarnings(
+            'ignore',
+            message="Running on a single-machine scheduler",
+            category=UserWarning,
+        )
+        iris.save(cubes, **kwargs)
+
+
 def _get_debug_filename(filename, step):
     """Get a filename for debugging the preprocessor."""
     dirname = os.path.splitext(filename)[0]
@@ -359,95 +528,3 @@ def _write_ncl_metadata(output_dir, metadata):
     write_ncl_settings(info, filename)
 
     return filename
-
-
-def _concatenate_overlapping_cubes(cubes):
-    """Concatenate time-overlapping cubes (two cubes only)."""
-    # we arrange [cube1, cube2] so that cube1.start <= cube2.start
-    if cubes[0].coord('time').points[0] <= cubes[1].coord('time').points[0]:
-        cubes = [cubes[0], cubes[1]]
-        logger.debug(
-            "Will attempt to concatenate cubes %s "
-            "and %s in this order", cubes[0], cubes[1])
-    else:
-        cubes = [cubes[1], cubes[0]]
-        logger.debug(
-            "Will attempt to concatenate cubes %s "
-            "and %s in this order", cubes[1], cubes[0])
-
-    # get time end points
-    time_1 = cubes[0].coord('time')
-    time_2 = cubes[1].coord('time')
-    if time_1.units != time_2.units:
-        raise ValueError(
-            f"Cubes\n{cubes[0]}\nand\n{cubes[1]}\ncan not be concatenated: "
-            f"time units {time_1.units}, calendar {time_1.units.calendar} "
-            f"and {time_2.units}, calendar {time_2.units.calendar} differ")
-    data_start_1 = time_1.cell(0).point
-    data_start_2 = time_2.cell(0).point
-    data_end_1 = time_1.cell(-1).point
-    data_end_2 = time_2.cell(-1).point
-
-    # case 1: both cubes start at the same time -> return longer cube
-    if data_start_1 == data_start_2:
-        if data_end_1 <= data_end_2:
-            logger.debug(
-                "Both cubes start at the same time but cube %s "
-                "ends before %s", cubes[0], cubes[1])
-            logger.debug("Cube %s contains all needed data so using it fully",
-                         cubes[1])
-            cubes = [cubes[1]]
-        else:
-            logger.debug(
-                "Both cubes start at the same time but cube %s "
-                "ends before %s", cubes[1], cubes[0])
-            logger.debug("Cube %s contains all needed data so using it fully",
-                         cubes[0])
-            cubes = [cubes[0]]
-
-    # case 2: cube1 starts before cube2
-    else:
-        # find time overlap, if any
-        start_overlap = next((time_1.units.num2date(t)
-                              for t in time_1.points if t in time_2.points),
-                             None)
-        # case 2.0: no overlap (new iris implementation does allow
-        # concatenation of cubes with no overlap)
-        if not start_overlap:
-            logger.debug(
-                "Unable to concatenate non-overlapping cubes\n%s\nand\n%s"
-                "separated in time.", cubes[0], cubes[1])
-        # case 2.1: cube1 ends after cube2 -> return cube1
-        elif data_end_1 > data_end_2:
-            cubes = [cubes[0]]
-            logger.debug("Using only data from %s", cubes[0])
-        # case 2.2: cube1 ends before cube2 -> use full cube2 and shorten cube1
-        else:
-            logger.debug(
-                "Extracting time slice between %s and %s from cube %s to use "
-                "it for concatenation with cube %s", "-".join([
-                    str(data_start_1.year),
-                    str(data_start_1.month),
-                    str(data_start_1.day)
-                ]), "-".join([
-                    str(start_overlap.year),
-                    str(start_overlap.month),
-                    str(start_overlap.day)
-                ]), cubes[0], cubes[1])
-            c1_delta = extract_time(cubes[0], data_start_1.year,
-                                    data_start_1.month, data_start_1.day,
-                                    start_overlap.year, start_overlap.month,
-                                    start_overlap.day)
-            cubes = iris.cube.CubeList([c1_delta, cubes[1]])
-            logger.debug("Attempting concatenatenation of %s with %s",
-                         c1_delta, cubes[1])
-            try:
-                cubes = [iris.cube.CubeList(cubes).concatenate_cube()]
-            except iris.exceptions.ConcatenateError as ex:
-                logger.error('Can not concatenate cubes: %s', ex)
-                logger.error('Cubes:')
-                for cube in cubes:
-                    logger.error(cube)
-                raise ex
-
-    return cubes
@@ -3,6 +3,7 @@
 
 import collections
 
+import dask.array as da
 import iris
 import numpy as np
 
@@ -149,24 +150,6 @@ def get_slice_spec(cube, ref_to_slice):
     return slice_shape, dim_coords, aux_coords
 
 
-def index_iterator(dims_to_slice, shape):
-    """
-    Return iterator for subsets of multidimensional objects.
-
-    An iterator over a multidimensional object, giving both source and
-    destination indices.
-    """
-    dst_slices = (slice(None, None),) * len(dims_to_slice)
-    dims = [1 if n in dims_to_slice else i for n, i in enumerate(shape)]
-    for index_tuple in np.ndindex(*dims):
-        src_ind = tuple(
-            slice(None, None) if n in dims_to_slice else i
-            for n, i in enumerate(index_tuple))
-        dst_ind = tuple(i for n, i in enumerate(index_tuple)
-                        if n not in dims_to_slice) + dst_slices
-        yield src_ind, dst_ind
-
-
 def get_slice_coords(cube):
     """Return ordered set of unique coordinates."""
     slice_coords = []
@@ -191,12 +174,20 @@ def map_slices(src, func, src_rep, dst_rep):
     be the last dimensions of the resulting cube, even if the removed
     dimensions are can be any of the source cubes dimensions.
 
+    The slices are not mapped one by one. Instead, the data is lazily
+    reshaped into an array with one flattened slice per row, which is chunked
+    along the rows only, and `func` is applied to each chunk. The data of the
+    resulting cube is lazy.
+
     Parameters
     ----------
     src: :class:`iris.cube.Cube`
         Source cube to be mapped.
     func: callable
-        Callable that takes a single cube and returns a single numpy array.
+        Callable that takes a two dimensional (masked) numpy array with a
+        flattened source slice in each row and returns a two dimensional
+        (masked) numpy array with the corresponding flattened destination
+        slice in each row.
     src_rep: :class:`iris.cube.Cube`
         Source representant that specifies the dimensions to be removed from
         the source cube.
@@ -214,16 +205,16 @@ def map_slices(src, func, src_rep, dst_rep):
         `dst_rep`.
     """
     ref_to_slice = get_slice_coords(src_rep)
-    src_slice_dims = ref_to_dims_index(src, ref_to_slice)
-    src_keep_dims = list(set(range(src.ndim)) - set(src_slice_dims))
+    src_slice_dims = sorted(ref_to_dims_index(src, ref_to_slice))
+    src_keep_dims = sorted(set(range(src.ndim)) - set(src_slice_dims))
     src_keep_spec = get_slice_spec(src, src_keep_dims)
-    res_shape = src_keep_spec[0] + dst_rep.shape
     dim_coords = src_keep_spec[1] + dst_rep.coords(dim_coords=True)
     dim_coords_and_dims = [(c, i) for i, c in enumerate(dim_coords)]
     aux_coords_and_dims = [(c, src.coord_dims(c)) for c in src_keep_spec[2]]
     aux_coords_and_dims += [(c, src.coord_dims(c)) for c in dst_rep.aux_coords]
     dst = iris.cube.Cube(
-        data=get_empty_data(res_shape, dtype=src.dtype),
+        data=_map_slices_lazy(src.lazy_data(), func, src_keep_dims,
+                              src_slice_dims, dst_rep.shape, src.dtype),
         standard_name=src.standard_name,
         long_name=src.long_name,
         var_name=src.var_name,
@@ -233,7 +224,32 @@ def map_slices(src, func, src_rep, dst_rep):
         dim_coords_and_dims=dim_coords_and_dims,
         aux_coords_and_dims=aux_coords_and_dims,
     )
-    for src_ind, dst_ind in index_iterator(src_slice_dims, src.shape):
-        res = func(src[src_ind])
-        dst.data[dst_ind] = res
     return dst
+
+
+def _map_slices_lazy(data, func, keep_dims, slice_dims, dst_shape, dtype):
+    """Apply `func` to a lazy array reshaped to one slice per row."""
+    keep_shape = tuple(data.shape[d] for d in keep_dims)
+    slice_size = int(np.prod([data.shape[d] for d in slice_dims]))
+    dst_size = int(np.prod(dst_shape))
+    # Move the sliced dimensions to the end and make sure they are in a
+    # single chunk, so flattening them does not require any data movement.
+    data = da.transpose(data, keep_dims + slice_dims)
+    chunks = {i: 'auto' for i in range(len(keep_dims))}
+    chunks.update({i: -1 for i in range(len(keep_dims), data.ndim)})
+    data = data.rechunk(chunks)
+    data = data.reshape(keep_shape + (slice_size, ), merge_chunks=False)
+    if keep_dims:
+        data = data.reshape((-1, slice_size), merge_chunks=False)
+    else:
+        data = data[np.newaxis]
+
+    def _map_block(block):
+        result = func(block)
+        return result.reshape(block.shape[:-1] + (dst_size, ))
+
+    res = data.map_blocks(_map_block,
+                          chunks=(data.chunks[0], (dst_size, )),
+                          dtype=dtype,
+                          meta=np.ma.masked_array(np.empty((0, 0), dtype)))
+    return res.reshape(keep_shape + tuple(dst_shape))
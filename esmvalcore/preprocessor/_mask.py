@@ -7,18 +7,26 @@ Natural Earth shapefiles (land or ocean), masking on thresholds,
 missing values masking.
 """
 
+import hashlib
 import logging
 import os
+from collections import OrderedDict
 
 import cartopy.io.shapereader as shpreader
+import dask.array as da
 import iris
 import numpy as np
 import shapely.vectorized as shp_vect
-from iris.analysis import Aggregator
 from iris.util import rolling_window
 
+from .. import _cache
+
 logger = logging.getLogger(__name__)
 
+# The most recently used masks, keyed by grid, shapefile and regions.
+_SHAPEFILE_MASKS = OrderedDict()
+_MAX_CACHED_SHAPEFILE_MASKS = 16
+
 
 def _check_dims(cube, mask_cube):
     """Check for same ndim and x-y dimensions for data and mask cubes."""
@@ -306,6 +314,103 @@ def _get_geometries_from_shp(shapefilename):
     return geometries
 
 
+def _get_shp_mask_key(lon, lat, shapefilename, region_indices):
+    """Compute a hash of everything that determines a shapefile mask."""
+    stat = os.stat(shapefilename)
+    key = hashlib.sha256()
+    key.update(
+        repr((os.path.realpath(shapefilename), stat.st_size,
+              stat.st_mtime_ns, region_indices)).encode())
+    for points in (lon, lat):
+        points = np.ascontiguousarray(points, dtype=np.float64)
+        key.update(repr(points.shape).encode())
+        key.update(points.tobytes())
+    return key.hexdigest()
+
+
+def _compute_shp_mask(lon, lat, shapefilename, region_indices):
+    """Compute a (lat, lon) mask that is `True` inside the regions."""
+    # Create the region
+    regions = _get_geometries_from_shp(shapefilename)
+    if region_indices:
+        regions = [regions[idx] for idx in region_indices]
+
+    # Create a set of x,y points from the cube
+    x_p, y_p = np.meshgrid(lon, lat)
+
+    # Wrap around longitude coordinate to match data
+    x_p_180 = np.where(x_p >= 180., x_p - 360., x_p)
+    # the NE mask has no points at x = -180 and y = +/-90
+    # so we will fool it and apply the mask at (-179, -89, 89) instead
+    x_p_180 = np.where(x_p_180 == -180., x_p_180 + 1., x_p_180)
+    y_p_0 = np.where(y_p == -90., y_p + 1., y_p)
+    y_p_90 = np.where(y_p_0 == 90., y_p_0 - 1., y_p_0)
+
+    mask = np.zeros(x_p.shape, dtype=bool)
+    for region in regions:
+        # Build mask with vectorization
+        mask |= shp_vect.contains(region, x_p_180, y_p_90)
+    return mask
+
+
+def _load_shp_mask(filename, shape):
+    """Load a cached mask from file, return None on failure."""
+    if filename is None or not os.path.exists(filename):
+        return None
+    try:
+        mask = np.load(filename)
+    except (OSError, ValueError, EOFError) as exc:
+        logger.debug("Unable to read mask from %s: %s", filename, exc)
+        return None
+    if mask.shape != shape:
+        return None
+    _cache.touch(filename)
+    return mask
+
+
+def _save_shp_mask(filename, mask):
+    """Save a mask to file, if possible."""
+    if filename is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Write to a temporary file first, so other processes never
+        # read an incomplete file
+        tmp_file = f'{filename}.{os.getpid()}.tmp.npy'
+        np.save(tmp_file, mask)
+        os.replace(tmp_file, filename)
+    except OSError as exc:
+        logger.debug("Unable to save mask to %s: %s", filename, exc)
+        return
+    _cache.prune()
+
+
+def _get_shp_mask(lon, lat, shapefilename, region_indices):
+    """Get a mask from a shapefile, from the cache if possible.
+
+    The masks are cached in memory and, if the ``cache_dir`` option is set,
+    on disk, so they are computed only once for each combination of grid,
+    shapefile and regions.
+    """
+    key = _get_shp_mask_key(lon, lat, shapefilename, region_indices)
+    if key in _SHAPEFILE_MASKS:
+        _SHAPEFILE_MASKS.move_to_end(key)
+        return _SHAPEFILE_MASKS[key]
+
+    filename = _cache.get_cache_path('shapefile_masks', f'{key}.npy')
+    mask = _load_shp_mask(filename, (len(lat), len(lon)))
+    if mask is None:
+        mask = _compute_shp_mask(lon, lat, shapefilename, region_indices)
+        _save_shp_mask(filename, mask)
+    else:
+        logger.debug("Using mask from %s", filename)
+
+    _SHAPEFILE_MASKS[key] = mask
+    while len(_SHAPEFILE_MASKS) > _MAX_CACHED_SHAPEFILE_MASKS:
+        _SHAPEFILE_MASKS.popitem(last=False)
+    return mask
+
+
 def _mask_with_shp(cube, shapefilename, region_indices=None):
     """
     Apply a Natural Earth land/sea mask.
@@ -318,50 +423,35 @@ def _mask_with_shp(cube, shapefilename, region_indices=None):
     region_indices is a list of indices that the user will want to index
     the regions on (select a region by its index as it is listed in
     the shapefile).
-    """
-    # Create the region
-    regions = _get_geometries_from_shp(shapefilename)
-    if region_indices:
-        regions = [regions[idx] for idx in region_indices]
-
-    # Create a mask for the data
-    mask = np.zeros(cube.shape, dtype=bool)
 
-    # Create a set of x,y points from the cube
+    The mask is computed only once for each grid (see
+    :func:`_get_shp_mask`) and applied lazily.
+    """
     # 1D regular grids
-    if cube.coord('longitude').points.ndim < 2:
-        x_p, y_p = np.meshgrid(
-            cube.coord(axis='X').points,
-            cube.coord(axis='Y').points)
+    lon = cube.coord('longitude')
+    lat = cube.coord('latitude')
     # 2D irregular grids; spit an error for now
-    else:
+    if lon.points.ndim > 1:
         msg = ("No fx-files found (sftlf or sftof)!"
                "2D grids are suboptimally masked with "
                "Natural Earth masks. Exiting.")
         raise ValueError(msg)
 
-    # Wrap around longitude coordinate to match data
-    x_p_180 = np.where(x_p >= 180., x_p - 360., x_p)
-    # the NE mask has no points at x = -180 and y = +/-90
-    # so we will fool it and apply the mask at (-179, -89, 89) instead
-    x_p_180 = np.where(x_p_180 == -180., x_p_180 + 1., x_p_180)
-    y_p_0 = np.where(y_p == -90., y_p + 1., y_p)
-    y_p_90 = np.where(y_p_0 == 90., y_p_0 - 1., y_p_0)
-
-    for region in regions:
-        # Build mask with vectorization
-        if cube.ndim == 2:
-            mask = shp_vect.contains(region, x_p_180, y_p_90)
-        elif cube.ndim == 3:
-            mask[:] = shp_vect.contains(region, x_p_180, y_p_90)
-        elif cube.ndim == 4:
-            mask[:, :] = shp_vect.contains(region, x_p_180, y_p_90)
-
-        # Then apply the mask
-        if isinstance(cube.data, np.ma.MaskedArray):
-            cube.data.mask |= mask
-        else:
-            cube.data = np.ma.masked_array(cube.data, mask)
+    mask = _get_shp_mask(lon.points, lat.points, shapefilename,
+                         region_indices)
+
+    # Then apply the mask, broadcast to the shape of the data
+    lon_dim, = cube.coord_dims(lon)
+    lat_dim, = cube.coord_dims(lat)
+    if lon_dim < lat_dim:
+        mask = mask.T
+    shape = [1] * cube.ndim
+    shape[lat_dim] = len(lat.points)
+    shape[lon_dim] = len(lon.points)
+    data = cube.lazy_data()
+    mask = da.broadcast_to(mask.reshape(shape), cube.shape,
+                           chunks=data.chunks)
+    cube.data = da.ma.masked_where(mask, data)
 
     return cube
 
@@ -574,9 +664,11 @@ def mask_fillvalues(products,
     used = set()
     for product in products:
         for cube in product.cubes:
-            cube.data = np.ma.fix_invalid(cube.data, copy=False)
-            mask = _get_fillvalues_mask(cube, threshold_fraction,
-                                        min_value, time_window)
+            cube.data = da.ma.masked_invalid(cube.core_data())
+            # Compute the mask of one dataset at a time, so only the
+            # (small) combined mask is kept in memory.
+            mask = _get_fillvalues_mask(cube, threshold_fraction, min_value,
+                                        time_window).compute()
             if combined_mask is None:
                 combined_mask = np.zeros_like(mask)
             # Select only valid (not all masked) pressure levels
@@ -600,7 +692,10 @@ def mask_fillvalues(products,
         used = {p.copy_provenance() for p in used}
         for product in products:
             for cube in product.cubes:
-                cube.data.mask |= combined_mask
+                time_dim = cube.coord_dims('time')[0]
+                mask = da.broadcast_to(
+                    np.expand_dims(combined_mask, time_dim), cube.shape)
+                cube.data = da.ma.masked_where(mask, cube.core_data())
             for other in used:
                 if other.filename != product.filename:
                     product.wasderivedfrom(other)
@@ -614,10 +709,15 @@ def _get_fillvalues_mask(cube, threshold_fraction, min_value, time_window):
 
     Construct the mask that fills a certain time window with missing values
     if the number of values in that specific window is less than a given
-    fractional threshold; it uses a custom iris Aggregator function that
-    aggregates the cube data by a given time window and counts the number of
-    valid (unmasked) data points within that window;
+    fractional threshold; the time axis is split into consecutive windows
+    of `time_window` points and the number of windows with valid (unmasked)
+    data is counted lazily, in the same way as :func:`count_spells`;
     a simple value thresholding is also applied if needed.
+
+    Returns
+    -------
+    dask.array.Array
+        The mask, with the shape of the cube without the time dimension.
     """
     # basic checks
     if threshold_fraction < 0 or threshold_fraction > 1.0:
@@ -633,20 +733,26 @@ def _get_fillvalues_mask(cube, threshold_fraction, min_value, time_window):
     # round to lower integer
     counts_threshold = int(max_counts_per_time_window * threshold_fraction)
 
-    # Make an aggregator
-    spell_count = Aggregator('spell_count',
-                             count_spells,
-                             units_func=lambda units: 1)
-
-    # Calculate the statistic.
-    counts_windowed_cube = cube.collapsed('time',
-                                          spell_count,
-                                          threshold=min_value,
-                                          spell_length=time_window)
+    # Move time to the front and split it into non-overlapping windows,
+    # points that do not fill a complete window are left out.
+    time_dim = cube.coord_dims('time')[0]
+    data = da.moveaxis(cube.core_data(), time_dim, 0)
+    spell_length = int(time_window)
+    n_windows = nr_time_points // spell_length
+    data = data[:n_windows * spell_length]
+    data = data.reshape((n_windows, spell_length) + data.shape[1:])
+
+    if not min_value:
+        hits = da.ma.getdata(data).astype(bool)
+    else:
+        hits = da.ma.getdata(data) > float(min_value)
+    valid = ~da.ma.getmaskarray(data)
 
-    # Create mask
-    mask = counts_windowed_cube.data < counts_threshold
-    if np.ma.isMaskedArray(mask):
-        mask = mask.data | mask.mask
+    # A window is counted if all its valid points exceed the threshold;
+    # windows without valid points are not counted.
+    full_windows = da.all(hits | ~valid, axis=1) & da.any(valid, axis=1)
+    counts = da.sum(full_windows, axis=0)
 
+    # Points without any valid window are always masked
+    mask = (counts < counts_threshold) | ~da.any(valid, axis=(0, 1))
     return mask
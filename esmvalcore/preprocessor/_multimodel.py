@@ -2,119 +2,86 @@
 
 import logging
 import re
+import warnings
 from datetime import datetime
 from functools import partial, reduce
 
 import cf_units
+import dask.array as da
 import iris
 import numpy as np
-import scipy
 
 logger = logging.getLogger(__name__)
 
 
-def _plev_fix(dataset, pl_idx):
-    """Extract valid plev data.
-
-    This function takes care of situations in which certain plevs are
-    completely masked due to unavailable interpolation boundaries.
-    """
-    if np.ma.is_masked(dataset):
-        # keep only the valid plevs
-        if not np.all(dataset.mask[pl_idx]):
-            statj = np.ma.array(dataset[pl_idx], mask=dataset.mask[pl_idx])
-        else:
-            logger.debug('All vals in plev are masked, ignoring.')
-            statj = None
-    else:
-        mask = np.zeros_like(dataset[pl_idx], bool)
-        statj = np.ma.array(dataset[pl_idx], mask=mask)
-
-    return statj
-
-
 def _quantile(data, axis, quantile):
     """Calculate quantile.
 
-    Workaround for calling scipy's mquantiles with arrays of >2
-    dimensions Similar to iris' _percentiles function, see their
-    discussion: https://github.com/SciTools/iris/pull/625
+    Masked values are ignored. The interpolation matches scipy's
+    ``mquantiles`` with ``alphap=1`` and ``betap=1``, but the computation is
+    vectorized over all other dimensions.
     """
-    # Ensure that the target axis is the last dimension.
-    data = np.rollaxis(data, axis, start=data.ndim)
-    shape = data.shape[:-1]
-    # Flatten any leading dimensions.
-    if shape:
-        data = data.reshape([np.prod(shape), data.shape[-1]])
-    # Perform the quantile calculation.
-    result = scipy.stats.mstats.mquantiles(data,
-                                           quantile,
-                                           axis=-1,
-                                           alphap=1,
-                                           betap=1)
-    # Ensure to unflatten any leading dimensions.
-    if shape:
-        result = result.reshape(shape)
-    # Check whether to reduce to a scalar result
-    if result.shape == (1, ):
-        result = result[0]
+    data = np.ma.filled(np.ma.asarray(data, dtype=np.float64), np.nan)
+    with warnings.catch_warnings():
+        # Columns without any valid data produce all-NaN slice warnings
+        warnings.filterwarnings('ignore', category=RuntimeWarning)
+        result = np.nanquantile(data, quantile, axis=axis)
+    return np.ma.masked_invalid(result)
 
-    return result
-
-
-def _compute_statistic(data, statistic_name):
-    """Compute multimodel statistic."""
-    data = np.ma.array(data)
-    statistic = data[0]
 
+def _get_statistic_function(statistic_name):
+    """Get the function that computes a statistic along an axis."""
     if statistic_name == 'median':
-        statistic_function = np.ma.median
-    elif statistic_name == 'mean':
-        statistic_function = np.ma.mean
-    elif statistic_name == 'std':
-        statistic_function = np.ma.std
-    elif statistic_name == 'max':
-        statistic_function = np.ma.max
-    elif statistic_name == 'min':
-        statistic_function = np.ma.min
-    elif re.match(r"^(p\d{1,2})(\.\d*)?$", statistic_name):
+        return np.ma.median
+    if statistic_name == 'mean':
+        return np.ma.mean
+    if statistic_name == 'std':
+        return np.ma.std
+    if statistic_name == 'max':
+        return np.ma.max
+    if statistic_name == 'min':
+        return np.ma.min
+    if re.match(r"^(p\d{1,2})(\.\d*)?$", statistic_name):
         # percentiles between p0 and p99.99999...
         quantile = float(statistic_name[1:]) / 100
-        statistic_function = partial(_quantile, quantile=quantile)
-    else:
-        raise ValueError(f'No such statistic: `{statistic_name}`')
+        return partial(_quantile, quantile=quantile)
+    raise ValueError(f'No such statistic: `{statistic_name}`')
 
-    # no plevs
-    if len(data[0].shape) < 3:
-        # get all NOT fully masked data - u_data
-        # data is per time point
-        # so we can safely NOT compute stats for single points
-        if data.ndim == 1:
-            u_datas = data
-        else:
-            u_datas = [d for d in data if not np.all(d.mask)]
-        if len(u_datas) > 1:
-            statistic = statistic_function(data, axis=0)
-        else:
-            statistic.mask = True
-        return statistic
 
-    # plevs
-    for j in range(statistic.shape[0]):
-        plev_check = []
-        for cdata in data:
-            fixed_data = _plev_fix(cdata, j)
-            if fixed_data is not None:
-                plev_check.append(fixed_data)
-
-        # check for nr datasets
-        if len(plev_check) > 1:
-            plev_check = np.ma.array(plev_check)
-            statistic[j] = statistic_function(plev_check, axis=0)
-        else:
-            statistic.mask[j] = True
+def _get_valid_mask(data):
+    """Find the points where enough datasets are available.
 
-    return statistic
+    `data` has the datasets along the first and time along the second
+    dimension. Statistics are only computed for a time point (or, for data
+    with a vertical axis, a time point and level) if more than one dataset
+    is not fully masked there.
+    """
+    if data.ndim <= 2:
+        # Scalar data per time point, always compute statistics
+        return np.ones(data.shape[1:], dtype=bool)
+    mask = np.ma.getmaskarray(data)
+    # For data with a vertical axis, check each level separately
+    n_keep = 3 if data.ndim >= 5 else 2
+    has_data = ~np.all(mask, axis=tuple(range(n_keep, data.ndim)))
+    valid = np.sum(has_data, axis=0) > 1
+    return valid.reshape(valid.shape + (1, ) * (data.ndim - n_keep))
+
+
+def _compute_statistics(data, statistics):
+    """Compute several multimodel statistics in a single pass.
+
+    `data` has the datasets along the first dimension. The result has the
+    statistics along the first dimension.
+    """
+    data = np.ma.asarray(data)
+    result = np.ma.empty((len(statistics), ) + data.shape[1:],
+                         dtype=np.float32)
+    for i, statistic_name in enumerate(statistics):
+        statistic_function = _get_statistic_function(statistic_name)
+        result[i] = statistic_function(data, axis=0)
+    valid = np.broadcast_to(_get_valid_mask(data), result.shape[1:])
+    result[:, ~valid] = np.ma.masked
+    return result
 
 
 def _put_in_cube(template_cube, cube_data, statistic, t_axis):
@@ -242,46 +209,52 @@ def _unify_time_coordinates(cubes):
         cube.coord('time').guess_bounds()
 
 
-def _get_time_slice(cubes, time):
-    """Fill time slice array with cubes' data if time in cube, else mask."""
-    time_slice = []
-    for cube in cubes:
-        cube_time = cube.coord('time').points
-        if time in cube_time:
-            idx = int(np.argwhere(cube_time == time))
-            subset = cube.data[idx]
-        else:
-            subset = np.ma.empty(list(cube.shape[1:]))
-            subset.mask = True
-        time_slice.append(subset)
-    return time_slice
+def _align_time(cube, new_times):
+    """Lazily select `new_times` from cube data, masking missing times."""
+    cube_times = cube.coord('time').points
+    idx = np.searchsorted(cube_times, new_times)
+    idx = np.clip(idx, 0, len(cube_times) - 1)
+    present = cube_times[idx] == new_times
+    data = cube.lazy_data()[np.where(present, idx, 0)]
+    missing = (~present).reshape((-1, ) + (1, ) * (data.ndim - 1))
+    missing = da.broadcast_to(missing, data.shape, chunks=data.chunks)
+    return da.ma.masked_where(missing, data)
+
 
+def _assemble_data(cubes, statistics, span='overlap'):
+    """Get statistical data in iris cubes.
 
-def _assemble_data(cubes, statistic, span='overlap'):
-    """Get statistical data in iris cubes."""
+    The data of all cubes is stacked lazily along a new first dimension,
+    aligned on the common time coordinate. All statistics are computed in a
+    single pass over chunks along the time dimension, so the full ensemble
+    is never loaded into memory at once.
+    """
     # New time array representing the union or intersection of all cubes
     time_spans = [cube.coord('time').points for cube in cubes]
     if span == 'overlap':
         new_times = reduce(np.intersect1d, time_spans)
     elif span == 'full':
         new_times = reduce(np.union1d, time_spans)
-    n_times = len(new_times)
 
-    # Target array to populate with computed statistics
-    new_shape = [n_times] + list(cubes[0].shape[1:])
-    stats_data = np.ma.zeros(new_shape, dtype=np.dtype('float32'))
+    stack = da.stack([_align_time(cube, new_times) for cube in cubes])
+    chunks = {0: -1, 1: 'auto'}
+    chunks.update({dim: -1 for dim in range(2, stack.ndim)})
+    stack = stack.rechunk(chunks)
 
-    # Realize all cubes at once instead of separately for each time slice
-    _ = [cube.data for cube in cubes]
-
-    # Make time slices and compute stats
-    for i, time in enumerate(new_times):
-        time_data = _get_time_slice(cubes, time)
-        stats_data[i] = _compute_statistic(time_data, statistic)
+    stats_data = da.map_blocks(
+        _compute_statistics,
+        stack,
+        statistics=statistics,
+        chunks=((len(statistics), ), ) + stack.chunks[1:],
+        dtype=np.float32,
+        meta=np.ma.array((), dtype=np.float32),
+    ).compute()
 
     template = cubes[0]
-    stats_cube = _put_in_cube(template, stats_data, statistic, new_times)
-    return stats_cube
+    return {
+        statistic: _put_in_cube(template, stats_data[i], statistic, new_times)
+        for i, statistic in enumerate(statistics)
+    }
 
 
 def _multicube_statistics(cubes, statistics, span):
@@ -347,12 +320,7 @@ def _multicube_statistics(cubes, statistics, span):
             format(span))
 
     # Compute statistics
-    statistics_cubes = {}
-    for statistic in statistics:
-        statistic_cube = _assemble_data(cubes, statistic, span)
-        statistics_cubes[statistic] = statistic_cube
-
-    return statistics_cubes
+    return _assemble_data(cubes, statistics, span)
 
 
 def _multiproduct_statistics(products, statistics, output_products, span=None):
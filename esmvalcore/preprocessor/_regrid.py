@@ -1,7 +1,9 @@
 """Horizontal and vertical regridding module."""
 
+import hashlib
 import os
 import re
+from collections import OrderedDict
 from copy import deepcopy
 
 import iris
@@ -9,7 +11,6 @@ import numpy as np
 import stratify
 from dask import array as da
 from iris.analysis import AreaWeighted, Linear, Nearest, UnstructuredNearest
-from iris.util import broadcast_to_shape
 
 from ..cmor._fixes.shared import add_altitude_from_plev, add_plev_from_altitude
 from ..cmor.fix import fix_file, fix_metadata
@@ -41,6 +42,16 @@ _LON_RANGE = _LON_MAX - _LON_MIN
 # A cached stock of standard horizontal target grids.
 _CACHE = dict()
 
+# Target grids loaded from file and their modification time, keyed by path,
+# least recently used first.
+_GRID_FILES = OrderedDict()
+_MAX_CACHED_GRID_FILES = 8
+
+# Regridders that have been prepared for a source and target grid, least
+# recently used first.
+_REGRIDDERS = OrderedDict()
+_MAX_CACHED_REGRIDDERS = 16
+
 # Supported point interpolation schemes.
 POINT_INTERPOLATION_SCHEMES = {
     'linear': Linear(extrapolation_mode='mask'),
@@ -303,16 +314,18 @@ def regrid(cube, target_grid, scheme, lat_offset=True, lon_offset=True):
 
     if isinstance(target_grid, str):
         if os.path.isfile(target_grid):
-            target_grid = iris.load_cube(target_grid)
+            target_grid = _load_target_grid(target_grid)
         else:
             # Generate a target grid from the provided cell-specification,
             # and cache the resulting stock cube for later use.
-            target_grid = _CACHE.setdefault(
-                target_grid,
-                _stock_cube(target_grid, lat_offset, lon_offset),
-            )
+            key = (target_grid, lat_offset, lon_offset)
+            if key not in _CACHE:
+                _CACHE[key] = _stock_cube(target_grid, lat_offset,
+                                          lon_offset)
             # Align the target grid coordinate system to the source
-            # coordinate system.
+            # coordinate system on a copy, so the cached stock cube and
+            # the regridders prepared for it are never modified.
+            target_grid = _CACHE[key].copy()
             src_cs = cube.coord_system()
             xcoord = target_grid.coord(axis='x', dim_coords=True)
             ycoord = target_grid.coord(axis='y', dim_coords=True)
@@ -336,11 +349,69 @@ def regrid(cube, target_grid, scheme, lat_offset=True, lon_offset=True):
     if _attempt_irregular_regridding(cube, scheme):
         cube = esmpy_regrid(cube, target_grid, scheme)
     else:
-        cube = cube.regrid(target_grid, HORIZONTAL_SCHEMES[scheme])
+        regridder = _get_regridder(cube, target_grid, scheme)
+        cube = regridder(cube)
+        # The regridder adds its own target grid coordinates to the result,
+        # copy them so later changes to the cube do not affect the regridder.
+        for coord in cube.coords(axis='x') + cube.coords(axis='y'):
+            cube.replace_coord(coord.copy())
 
     return cube
 
 
+def _load_target_grid(filename):
+    """Load a target grid from file, reusing previously loaded grids."""
+    key = os.path.realpath(filename)
+    mtime = os.stat(filename).st_mtime_ns
+    if key in _GRID_FILES and _GRID_FILES[key][0] == mtime:
+        _GRID_FILES.move_to_end(key)
+        return _GRID_FILES[key][1]
+    # Replaces the grid loaded before the file was changed
+    _GRID_FILES[key] = (mtime, iris.load_cube(filename))
+    _GRID_FILES.move_to_end(key)
+    while len(_GRID_FILES) > _MAX_CACHED_GRID_FILES:
+        _GRID_FILES.popitem(last=False)
+    return _GRID_FILES[key][1]
+
+
+def _get_grid_key(cube):
+    """Compute a key that identifies the horizontal grid of a cube.
+
+    Iris regridders can only be applied to cubes with exactly the same
+    horizontal coordinates as the cube used to create them, so the key
+    is computed from the metadata, dimensions, points and bounds of all
+    x and y coordinates.
+    """
+    key = hashlib.sha256()
+    for coord in cube.coords(axis='x') + cube.coords(axis='y'):
+        key.update(repr((coord.metadata, cube.coord_dims(coord))).encode())
+        for array in (coord.points, coord.bounds):
+            if array is not None:
+                array = np.ascontiguousarray(array)
+                key.update(repr((array.dtype.str, array.shape)).encode())
+                key.update(array.tobytes())
+    return key.hexdigest()
+
+
+def _get_regridder(cube, target_grid, scheme):
+    """Return a regridder from the grid of `cube` to `target_grid`.
+
+    Preparing a regridder can be expensive, e.g. for area weighted
+    regridding the weights are computed, so the most recently used
+    regridders are kept and reused for cubes on the same grid.
+    """
+    key = (_get_grid_key(cube), _get_grid_key(target_grid), scheme)
+    if key in _REGRIDDERS:
+        _REGRIDDERS.move_to_end(key)
+        return _REGRIDDERS[key]
+
+    regridder = HORIZONTAL_SCHEMES[scheme].regridder(cube, target_grid)
+    _REGRIDDERS[key] = regridder
+    while len(_REGRIDDERS) > _MAX_CACHED_REGRIDDERS:
+        _REGRIDDERS.popitem(last=False)
+    return regridder
+
+
 def _create_cube(src_cube, data, src_levels, levels, ):
     """
     Generate a new cube with the interpolated data.
@@ -433,28 +504,36 @@ def _create_cube(src_cube, data, src_levels, levels, ):
     return result
 
 
-def _vertical_interpolate(cube, src_levels, levels, interpolation,
-                          extrapolation):
-    """Perform vertical interpolation."""
-    # Determine the source levels and axis for vertical interpolation.
-    z_axis, = cube.coord_dims(cube.coord(axis='z', dim_coords=True))
-
-    # Broadcast the 1d source cube vertical coordinate to fully
-    # describe the spatial extent that will be interpolated.
-    src_levels_broadcast = broadcast_to_shape(
-        src_levels.points, cube.shape, cube.coord_dims(src_levels))
+def _interpolate_block(data, src_levels, levels, axis, interpolation,
+                       extrapolation):
+    """Vertically interpolate a single block of data with stratify.
 
-    # force mask onto data as nan's
-    cube.data = da.ma.filled(cube.core_data(), np.nan)
-
-    # Now perform the actual vertical interpolation.
-    new_data = stratify.interpolate(
-        levels,
-        src_levels_broadcast,
-        cube.core_data(),
-        axis=z_axis,
-        interpolation=interpolation,
-        extrapolation=extrapolation)
+    `src_levels` is either a 1d array along `axis` or an array with the
+    same number of dimensions as `data` that can be broadcast to its shape.
+    """
+    # Force the mask onto the data as NaN's
+    if not np.issubdtype(data.dtype, np.floating):
+        data = data.astype(np.float64)
+    data = np.ma.filled(data, np.nan)
+
+    if src_levels.ndim == 1:
+        # Stratify broadcasts 1d source levels along the last axis, so
+        # there is no need to broadcast them to the shape of the data.
+        new_data = stratify.interpolate(levels,
+                                        src_levels,
+                                        np.moveaxis(data, axis, -1),
+                                        axis=-1,
+                                        interpolation=interpolation,
+                                        extrapolation=extrapolation)
+        new_data = np.moveaxis(new_data, -1, axis)
+    else:
+        new_data = stratify.interpolate(levels,
+                                        np.broadcast_to(
+                                            src_levels, data.shape),
+                                        data,
+                                        axis=axis,
+                                        interpolation=interpolation,
+                                        extrapolation=extrapolation)
 
     # Calculate the mask based on the any NaN values in the interpolated data.
     mask = np.isnan(new_data)
@@ -463,6 +542,59 @@ def _vertical_interpolate(cube, src_levels, levels, interpolation,
         # Ensure that the data is masked appropriately.
         new_data = np.ma.array(new_data, mask=mask, fill_value=_MDI)
 
+    return new_data
+
+
+def _vertical_interpolate(cube, src_levels, levels, interpolation,
+                          extrapolation):
+    """Perform vertical interpolation.
+
+    The interpolation is done lazily, block by block. The data is only
+    rechunked such that the vertical dimension is in a single chunk.
+    """
+    # Determine the source levels and axis for vertical interpolation.
+    z_axis, = cube.coord_dims(cube.coord(axis='z', dim_coords=True))
+    data = cube.lazy_data().rechunk({z_axis: -1})
+    src_dims = cube.coord_dims(src_levels)
+
+    if src_dims == (z_axis, ):
+        arrays = [data]
+        kwargs = {'src_levels': src_levels.points}
+    else:
+        # Insert length-one dimensions for the dimensions the source levels
+        # do not depend on, so they are broadcast per block instead of
+        # creating an array with the full shape of the data.
+        src_points = da.asarray(src_levels.core_points())
+        src_points = da.transpose(src_points, tuple(np.argsort(src_dims)))
+        shape = [
+            cube.shape[dim] if dim in src_dims else 1
+            for dim in range(cube.ndim)
+        ]
+        src_points = src_points.reshape(shape).rechunk(
+            tuple(data.chunks[dim] if dim in src_dims else (1, )
+                  for dim in range(cube.ndim)))
+        arrays = [data, src_points]
+        kwargs = {}
+
+    chunks = list(data.chunks)
+    chunks[z_axis] = (levels.size, )
+    if np.issubdtype(cube.dtype, np.floating):
+        dtype = cube.dtype
+    else:
+        dtype = np.dtype(np.float64)
+    new_data = da.map_blocks(
+        _interpolate_block,
+        *arrays,
+        levels=levels,
+        axis=z_axis,
+        interpolation=interpolation,
+        extrapolation=extrapolation,
+        chunks=tuple(chunks),
+        dtype=dtype,
+        meta=np.ma.masked_array(np.empty((0, ) * cube.ndim, dtype=dtype)),
+        **kwargs,
+    )
+
     # Construct the resulting cube with the interpolated data.
     return _create_cube(cube, new_data, src_levels, levels.astype(float))
 
@@ -1,15 +1,27 @@
 # -*- coding: utf-8 -*-
 """Provides regridding for irregular grids."""
 
+import collections
+import hashlib
+import logging
+import os
+
 import ESMF
 import iris
 import numpy as np
+from scipy import sparse
 
+from .. import _cache
 from ._mapping import get_empty_data, map_slices, ref_to_dims_index
 
+logger = logging.getLogger(__name__)
 
 ESMF_MANAGER = ESMF.Manager(debug=False)
 
+# Regridding weights used recently by this process
+_WEIGHTS = collections.OrderedDict()
+_MAX_CACHED_WEIGHTS = 8
+
 ESMF_LON, ESMF_LAT = 0, 1
 
 ESMF_REGRID_METHODS = {
@@ -144,8 +156,16 @@ def get_representant(cube, ref_to_slice):
     return cube[rep_ind]
 
 
-def build_regridder_2d(src_rep, dst_rep, regrid_method, mask_threshold):
-    """Build regridder for 2d regridding."""
+def compute_weights_2d(src_rep, dst_rep, regrid_method, mask_threshold):
+    """Compute the weights for 2d regridding with ESMF.
+
+    Returns
+    -------
+    tuple
+        A :class:`scipy.sparse.csr_matrix` that maps the flattened source
+        grid onto the flattened destination grid and a boolean array with
+        the shape of `dst_rep`, that is `True` where the result is masked.
+    """
     dst_field = cube_to_empty_field(dst_rep)
     src_field = cube_to_empty_field(src_rep)
     regridding_arguments = {
@@ -170,58 +190,179 @@ def build_regridder_2d(src_rep, dst_rep, regrid_method, mask_threshold):
         regr_field = mask_regridder(src_field, dst_field)
         dst_mask = regr_field.data[...].T < mask_threshold
         center_mask[...] = dst_mask.T
+        mask_regridder.destroy()
     else:
-        dst_mask = False
+        dst_mask = np.zeros(dst_rep.shape, dtype=bool)
     field_regridder = ESMF.Regrid(src_mask_values=np.array([1]),
                                   dst_mask_values=np.array([1]),
+                                  factors=True,
                                   **regridding_arguments)
+    # ESMF numbers the grid cells from 1 in Fortran order of the
+    # (longitude, latitude) fields, which is the C order of the cube data
+    factors = field_regridder.get_weights_dict(deep_copy=True)
+    field_regridder.destroy()
+    weights = sparse.csr_matrix(
+        (factors['weights'],
+         (factors['row_dst'] - 1, factors['col_src'] - 1)),
+        shape=(np.prod(dst_rep.shape), np.prod(src_rep.shape)),
+    )
+    return weights, dst_mask
 
-    def regridder(src):
-        """Regrid 2d for irregular grids."""
-        res = get_empty_data(dst_rep.shape, src.dtype)
-        data = src.data
-        if np.ma.is_masked(data):
-            data = data.data
-        src_field.data[...] = data.T
-        regr_field = field_regridder(src_field, dst_field)
-        res.data[...] = regr_field.data[...].T
-        res.mask[...] = dst_mask
-        return res
-
-    return regridder
 
+def compute_weights_3d(src_rep, dst_rep, regrid_method, mask_threshold):
+    """Compute the weights for 2.5d regridding with ESMF.
 
-def build_regridder_3d(src_rep, dst_rep, regrid_method, mask_threshold):
-    # pylint: disable=too-many-locals
-    # The necessary refactoring will be done for the full 3d regridding.
-    """Build regridder for 2.5d regridding."""
-    esmf_regridders = []
+    Each level is regridded separately, so the weights form a block
+    diagonal matrix with the weights of each level.
+    """
+    level_weights = []
+    dst_mask = np.zeros(dst_rep.shape, dtype=bool)
     no_levels = src_rep.shape[0]
     for level in range(no_levels):
-        esmf_regridders.append(
-            build_regridder_2d(src_rep[level], dst_rep[level],
-                               regrid_method, mask_threshold)
-        )
+        weights, dst_mask[level] = compute_weights_2d(src_rep[level],
+                                                      dst_rep[level],
+                                                      regrid_method,
+                                                      mask_threshold)
+        level_weights.append(weights)
+    weights = sparse.block_diag(level_weights, format='csr')
+    return weights, dst_mask
 
-    def regridder(src):
-        """Regrid 2.5d for irregular grids."""
-        res = get_empty_data(dst_rep.shape, src.dtype)
-        for i, esmf_regridder in enumerate(esmf_regridders):
-            res[i, ...] = esmf_regridder(src[i])
-        return res
-
-    return regridder
 
-
-def build_regridder(src_rep, dst_rep, method, mask_threshold=.99):
-    """Build regridders from representants."""
+def compute_weights(src_rep, dst_rep, method, mask_threshold=.99):
+    """Compute the regridding weights from representants."""
     regrid_method = ESMF_REGRID_METHODS[method]
     if src_rep.ndim == 2:
-        regridder = build_regridder_2d(src_rep, dst_rep,
-                                       regrid_method, mask_threshold)
+        weights = compute_weights_2d(src_rep, dst_rep, regrid_method,
+                                     mask_threshold)
     elif src_rep.ndim == 3:
-        regridder = build_regridder_3d(src_rep, dst_rep,
-                                       regrid_method, mask_threshold)
+        weights = compute_weights_3d(src_rep, dst_rep, regrid_method,
+                                     mask_threshold)
+    return weights
+
+
+def _get_weights_key(src_rep, dst_rep, method, mask_threshold):
+    """Compute a hash of everything that determines the weights."""
+    key = hashlib.sha256()
+    key.update(repr((method, mask_threshold, src_rep.shape,
+                     dst_rep.shape)).encode())
+    for rep in (src_rep, dst_rep):
+        lon = rep.coord('longitude')
+        key.update(repr(bool(is_lon_circular(lon))).encode())
+        for coord in (rep.coord('latitude'), lon):
+            for array in (coord.points, coord.bounds):
+                if array is not None:
+                    array = np.ascontiguousarray(array, dtype=np.float64)
+                    key.update(repr(array.shape).encode())
+                    key.update(array.tobytes())
+    mask = np.ma.getmaskarray(src_rep.data)
+    key.update(np.packbits(mask).tobytes())
+    return key.hexdigest()
+
+
+def _load_weights(filename):
+    """Load cached weights from file, return None on failure."""
+    if filename is None or not os.path.exists(filename):
+        return None
+    try:
+        with np.load(filename) as npz:
+            weights = sparse.csr_matrix(
+                (npz['data'], npz['indices'], npz['indptr']),
+                shape=tuple(npz['shape']),
+            )
+            dst_mask = npz['dst_mask']
+    except (OSError, ValueError, KeyError) as exc:
+        logger.debug("Unable to read regridding weights from %s: %s",
+                     filename, exc)
+        return None
+    _cache.touch(filename)
+    return weights, dst_mask
+
+
+def _save_weights(filename, weights, dst_mask):
+    """Save weights to file, if possible."""
+    if filename is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Write to a temporary file first, so other processes never read
+        # an incomplete file
+        tmp_file = f'{filename}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_file,
+                 data=weights.data,
+                 indices=weights.indices,
+                 indptr=weights.indptr,
+                 shape=np.array(weights.shape),
+                 dst_mask=dst_mask)
+        os.replace(tmp_file, filename)
+    except OSError as exc:
+        logger.debug("Unable to save regridding weights to %s: %s", filename,
+                     exc)
+        return
+    _cache.prune()
+
+
+def get_weights(src_rep, dst_rep, method, mask_threshold=.99):
+    """Get the regridding weights, from the cache if possible.
+
+    The weights are cached in memory and, if the ``cache_dir`` option is
+    set, on disk, so they are computed only once for each combination of
+    source grid, source mask, destination grid and method.
+    """
+    key = _get_weights_key(src_rep, dst_rep, method, mask_threshold)
+    if key in _WEIGHTS:
+        _WEIGHTS.move_to_end(key)
+        return _WEIGHTS[key]
+
+    filename = _cache.get_cache_path('regrid_weights', f'{key}.npz')
+    result = _load_weights(filename)
+    if result is None:
+        result = compute_weights(src_rep, dst_rep, method, mask_threshold)
+        _save_weights(filename, *result)
+    else:
+        logger.debug("Using regridding weights from %s", filename)
+
+    _WEIGHTS[key] = result
+    while len(_WEIGHTS) > _MAX_CACHED_WEIGHTS:
+        _WEIGHTS.popitem(last=False)
+    return result
+
+
+def build_regridder(src_rep, dst_rep, method, mask_threshold=.99):
+    """Build regridders from representants.
+
+    The regridder applies the regridding weights to many slices at once.
+    Slices with the mask of `src_rep` are regridded with the weights as they
+    are. Where a slice has source points that are masked, but not in
+    `src_rep`, the destination points that receive weight from them are
+    masked if the remaining weight is less than `mask_threshold`, like for
+    the mask of `src_rep`, and their weights are renormalized otherwise.
+    """
+    weights, dst_mask = get_weights(src_rep, dst_rep, method, mask_threshold)
+    dst_mask = dst_mask.ravel()
+    rep_mask = np.ma.getmaskarray(src_rep.data).ravel()
+    total = np.asarray(weights.sum(axis=1)).ravel()
+
+    def regridder(src):
+        """Regrid an array with a flattened source slice in each row."""
+        src_mask = np.ma.getmaskarray(src)
+        data = np.ma.getdata(src)
+        mask = np.broadcast_to(dst_mask, (src.shape[0], dst_mask.size))
+        extra_mask = src_mask & ~rep_mask
+        if not extra_mask.any():
+            res = (weights @ data.T).T
+        else:
+            data = np.where(src_mask, 0., data)
+            lost = (weights @ extra_mask.T.astype(weights.dtype)).T
+            affected = lost > 0.
+            norm = total - lost
+            mask = mask | (affected & (norm < mask_threshold))
+            renormalize = affected & ~mask
+            scale = np.where(renormalize,
+                             total / np.where(renormalize, norm, 1.), 1.)
+            res = (weights @ data.T).T * scale
+        return np.ma.masked_array(res.astype(src.dtype, copy=False),
+                                  mask=mask.copy())
+
     return regridder
 
 
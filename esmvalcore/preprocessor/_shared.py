@@ -3,13 +3,24 @@ Shared functions for preprocessor.
 
 Utility functions that can be used for multiple preprocessor steps
 """
+import hashlib
 import logging
+import os
+from collections import OrderedDict
 
+import dask.array as da
 import iris
 import iris.analysis
+import iris.analysis.cartography
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# The most recently used grid cell areas, computed from the horizontal grid
+# of a cube or loaded from an fx file.
+_GRID_AREAS = OrderedDict()
+_MAX_CACHED_GRID_AREAS = 8
+
 
 # guess bounds tool
 def guess_bounds(cube, coords):
@@ -69,3 +80,296 @@ def operator_accept_weights(operator):
 
     """
     return operator.lower() in ('mean', 'sum', 'rms')
+
+
+def linear_regression(data, axis, x_data):
+    """
+    Compute an ordinary least squares fit of `data` along `axis`.
+
+    The fit is computed in closed form from the sums of x, y, xy, x**2 and
+    y**2 over the unmasked points, so it is vectorized over all other axes
+    and lazy if `data` is a :class:`dask.array.Array`.
+
+    Parameters
+    ----------
+    data: numpy.ndarray or numpy.ma.MaskedArray or dask.array.Array
+        Values to fit.
+    axis: int
+        Axis of `data` along which the fit is computed.
+    x_data: numpy.ndarray
+        Coordinate values along `axis`.
+
+    Returns
+    -------
+        dict: Arrays with the number of unmasked points (`count`), the
+        `slope`, the `intercept` and the standard error of the slope
+        (`slope_stderr`). The slope and intercept are NaN where there are
+        fewer than two unmasked points, the standard error is NaN where
+        there are fewer than two and zero where there are exactly two
+        unmasked points.
+    """
+    array_module = da if isinstance(data, da.Array) else np
+    shape = [1] * data.ndim
+    shape[axis] = -1
+    # Use x relative to its mean to avoid loss of precision
+    x_mean = np.mean(x_data)
+    x_arr = (np.asarray(x_data, dtype=np.float64) - x_mean).reshape(shape)
+
+    valid = ~array_module.ma.getmaskarray(data)
+    y_arr = array_module.where(
+        valid, array_module.ma.getdata(data).astype(np.float64), 0.)
+    x_arr = array_module.where(valid, x_arr, 0.)
+    count = valid.sum(axis=axis)
+    x_sum = x_arr.sum(axis=axis)
+    y_sum = y_arr.sum(axis=axis)
+    xy_sum = (x_arr * y_arr).sum(axis=axis)
+    xx_sum = (x_arr * x_arr).sum(axis=axis)
+    yy_sum = (y_arr * y_arr).sum(axis=axis)
+
+    enough = count >= 2
+    safe_count = array_module.where(enough, count, 1)
+    x_var = xx_sum - x_sum * x_sum / safe_count
+    xy_cov = xy_sum - x_sum * y_sum / safe_count
+    y_var = yy_sum - y_sum * y_sum / safe_count
+    x_var = array_module.where(enough, x_var, 1.)
+    slope = array_module.where(enough, xy_cov / x_var, np.nan)
+    intercept = (y_sum - slope * x_sum) / safe_count - slope * x_mean
+
+    dof = array_module.where(count > 2, count - 2, 1)
+    residuals = array_module.maximum(y_var - xy_cov * xy_cov / x_var, 0.)
+    slope_stderr = array_module.where(
+        count > 2, array_module.sqrt(residuals / dof / x_var),
+        array_module.where(enough, 0., np.nan))
+
+    return {
+        'count': count,
+        'slope': slope,
+        'intercept': intercept,
+        'slope_stderr': slope_stderr,
+    }
+
+
+def _get_cached_grid_areas(key, compute):
+    """Get grid cell areas from the cache or compute and cache them."""
+    if key in _GRID_AREAS:
+        _GRID_AREAS.move_to_end(key)
+    else:
+        areas = np.ma.filled(compute(), 0.)
+        areas.flags.writeable = False
+        _GRID_AREAS[key] = areas
+        while len(_GRID_AREAS) > _MAX_CACHED_GRID_AREAS:
+            _GRID_AREAS.popitem(last=False)
+    return _GRID_AREAS[key]
+
+
+def get_area_weights(cube):
+    """
+    Compute the area weights of the horizontal grid of a cube.
+
+    The weights are computed with
+    :func:`iris.analysis.cartography.area_weights` on a single horizontal
+    slice of the cube and cached, so they are only computed once for each
+    horizontal grid.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        input cube, with bounds on the latitude and longitude coordinates.
+
+    Returns
+    -------
+    np.ndarray
+        read-only grid cell areas, with the same number of dimensions as the
+        cube and length one along the non-horizontal dimensions, so they can
+        be broadcast to the shape of the cube.
+    """
+    lat = cube.coord('latitude')
+    lon = cube.coord('longitude')
+    horizontal_dims = cube.coord_dims(lat) + cube.coord_dims(lon)
+
+    key = hashlib.sha256()
+    for coord in (lat, lon):
+        key.update(repr((coord.units, coord.coord_system,
+                         cube.coord_dims(coord), coord.shape)).encode())
+        key.update(np.ascontiguousarray(coord.points, dtype=float))
+        key.update(np.ascontiguousarray(coord.bounds, dtype=float))
+
+    def compute():
+        index = tuple(
+            slice(None) if dim in horizontal_dims else 0
+            for dim in range(cube.ndim))
+        return iris.analysis.cartography.area_weights(cube[index])
+
+    areas = _get_cached_grid_areas(key.hexdigest(), compute)
+    shape = [
+        cube.shape[dim] if dim in horizontal_dims else 1
+        for dim in range(cube.ndim)
+    ]
+    return areas.reshape(shape)
+
+
+def load_fx_data(fx_file):
+    """
+    Load the data of an fx file, e.g. grid cell areas or volumes.
+
+    The data is cached, so each file is only read once. Masked values are
+    set to zero.
+
+    Parameters
+    ----------
+    fx_file: str
+        path to the fx file.
+
+    Returns
+    -------
+    np.ndarray
+        read-only data of the fx file.
+    """
+    key = (os.path.abspath(fx_file), os.path.getmtime(fx_file))
+    return _get_cached_grid_areas(key,
+                                  lambda: iris.load_cube(fx_file).data)
+
+
+def load_last_fx_data(fx_files):
+    """
+    Load the data of the last available fx file.
+
+    Parameters
+    ----------
+    fx_files: dict
+        dictionary of field:filename for the fx_files
+
+    Returns
+    -------
+    np.ndarray or None
+        read-only data of the fx file, or None if no fx file is available.
+    """
+    available = [(key, fx_file) for key, fx_file in (fx_files or {}).items()
+                 if fx_file]
+    if not available:
+        return None
+    key, fx_file = available[-1]
+    logger.info('Attempting to load %s from file: %s', key, fx_file)
+    return load_fx_data(fx_file)
+
+
+def weighted_statistic(data, weights, axis, operator):
+    """
+    Lazily compute a weighted statistic of masked data over `axis`.
+
+    Parameters
+    ----------
+    data: dask.array.Array
+        input data.
+    weights: np.ndarray or dask.array.Array
+        weights that can be broadcast to the shape of `data`.
+    axis: tuple of int
+        axes over which the statistic is computed.
+    operator: str
+        the statistic, one of mean, sum, rms.
+
+    Returns
+    -------
+    dask.array.Array
+        weighted statistic, masked where all data over `axis` is masked.
+    """
+    if not isinstance(weights, da.Array):
+        # Chunk the weights like the data, so they can be broadcast per chunk
+        chunks = tuple(
+            chunk if size > 1 else (1, )
+            for chunk, size in zip(data.chunks[data.ndim - weights.ndim:],
+                                   weights.shape))
+        weights = da.from_array(weights, chunks=chunks)
+    mask = da.ma.getmaskarray(data)
+    values = da.where(mask, 0., da.ma.getdata(data))
+    weights = da.where(mask, 0., weights)
+    total = weights.sum(axis=axis)
+    if operator == 'rms':
+        values = values**2
+    result = (values * weights).sum(axis=axis)
+    if operator in ('mean', 'rms'):
+        result = result / da.where(total > 0., total, 1.)
+    if operator == 'rms':
+        result = da.sqrt(result)
+    return da.ma.masked_array(result, mask=total == 0.)
+
+
+def _get_collapsed_template(cube, coords, axis, operator):
+    """Collapse a cube with only the coordinates along `axis` using iris.
+
+    This provides the scalar coordinates and metadata of the collapsed cube.
+    """
+    shape = tuple(cube.shape[dim] for dim in axis)
+    template = iris.cube.Cube(np.zeros(shape, dtype=cube.dtype),
+                              **cube.metadata._asdict())
+    for coord in cube.coords():
+        dims = cube.coord_dims(coord)
+        if dims and set(dims) <= set(axis):
+            template_dims = tuple(axis.index(dim) for dim in dims)
+            if coord in cube.dim_coords:
+                template.add_dim_coord(coord, template_dims)
+            else:
+                template.add_aux_coord(coord, template_dims)
+    kwargs = {}
+    if isinstance(operator, iris.analysis.WeightedAggregator):
+        # Avoid the warning about collapsing latitude without weighting,
+        # the weighted statistic is computed separately.
+        kwargs['weights'] = np.ones(shape)
+    return template.collapsed([cube.coord(c) for c in coords], operator,
+                              **kwargs)
+
+
+def build_collapsed_cube(cube, coords, operator, data):
+    """Create the cube resulting from collapsing `coords` of `cube`.
+
+    The coordinates and metadata are those that ``cube.collapsed`` would
+    give, but without computing the statistic of the data with iris.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        input cube.
+    coords: list
+        coordinates (or their names) that are collapsed.
+    operator: iris.analysis.Aggregator
+        the statistic that was computed.
+    data: np.ndarray or dask.array.Array
+        the statistic, with the dimensions of `coords` removed.
+
+    Returns
+    -------
+    iris.cube.Cube
+        collapsed cube.
+    """
+    axis = tuple(
+        sorted(set(dim for c in coords for dim in cube.coord_dims(c))))
+    kept = [dim for dim in range(cube.ndim) if dim not in axis]
+    template = _get_collapsed_template(cube, coords, axis, operator)
+
+    result = iris.cube.Cube(data, **template.metadata._asdict())
+    for coord in cube.coords():
+        dims = cube.coord_dims(coord)
+        if set(dims).isdisjoint(axis):
+            new_dims = tuple(kept.index(dim) for dim in dims)
+            if coord in cube.dim_coords:
+                result.add_dim_coord(coord.copy(), new_dims)
+            else:
+                result.add_aux_coord(coord.copy(), new_dims)
+        elif not set(dims) <= set(axis):
+            # Coordinates that also span dimensions that are kept
+            local_dims = [dims.index(dim) for dim in axis if dim in dims]
+            new_dims = tuple(kept.index(dim) for dim in dims if dim in kept)
+            result.add_aux_coord(coord.collapsed(local_dims), new_dims)
+    for coord in template.coords():
+        result.add_aux_coord(coord)
+    for measure in cube.cell_measures():
+        dims = cube.cell_measure_dims(measure)
+        if set(dims).isdisjoint(axis):
+            result.add_cell_measure(measure.copy(),
+                                    tuple(kept.index(dim) for dim in dims))
+    for ancillary in cube.ancillary_variables():
+        dims = cube.ancillary_variable_dims(ancillary)
+        if set(dims).isdisjoint(axis):
+            result.add_ancillary_variable(
+                ancillary.copy(), tuple(kept.index(dim) for dim in dims))
+    return result
@@ -5,7 +5,9 @@ constructing seasonal and area averages.
 """
 import copy
 import datetime
+import hashlib
 import logging
+from collections import OrderedDict
 from warnings import filterwarnings
 
 import dask.array as da
@@ -17,6 +19,8 @@ import iris.util
 import numpy as np
 from iris.time import PartialDateTime
 
+from ..iris_helpers import date_components
+from ._groupby import aggregated_by
 from ._shared import get_iris_analysis_operation, operator_accept_weights
 
 logger = logging.getLogger(__name__)
@@ -38,6 +42,116 @@ for _coord in (
         module='iris',
     )
 
+# The most recently used decoded time coordinates.
+_TIME_INDICES = OrderedDict()
+_MAX_CACHED_TIME_INDICES = 16
+
+
+def _get_time_index(cube):
+    """Decode the time coordinate of `cube` into arrays of date components.
+
+    The time points are converted to dates only once, the result is cached
+    so it is reused for other cubes with the same time coordinate.
+
+    Returns
+    -------
+    dict of str: numpy.ndarray
+        The (read-only) ``year``, ``month``, ``day``, ``hour`` and
+        ``day_of_year`` of each time point.
+    """
+    time_coord = cube.coord('time')
+    points = time_coord.points
+    key = hashlib.sha256()
+    key.update(repr((time_coord.units.origin, time_coord.units.calendar,
+                     points.dtype.str, points.shape)).encode())
+    key.update(np.ascontiguousarray(points).tobytes())
+    key = key.hexdigest()
+
+    if key in _TIME_INDICES:
+        _TIME_INDICES.move_to_end(key)
+        return _TIME_INDICES[key]
+
+    components = date_components(time_coord.units, points)
+    index = {}
+    for i, name in enumerate(('year', 'month', 'day', 'hour', 'day_of_year')):
+        index[name] = components[..., i]
+        index[name].flags.writeable = False
+
+    _TIME_INDICES[key] = index
+    while len(_TIME_INDICES) > _MAX_CACHED_TIME_INDICES:
+        _TIME_INDICES.popitem(last=False)
+    return index
+
+
+def _select_time_points(cube, select):
+    """Select the time points of `cube` where `select` is true.
+
+    The result is the same as that of :meth:`iris.cube.Cube.extract` with a
+    constraint on the time coordinate: `None` if no points are selected and
+    a cube without time dimension if a single point is selected.
+    """
+    indices = np.flatnonzero(select)
+    if indices.size == 0:
+        return None
+    dims = cube.coord_dims('time')
+    if not dims:
+        return cube
+    if indices.size == 1:
+        index = indices[0]
+    elif np.all(np.diff(indices) == 1):
+        index = slice(indices[0], indices[-1] + 1)
+    else:
+        index = indices
+    keys = [slice(None)] * cube.ndim
+    keys[dims[0]] = index
+    return cube[tuple(keys)]
+
+
+def _add_time_category(cube, name, values, units='1'):
+    """Add a coordinate categorising the time coordinate to `cube`.
+
+    The coordinate is the same as the one created by
+    :func:`iris.coord_categorisation.add_categorised_coord`, but the
+    `values` are computed beforehand from the output of
+    :func:`_get_time_index`.
+    """
+    time_coord = cube.coord('time')
+    if values.dtype.kind == 'U':
+        values = values.astype('|U64')
+    coord = iris.coords.AuxCoord(values,
+                                 units=units,
+                                 attributes=time_coord.attributes.copy())
+    coord.rename(name)
+    cube.add_aux_coord(coord, cube.coord_dims(time_coord))
+
+
+def _get_season_lookups(seasons):
+    """Get the season number and year adjustment for each month number.
+
+    These are the same as used by
+    :func:`iris.coord_categorisation.add_season` and
+    :func:`iris.coord_categorisation.add_season_year`.
+    """
+    season_numbers = np.full(13, -1, dtype=np.int64)
+    year_adjusts = np.zeros(13, dtype=np.int64)
+    cyclic_months = 'jfmamjjasond' * 2
+    for number, season in enumerate(seasons):
+        start = cyclic_months.find(season.lower())
+        if start < 0:
+            raise ValueError(f"unrecognised season: {season}")
+        months = [(i % 12) + 1 for i in range(start, start + len(season))]
+        for month in months:
+            if season_numbers[month] >= 0:
+                raise ValueError(
+                    f"some months appear in more than one season: {seasons}")
+            season_numbers[month] = number
+            if month > months[-1]:
+                year_adjusts[month] = 1
+    if np.any(season_numbers[1:] < 0):
+        raise ValueError(
+            f"some months do not appear in any season: {seasons}")
+    return season_numbers, year_adjusts
+
 
 def extract_time(cube, start_year, start_month, start_day, end_year, end_month,
                  end_day):
@@ -88,9 +202,12 @@ def extract_time(cube, start_year, start_month, start_day, end_year, end_month,
                           month=int(end_month),
                           day=int(end_day))
 
-    constraint = iris.Constraint(time=lambda t: t_1 <= t.point < t_2)
+    index = _get_time_index(cube)
+    dates = index['year'] * 10000 + index['month'] * 100 + index['day']
+    select = ((dates >= t_1.year * 10000 + t_1.month * 100 + t_1.day) &
+              (dates < t_2.year * 10000 + t_2.month * 100 + t_2.day))
 
-    cube_slice = cube.extract(constraint)
+    cube_slice = _select_time_points(cube, select)
     if cube_slice is None:
         raise ValueError(
             f"Time slice {start_year:0>4d}-{start_month:0>2d}-{start_day:0>2d}"
@@ -157,18 +274,19 @@ def extract_season(cube, season):
     res_season = allmonths[sstart + len(season):sstart + 12]
     seasons = [season, res_season]
 
+    index = _get_time_index(cube)
+    season_numbers, year_adjusts = _get_season_lookups(seasons)
     if not cube.coords('clim_season'):
-        iris.coord_categorisation.add_season(cube,
-                                             'time',
-                                             name='clim_season',
-                                             seasons=seasons)
+        _add_time_category(cube,
+                           'clim_season',
+                           np.array(seasons)[season_numbers[index['month']]],
+                           units='no_unit')
     if not cube.coords('season_year'):
-        iris.coord_categorisation.add_season_year(cube,
-                                                  'time',
-                                                  name='season_year',
-                                                  seasons=seasons)
+        _add_time_category(cube, 'season_year',
+                           index['year'] + year_adjusts[index['month']])
 
-    return cube.extract(iris.Constraint(clim_season=season))
+    return _select_time_points(cube,
+                               cube.coord('clim_season').points == season)
 
 
 def extract_month(cube, month):
@@ -189,10 +307,10 @@ def extract_month(cube, month):
     if month not in range(1, 13):
         raise ValueError('Please provide a month number between 1 and 12.')
     if not cube.coords('month_number'):
-        iris.coord_categorisation.add_month_number(cube,
-                                                   'time',
-                                                   name='month_number')
-    return cube.extract(iris.Constraint(month_number=month))
+        _add_time_category(cube, 'month_number',
+                           _get_time_index(cube)['month'])
+    return _select_time_points(cube,
+                               cube.coord('month_number').points == month)
 
 
 def get_time_weights(cube):
@@ -242,20 +360,17 @@ def hourly_statistics(cube, hours, operator='mean'):
     iris.cube.Cube
         Hourly statistics cube
     """
+    index = _get_time_index(cube)
     if not cube.coords('hour_group'):
-        iris.coord_categorisation.add_categorised_coord(
-            cube,
-            'hour_group',
-            'time',
-            lambda coord, value: coord.units.num2date(value).hour // hours,
-            units='1')
+        _add_time_category(cube, 'hour_group', index['hour'] // hours)
     if not cube.coords('day_of_year'):
-        iris.coord_categorisation.add_day_of_year(cube, 'time')
+        _add_time_category(cube, 'day_of_year', index['day_of_year'])
     if not cube.coords('year'):
-        iris.coord_categorisation.add_year(cube, 'time')
+        _add_time_category(cube, 'year', index['year'])
 
     operator = get_iris_analysis_operation(operator)
-    cube = cube.aggregated_by(['hour_group', 'day_of_year', 'year'], operator)
+    cube = aggregated_by(cube, ['hour_group', 'day_of_year', 'year'],
+                         operator)
 
     cube.remove_coord('hour_group')
     cube.remove_coord('day_of_year')
@@ -283,13 +398,14 @@ def daily_statistics(cube, operator='mean'):
     iris.cube.Cube
         Daily statistics cube
     """
+    index = _get_time_index(cube)
     if not cube.coords('day_of_year'):
-        iris.coord_categorisation.add_day_of_year(cube, 'time')
+        _add_time_category(cube, 'day_of_year', index['day_of_year'])
     if not cube.coords('year'):
-        iris.coord_categorisation.add_year(cube, 'time')
+        _add_time_category(cube, 'year', index['year'])
 
     operator = get_iris_analysis_operation(operator)
-    cube = cube.aggregated_by(['day_of_year', 'year'], operator)
+    cube = aggregated_by(cube, ['day_of_year', 'year'], operator)
 
     cube.remove_coord('day_of_year')
     cube.remove_coord('year')
@@ -316,13 +432,14 @@ def monthly_statistics(cube, operator='mean'):
     iris.cube.Cube
         Monthly statistics cube
     """
+    index = _get_time_index(cube)
     if not cube.coords('month_number'):
-        iris.coord_categorisation.add_month_number(cube, 'time')
+        _add_time_category(cube, 'month_number', index['month'])
     if not cube.coords('year'):
-        iris.coord_categorisation.add_year(cube, 'time')
+        _add_time_category(cube, 'year', index['year'])
 
     operator = get_iris_analysis_operation(operator)
-    cube = cube.aggregated_by(['month_number', 'year'], operator)
+    cube = aggregated_by(cube, ['month_number', 'year'], operator)
     return cube
 
 
@@ -360,11 +477,13 @@ def seasonal_statistics(cube,
         raise ValueError(
             f"Minimum of 2 month is required per Seasons: {seasons}.")
 
+    index = _get_time_index(cube)
     if not cube.coords('clim_season'):
-        iris.coord_categorisation.add_season(cube,
-                                             'time',
-                                             name='clim_season',
-                                             seasons=seasons)
+        season_numbers, _ = _get_season_lookups(seasons)
+        _add_time_category(cube,
+                           'clim_season',
+                           np.array(seasons)[season_numbers[index['month']]],
+                           units='no_unit')
     else:
         old_seasons = list(set(cube.coord('clim_season').points))
         if not all([osea in seasons for osea in old_seasons]):
@@ -373,14 +492,13 @@ def seasonal_statistics(cube,
                 f"{old_seasons}.")
 
     if not cube.coords('season_year'):
-        iris.coord_categorisation.add_season_year(cube,
-                                                  'time',
-                                                  name='season_year',
-                                                  seasons=seasons)
+        _, year_adjusts = _get_season_lookups(seasons)
+        _add_time_category(cube, 'season_year',
+                           index['year'] + year_adjusts[index['month']])
 
     operator = get_iris_analysis_operation(operator)
 
-    cube = cube.aggregated_by(['clim_season', 'season_year'], operator)
+    cube = aggregated_by(cube, ['clim_season', 'season_year'], operator)
 
     # CMOR Units are days so we are safe to operate on days
     # Ranging on [29, 31] days makes this calendar-independent
@@ -439,8 +557,8 @@ def annual_statistics(cube, operator='mean'):
     operator = get_iris_analysis_operation(operator)
 
     if not cube.coords('year'):
-        iris.coord_categorisation.add_year(cube, 'time')
-    return cube.aggregated_by('year', operator)
+        _add_time_category(cube, 'year', _get_time_index(cube)['year'])
+    return aggregated_by(cube, 'year', operator)
 
 
 def decadal_statistics(cube, operator='mean'):
@@ -471,16 +589,10 @@ def decadal_statistics(cube, operator='mean'):
     operator = get_iris_analysis_operation(operator)
 
     if not cube.coords('decade'):
+        year = _get_time_index(cube)['year']
+        _add_time_category(cube, 'decade', year - year % 10)
 
-        def get_decade(coord, value):
-            """Categorize time coordinate into decades."""
-            date = coord.units.num2date(value)
-            return date.year - date.year % 10
-
-        iris.coord_categorisation.add_categorised_coord(
-            cube, 'decade', 'time', get_decade)
-
-    return cube.aggregated_by('decade', operator)
+    return aggregated_by(cube, 'decade', operator)
 
 
 def climate_statistics(cube,
@@ -534,7 +646,7 @@ def climate_statistics(cube,
 
     clim_coord = _get_period_coord(cube, period, seasons)
     operator = get_iris_analysis_operation(operator)
-    clim_cube = cube.aggregated_by(clim_coord, operator)
+    clim_cube = aggregated_by(cube, clim_coord, operator)
     clim_cube.remove_coord('time')
     if clim_cube.coord(clim_coord.name()).is_monotonic():
         iris.util.promote_aux_coord_to_dim_coord(clim_cube, clim_coord.name())
@@ -605,59 +717,68 @@ def anomalies(cube,
 
     # standardize the results if requested
     if standardize:
+        period_coord = _get_period_coord(cube, period, seasons)
+        tdim = cube.coord_dims(period_coord)[0]
         cube_stddev = climate_statistics(cube,
                                          operator='std_dev',
-                                         period=period)
-        tdim = cube.coord_dims('time')[0]
-        reps = cube.shape[tdim] / cube_stddev.shape[tdim]
-        if not reps % 1 == 0:
-            raise ValueError(
-                "Cannot safely apply preprocessor to this dataset, "
-                "since the full time period of this dataset is not "
-                f"a multiple of the period '{period}'")
-        cube.data = cube.core_data() / da.concatenate(
-            [cube_stddev.core_data() for _ in range(int(reps))], axis=tdim)
+                                         period=period,
+                                         seasons=seasons)
+        cube.data = cube.core_data() / _take_period_data(
+            cube_stddev, period_coord, tdim)
         cube.units = '1'
     return cube
 
 
 def _compute_anomalies(cube, reference, period, seasons):
     cube_coord = _get_period_coord(cube, period, seasons)
-    ref_coord = _get_period_coord(reference, period, seasons)
-
-    data = cube.core_data()
-    cube_time = cube.coord('time')
-    ref = {}
-    for ref_slice in reference.slices_over(ref_coord):
-        ref[ref_slice.coord(ref_coord).points[0]] = ref_slice.core_data()
-
-    cube_coord_dim = cube.coord_dims(cube_coord)[0]
-    slicer = [slice(None)] * len(data.shape)
-    new_data = []
-    for i in range(cube_time.shape[0]):
-        slicer[cube_coord_dim] = i
-        new_data.append(data[tuple(slicer)] - ref[cube_coord.points[i]])
-    data = da.stack(new_data, axis=cube_coord_dim)
+    tdim = cube.coord_dims(cube_coord)[0]
+    data = cube.lazy_data() - _take_period_data(reference, cube_coord, tdim)
     cube = cube.copy(data)
     cube.remove_coord(cube_coord)
     return cube
 
 
+def _take_period_data(clim_cube, period_coord, axis):
+    """Get the data of `clim_cube` for each point of `period_coord`.
+
+    The slices of `clim_cube` are selected with a single
+    :func:`dask.array.take` along `axis`, so the size of the task graph does
+    not depend on the number of time points.
+    """
+    clim_coord = clim_cube.coord(period_coord.name())
+    clim_points = clim_coord.points
+    sorter = np.argsort(clim_points)
+    indices = np.searchsorted(clim_points, period_coord.points, sorter=sorter)
+    indices = sorter[indices.clip(max=len(clim_points) - 1)]
+    missing = clim_points[indices] != period_coord.points
+    if missing.any():
+        raise ValueError(
+            f"No data for {period_coord.name()} "
+            f"{period_coord.points[missing][0]} in the reference period")
+
+    clim_dim = clim_cube.coord_dims(clim_coord)[0]
+    data = da.moveaxis(clim_cube.lazy_data(), clim_dim, axis)
+    data = data.rechunk({axis: -1})
+    return da.take(data, indices, axis=axis)
+
+
 def _get_period_coord(cube, period, seasons):
     """Get periods."""
     if period in ['daily', 'day']:
         if not cube.coords('day_of_year'):
-            iris.coord_categorisation.add_day_of_year(cube, 'time')
+            _add_time_category(cube, 'day_of_year',
+                               _get_time_index(cube)['day_of_year'])
         return cube.coord('day_of_year')
     if period in ['monthly', 'month', 'mon']:
         if not cube.coords('month_number'):
-            iris.coord_categorisation.add_month_number(cube, 'time')
+            _add_time_category(cube, 'month_number',
+                               _get_time_index(cube)['month'])
         return cube.coord('month_number')
     if period in ['seasonal', 'season']:
         if not cube.coords('season_number'):
-            iris.coord_categorisation.add_season_number(cube,
-                                                        'time',
-                                                        seasons=seasons)
+            season_numbers, _ = _get_season_lookups(seasons)
+            _add_time_category(cube, 'season_number',
+                               season_numbers[_get_time_index(cube)['month']])
         return cube.coord('season_number')
     raise ValueError(f"Period '{period}' not supported")
 
@@ -840,12 +961,97 @@ def timeseries_filter(cube,
 
     # Apply filter
     aggregation_operator = get_iris_analysis_operation(filter_stats)
-    cube = cube.rolling_window('time',
-                               aggregation_operator,
-                               len(wgts),
-                               weights=wgts)
+    if aggregation_operator.name() not in ('sum', 'mean'):
+        return cube.rolling_window('time',
+                                   aggregation_operator,
+                                   len(wgts),
+                                   weights=wgts)
+    return _weighted_rolling_window(cube, aggregation_operator, wgts)
+
+
+def _weighted_window_sum(block, weights):
+    """Compute the weighted sum over all complete windows along axis 0."""
+    n_out = block.shape[0] - len(weights) + 1
+    result = np.zeros((max(n_out, 0), ) + block.shape[1:])
+    for i, weight in enumerate(weights):
+        result += weight * block[i:i + n_out]
+    return result
+
+
+def _filter_block(block, weights, operator_name):
+    """Apply a weighted sum or mean over windows along axis 0 of a chunk."""
+    values = np.ma.filled(block.astype(np.float64), 0.)
+    valid = ~np.ma.getmaskarray(block)
+    n_out = block.shape[0] - len(weights) + 1
+    n_valid = np.cumsum(np.concatenate(
+        [np.zeros((1, ) + block.shape[1:], dtype=int), valid]), axis=0)
+    mask = n_valid[len(weights):] - n_valid[:n_out] == 0
+    result = _weighted_window_sum(values, weights)
+    if operator_name == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result /= _weighted_window_sum(valid, weights)
+    return np.ma.masked_array(result, mask=mask)
+
+
+def _weighted_rolling_window(cube, operator, weights):
+    """Apply a weighted rolling window sum or mean along time.
+
+    The result is the same as that of :meth:`iris.cube.Cube.rolling_window`,
+    but the data is convolved with the weights chunk by chunk instead of
+    creating a view with an extra dimension the size of the window.
+    """
+    dim = cube.coord_dims('time')[0]
+    window = len(weights)
+
+    # Let iris compute the coordinates and metadata from a cube with only
+    # the coordinates along time.
+    template = iris.cube.Cube(np.zeros(cube.shape[dim], dtype=cube.dtype),
+                              **cube.metadata._asdict())
+    for coord in cube.coords(dimensions=dim):
+        if coord in cube.dim_coords:
+            template.add_dim_coord(coord.copy(), 0)
+        else:
+            template.add_aux_coord(coord.copy(), 0)
+    template = template.rolling_window('time',
+                                       operator,
+                                       window,
+                                       weights=weights)
+
+    # Every chunk needs the first window - 1 points of the next chunk.
+    data = da.moveaxis(cube.lazy_data(), dim, 0)
+    chunks = []
+    for size in data.chunks[0]:
+        if chunks and chunks[-1] < window - 1:
+            chunks[-1] += size
+        else:
+            chunks.append(size)
+    if len(chunks) > 1 and chunks[-1] < window - 1:
+        chunks[-2] += chunks.pop()
+    data = data.rechunk({0: tuple(chunks)})
+    out_chunks = tuple(chunks[:-1]) + (template.shape[0] -
+                                       sum(chunks[:-1]), )
+    result = da.map_overlap(
+        _filter_block,
+        data,
+        depth={0: (0, window - 1)},
+        boundary='none',
+        trim=False,
+        chunks=(out_chunks, ) + data.chunks[1:],
+        dtype=np.float64,
+        meta=np.ma.array((), dtype=np.float64),
+        weights=weights,
+        operator_name=operator.name(),
+    )
+    result = da.moveaxis(result, 0, dim).astype(template.dtype)
 
-    return cube
+    key = [slice(None)] * cube.ndim
+    key[dim] = slice(None, template.shape[0])
+    result_cube = cube.copy(cube.lazy_data())[tuple(key)]
+    for coord in template.coords():
+        result_cube.replace_coord(coord)
+    result_cube.metadata = template.metadata
+    result_cube.data = result if cube.has_lazy_data() else result.compute()
+    return result_cube
 
 
 def resample_hours(cube, interval, offset=0):
@@ -897,8 +1103,8 @@ def resample_hours(cube, interval, offset=0):
         raise ValueError(f"Data period ({cube_period}) should be lower than "
                          f"the interval ({interval})")
     hours = range(0 + offset, 24, interval)
-    select_hours = iris.Constraint(time=lambda cell: cell.point.hour in hours)
-    return cube.extract(select_hours)
+    select = np.isin(_get_time_index(cube)['hour'], hours)
+    return _select_time_points(cube, select)
 
 
 def resample_time(cube, month=None, day=None, hour=None):
@@ -939,14 +1145,9 @@ def resample_time(cube, month=None, day=None, hour=None):
     iris.cube.Cube
         Cube with the new frequency.
     """
-    def compare(cell):
-        date = cell.point
-        if month is not None and month != date.month:
-            return False
-        if day is not None and day != date.day:
-            return False
-        if hour is not None and hour != date.hour:
-            return False
-        return True
-
-    return cube.extract(iris.Constraint(time=compare))
+    index = _get_time_index(cube)
+    select = np.ones(index['month'].shape, dtype=bool)
+    for name, value in (('month', month), ('day', day), ('hour', hour)):
+        if value is not None:
+            select &= index[name] == value
+    return _select_time_points(cube, select)
@@ -4,13 +4,20 @@ Volume and z coordinate operations on data cubes.
 Allows for selecting data subsets using certain volume bounds;
 selecting depth or height regions; constructing volumetric averages;
 """
-from copy import deepcopy
-
 import logging
 
 import iris
 import numpy as np
 
+from ._shared import (
+    build_collapsed_cube,
+    get_area_weights,
+    get_iris_analysis_operation,
+    load_last_fx_data,
+    operator_accept_weights,
+    weighted_statistic,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,91 +60,6 @@ def extract_volume(cube, z_min, z_max):
     return cube.extract(z_constraint)
 
 
-def _create_cube_time(src_cube, data, times):
-    """
-    Generate a new cube with the volume averaged data.
-
-    The resultant cube is seeded with `src_cube` metadata and coordinates,
-    excluding any source coordinates that span the associated vertical
-    dimension. The `times` of interpolation are used along with the
-    associated source cube time coordinate metadata to add a new
-    time coordinate to the resultant cube.
-
-    Based on the _create_cube method from _regrid.py.
-
-    Parameters
-    ----------
-    src_cube : cube
-        The source cube that was vertically interpolated.
-    data : array
-        The payload resulting from interpolating the source cube
-        over the specified times.
-    times : array
-        The array of times.
-
-    Returns
-    -------
-    cube
-    .. note::
-        If there is only one level of interpolation, the resultant cube
-        will be collapsed over the associated vertical dimension, and a
-        scalar vertical coordinate will be added.
-    """
-    # Get the source cube vertical coordinate and associated dimension.
-    src_times = src_cube.coord('time')
-    t_dim, = src_cube.coord_dims(src_times)
-
-    if data.shape[t_dim] != len(times):
-        emsg = ('Mismatch between data and times for data dimension {!r}, '
-                'got data shape {!r} with times shape {!r}.')
-        raise ValueError(emsg.format(t_dim, data.shape, times.shape))
-
-    # Construct the resultant cube with the interpolated data
-    # and the source cube metadata.
-    kwargs = deepcopy(src_cube.metadata)._asdict()
-    result = iris.cube.Cube(data, **kwargs)
-
-    # Add the appropriate coordinates to the cube, excluding
-    # any coordinates that span the z-dimension of interpolation.
-    for coord in src_cube.dim_coords:
-        [dim] = src_cube.coord_dims(coord)
-        if dim != t_dim:
-            result.add_dim_coord(coord.copy(), dim)
-
-    for coord in src_cube.aux_coords:
-        dims = src_cube.coord_dims(coord)
-        if t_dim not in dims:
-            result.add_aux_coord(coord.copy(), dims)
-
-    for coord in src_cube.derived_coords:
-        dims = src_cube.coord_dims(coord)
-        if t_dim not in dims:
-            result.add_aux_coord(coord.copy(), dims)
-
-    # Construct the new vertical coordinate for the interpolated
-    # z-dimension, using the associated source coordinate metadata.
-    metadata = src_times.metadata
-
-    kwargs = {
-        'standard_name': metadata.standard_name,
-        'long_name': metadata.long_name,
-        'var_name': metadata.var_name,
-        'units': metadata.units,
-        'attributes': metadata.attributes,
-        'coord_system': metadata.coord_system,
-        'climatological': metadata.climatological,
-    }
-
-    try:
-        coord = iris.coords.DimCoord(times, **kwargs)
-        result.add_dim_coord(coord, t_dim)
-    except ValueError:
-        coord = iris.coords.AuxCoord(times, **kwargs)
-        result.add_aux_coord(coord, t_dim)
-
-    return result
-
-
 def calculate_volume(cube):
     """
     Calculate volume from a cube.
@@ -151,26 +73,37 @@ def calculate_volume(cube):
 
     Returns
     -------
-    float
-        grid volume.
+    np.ndarray
+        grid volume, with the same number of dimensions as the cube. The
+        array has length one along the dimensions that the volume does not
+        depend on (e.g. time), so it can be broadcast to the shape of the
+        cube.
     """
     # ####
     # Load depth field and figure out which dim is which.
     depth = cube.coord(axis='z')
-    z_dim = cube.coord_dims(cube.coord(axis='z'))[0]
+    z_dim = cube.coord_dims(depth)[0]
 
     # ####
     # Load z direction thickness
-    thickness = depth.bounds[..., 1] - depth.bounds[..., 0]
+    thickness = np.abs(depth.bounds[..., 1] - depth.bounds[..., 0])
+    if thickness.ndim == 1:
+        shape = [1] * cube.ndim
+        shape[z_dim] = thickness.size
+        thickness = thickness.reshape(shape)
 
     # ####
-    # Calculate grid volume:
-    area = iris.analysis.cartography.area_weights(cube)
-    if thickness.ndim == 1 and z_dim == 1:
-        grid_volume = area * thickness[None, :, None, None]
-    if thickness.ndim == 4 and z_dim == 1:
-        grid_volume = area * thickness[:, :]
+    # Get the horizontal grid cell area
+    area = get_area_weights(cube)
+
+    return area * thickness
 
+
+def _load_volume(cube, fx_variables):
+    """Load the grid volume from the last fx file, or calculate it."""
+    grid_volume = load_last_fx_data(fx_variables)
+    if grid_volume is None:
+        grid_volume = calculate_volume(cube)
     return grid_volume
 
 
@@ -185,12 +118,18 @@ def volume_statistics(
     is calculated from iris's cartography tool multiplied by the cell
     thickness.
 
+    The operators `mean`, `sum` and `rms` are volume weighted, the
+    other operators are not weighted. Masked points are ignored and
+    the result is masked where all points in the volume are masked.
+    The data of the result is lazy.
+
     Parameters
     ----------
         cube: iris.cube.Cube
             Input cube.
         operator: str
-            The operation to apply to the cube, options are: 'mean'.
+            The operation to apply to the cube, options are: mean, median,
+            min, max, std_dev, sum, variance, rms.
         fx_variables: dict
             dictionary of field:filename for the fx_variables
 
@@ -204,95 +143,28 @@ def volume_statistics(
     ValueError
         if input cube shape differs from grid volume cube shape.
     """
-    # TODO: Test sigma coordinates.
-    # TODO: Add other operations.
-
-    # ####
-    # Load z coordinate field and figure out which dim is which.
-    t_dim = cube.coord_dims('time')[0]
-
-    grid_volume_found = False
-    grid_volume = None
-    if fx_variables:
-        for key, fx_file in fx_variables.items():
-            if fx_file is None:
-                continue
-            logger.info('Attempting to load %s from file: %s', key, fx_file)
-            fx_cube = iris.load_cube(fx_file)
-
-            grid_volume = fx_cube.data
-            grid_volume_found = True
-            cube_shape = cube.data.shape
-
-    if not grid_volume_found:
-        grid_volume = calculate_volume(cube)
+    operation = get_iris_analysis_operation(operator)
+    coords = [cube.coord(axis='z'), 'longitude', 'latitude']
 
-    # Check whether the dimensions are right.
-    if cube.data.ndim == 4 and grid_volume.ndim == 3:
-        grid_volume = np.tile(grid_volume,
-                              [cube_shape[0], 1, 1, 1])
+    if not operator_accept_weights(operator):
+        return cube.collapsed(coords, operation)
 
-    if cube.data.shape != grid_volume.shape:
+    grid_volume = _load_volume(cube, fx_variables)
+    try:
+        shape = np.broadcast_shapes(cube.shape, grid_volume.shape)
+    except ValueError:
+        shape = None
+    if shape != cube.shape:
         raise ValueError('Cube shape ({}) doesn`t match grid volume shape '
-                         '({})'.format(cube.data.shape, grid_volume.shape))
-
-    # #####
-    # Calculate global volume weighted average
-    result = []
-    # #####
-    # iterate over time and z-coordinate dimensions.
-    for time_itr in range(cube.shape[t_dim]):
-        # ####
-        # create empty output arrays
-        column = []
-        depth_volume = []
-
-        # ####
-        # iterate over time and z-coordinate dimensions.
-        for z_itr in range(cube.shape[1]):
-            # ####
-            # Calculate weighted mean for this time and layer
-            if operator == 'mean':
-                total = cube[time_itr, z_itr].collapsed(
-                    [cube.coord(axis='z'),
-                     'longitude', 'latitude'],
-                    iris.analysis.MEAN,
-                    weights=grid_volume[time_itr, z_itr]).data
-            else:
-                raise ValueError('Volume operator ({}) not '
-                                 'recognised.'.format(operator))
-            column.append(total)
-
-            try:
-                layer_vol = np.ma.masked_where(
-                    cube[time_itr, z_itr].data.mask,
-                    grid_volume[time_itr, z_itr]).sum()
-
-            except AttributeError:
-                # ####
-                # No mask in the cube data.
-                layer_vol = grid_volume.sum()
-            depth_volume.append(layer_vol)
-        # ####
-        # Calculate weighted mean over the water volumn
-        column = np.ma.array(column)
-        depth_volume = np.ma.array(depth_volume)
-        result.append(np.ma.average(column, weights=depth_volume))
-
-    # ####
-    # Send time series and dummy cube to cube creating tool.
-    times = np.array(cube.coord('time').points.astype(float))
-    result = np.ma.array(result)
-
-    # #####
-    # Create a small dummy output array for the output cube
-    if operator == 'mean':
-        src_cube = cube[:2, :2].collapsed([cube.coord(axis='z'),
-                                           'longitude', 'latitude'],
-                                          iris.analysis.MEAN,
-                                          weights=grid_volume[:2, :2], )
-
-    return _create_cube_time(src_cube, result, times)
+                         '({})'.format(cube.shape, grid_volume.shape))
+
+    data = cube.lazy_data()
+    axis = tuple(
+        sorted(
+            set(cube.coord_dims(coords[0]) + cube.coord_dims('latitude') +
+                cube.coord_dims('longitude'))))
+    result = weighted_statistic(data, grid_volume, axis, operator.lower())
+    return build_collapsed_cube(cube, coords, operation, result)
 
 
 def depth_integration(cube):
@@ -1,11 +1,24 @@
+import shutil
 from pathlib import Path
 
+import pytest
+
+import esmvalcore._cache
 from esmvalcore._config import read_config_developer_file
 from esmvalcore.cmor.table import CMOR_TABLES
 from esmvalcore.cmor.table import __file__ as root
 from esmvalcore.cmor.table import read_cmor_tables
 
 
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Use an empty CMOR table cache."""
+    monkeypatch.setattr(esmvalcore._cache, 'CACHE_DIR',
+                        str(tmp_path / 'cache'))
+    yield tmp_path / 'cache' / 'cmor_tables'
+    read_cmor_tables(read_config_developer_file())
+
+
 def test_read_cmor_tables():
     """Test that the function `read_cmor_tables` loads the tables correctly."""
     # Read the tables
@@ -33,3 +46,66 @@ def test_read_cmor_tables():
     table = CMOR_TABLES[project]
     assert Path(table._cmor_folder) == table_path / 'obs4mips' / 'Tables'
     assert table.strict is False
+
+
+def test_read_cmor_tables_lazy(cache_dir):
+    """Test that the tables are only read when a project is used."""
+    read_cmor_tables(read_config_developer_file())
+    assert not cache_dir.exists()
+
+    var_info = CMOR_TABLES['CMIP6'].get_variable('Amon', 'tas')
+    assert var_info.short_name == 'tas'
+    assert CMOR_TABLES['CMIP6'].default is CMOR_TABLES['custom']
+    assert sorted(p.name.split('_')[0] for p in cache_dir.iterdir()) == [
+        'CMIP6Info',
+        'CustomInfo',
+    ]
+
+
+def test_read_cmor_tables_cached(cache_dir):
+    """Test that the cached tables are used if available."""
+    cfg_developer = {'CMIP5': {'cmor_type': 'CMIP5'}}
+    read_cmor_tables(cfg_developer)
+    table = CMOR_TABLES['CMIP5']
+    (cache_file, ) = cache_dir.glob('CMIP5Info_*')
+
+    read_cmor_tables(cfg_developer)
+    cached_table = CMOR_TABLES['CMIP5']
+    assert cached_table is not table
+    assert cached_table.default is CMOR_TABLES['custom']
+    assert cached_table.tables.keys() == table.tables.keys()
+    assert cached_table.coords.keys() == table.coords.keys()
+    var_info = cached_table.get_variable('Amon', 'tas')
+    assert var_info.coordinates.keys() == {'time', 'latitude', 'longitude',
+                                           'height2m'}
+    assert list(cache_dir.glob('CMIP5Info_*')) == [cache_file]
+
+
+def test_read_cmor_tables_cache_outdated(cache_dir, tmp_path):
+    """Test that the tables are read again when a table file changes."""
+    table_path = tmp_path / 'cmip5'
+    shutil.copytree(Path(root).parent / 'tables' / 'cmip5', table_path)
+    cfg_developer = {
+        'CMIP5': {
+            'cmor_type': 'CMIP5',
+            'cmor_path': str(table_path),
+        },
+    }
+    read_cmor_tables(cfg_developer)
+    assert CMOR_TABLES['CMIP5'].get_variable('Amon', 'tas').units == 'K'
+
+    table_file = table_path / 'Tables' / 'CMIP5_Amon'
+    head, tail = table_file.read_text().split('variable_entry:    tas\n')
+    tail = tail.replace('units:             K\n', 'units: degC\n', 1)
+    table_file.write_text(f'{head}variable_entry:    tas\n{tail}')
+    read_cmor_tables(cfg_developer)
+    assert CMOR_TABLES['CMIP5'].get_variable('Amon', 'tas').units == 'degC'
+    assert len(list(cache_dir.glob('CMIP5Info_*'))) == 1
+
+
+def test_read_cmor_tables_cache_disabled(cache_dir, monkeypatch):
+    """Test that nothing is stored on disk if the cache is disabled."""
+    monkeypatch.setattr(esmvalcore._cache, 'CACHE_DIR', None)
+    read_cmor_tables({'CMIP5': {'cmor_type': 'CMIP5'}})
+    assert CMOR_TABLES['CMIP5'].get_variable('Amon', 'tas').units == 'K'
+    assert not cache_dir.parent.exists()
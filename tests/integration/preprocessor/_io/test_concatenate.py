@@ -278,6 +278,24 @@ class TestConcatenate(unittest.TestCase):
             concatenated.coord('time').points,
             np.array([1., 2., 3., 4., 5., 6., 7., 8., 9., 10., 11., 12.]))
 
+    def test_concatenate_many_with_overlap(self):
+        """Test concatenation of many cubes that overlap in time."""
+        raw_cubes = []
+        for i in range(50):
+            points = 10. * i + np.arange(12.)
+            raw_cubes.append(
+                Cube(np.full(points.shape, float(i)),
+                     var_name='sample',
+                     dim_coords_and_dims=((self._model_coord.copy(points),
+                                           0), )))
+        raw_cubes.reverse()
+        concatenated = _io.concatenate(raw_cubes)
+        np.testing.assert_array_equal(
+            concatenated.coord('time').points, np.arange(502.))
+        expected_data = np.repeat(np.arange(50.), 10)
+        expected_data = np.append(expected_data, [49., 49.])
+        np.testing.assert_array_equal(concatenated.data, expected_data)
+
     def test_concatenate_with_overlap_same_start(self):
         """Test a more generic case."""
         cube1 = self.raw_cubes[0]
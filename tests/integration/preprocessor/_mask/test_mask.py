@@ -6,10 +6,12 @@ module.
 
 """
 
+import dask.array as da
 import iris
 import numpy as np
 import pytest
 
+from esmvalcore._provenance import get_recipe_provenance
 from esmvalcore.preprocessor import (PreprocessorFile, mask_fillvalues,
                                      mask_landsea, mask_landseaice)
 from tests import assert_array_equal
@@ -200,6 +202,34 @@ class Test:
         assert_array_equal(result_2.data.mask, data_2.mask)
         assert_array_equal(result_1.data, data_1)
 
+    def test_mask_fillvalues_lazy(self, tmp_path):
+        """Test that mask_fillvalues works on lazy data."""
+        data_1 = np.ma.masked_array(np.full((4, 3, 3), 10.))
+        data_1[:3, 0, 0] = np.ma.masked
+        data_2 = np.ma.masked_array(np.full((4, 3, 3), 10.))
+        data_2[1:, 1, 2] = np.nan
+        coords_spec = [(self.times, 0), (self.lats, 1), (self.lons, 2)]
+        activity = get_recipe_provenance({}, 'recipe.yml')
+        products = []
+        for i, data in enumerate([data_1, data_2]):
+            cube = iris.cube.Cube(da.from_array(data, chunks=(2, 3, 3)),
+                                  dim_coords_and_dims=coords_spec)
+            product = PreprocessorFile(
+                attributes={'filename': str(tmp_path / f'file{i}.nc')},
+                settings={})
+            product.cubes = [cube]
+            product.initialize_provenance(activity)
+            products.append(product)
+        mask_fillvalues(products, 0.5, time_window=1)
+        expected_mask = np.zeros((4, 3, 3), dtype=bool)
+        expected_mask[:, 0, 0] = True
+        expected_mask[:, 1, 2] = True
+        for product in products:
+            cube = product.cubes[0]
+            assert cube.has_lazy_data()
+            assert_array_equal(cube.data.mask, expected_mask)
+            assert_array_equal(cube.data.data[~expected_mask], 10.)
+
     def test_mask_fillvalues_zero_threshold(self, tmp_path):
         """Test the fillvalues mask: func mask_fillvalues for 0-threshold"""
         data_1 = self.mock_data
@@ -129,6 +129,25 @@ class Test(tests.Test):
         np.testing.assert_allclose(result.coord('air_pressure').points,
                                    [1.0, 2.0])
 
+    def test_interpolation__lazy_multidimensional_levels(self):
+        # Source levels that vary along the horizontal dimensions
+        src_levels = np.arange(12.).reshape(3, 2, 2) / 10.
+        src_levels += np.arange(3.)[:, np.newaxis, np.newaxis]
+        coord = iris.coords.AuxCoord(src_levels, long_name='level_height')
+        self.cube.add_aux_coord(coord, (1, 2, 3))
+        self.cube.data = self.cube.lazy_data().rechunk((1, 3, 1, 2))
+        levels = [0.5, 1.5]
+        result = extract_levels(self.cube, levels, 'linear',
+                                coordinate='level_height')
+        self.assertTrue(result.has_lazy_data())
+        self.shape[self.z_dim] = len(levels)
+        self.assertEqual(result.shape, tuple(self.shape))
+        expected = np.empty(result.shape)
+        for i, j, k in np.ndindex(2, 2, 2):
+            expected[i, :, j, k] = np.interp(levels, src_levels[:, j, k],
+                                             self.cube.data[i, :, j, k])
+        np.testing.assert_allclose(result.data, expected)
+
 
 if __name__ == '__main__':
     unittest.main()
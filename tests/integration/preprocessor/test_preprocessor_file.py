@@ -0,0 +1,129 @@
+"""Integration tests for loading the input files of a PreprocessorFile."""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import iris
+import numpy as np
+import pytest
+from cf_units import Unit
+from iris.coords import DimCoord
+from iris.cube import Cube
+
+import esmvalcore.preprocessor
+from esmvalcore._provenance import TrackedFile, get_recipe_provenance
+from esmvalcore._task import TaskSet
+from esmvalcore.preprocessor import PreprocessingTask, PreprocessorFile
+from esmvalcore.preprocessor._io import concatenate_callback
+
+
+def _create_yearly_file(path, year):
+    """Create a file with monthly surface temperature for one year."""
+    units = Unit('days since 1850-01-01', calendar='360_day')
+    days = 360 * (year - 1850) + 30 * np.arange(12) + 15.
+    time = DimCoord(days,
+                    bounds=np.stack([days - 15, days + 15], axis=-1),
+                    standard_name='time',
+                    var_name='time',
+                    units=units)
+    lat = DimCoord([-45., 45.],
+                   bounds=[[-90., 0.], [0., 90.]],
+                   standard_name='latitude',
+                   var_name='lat',
+                   units='degrees_north')
+    lon = DimCoord([90., 270.],
+                   bounds=[[0., 180.], [180., 360.]],
+                   standard_name='longitude',
+                   var_name='lon',
+                   units='degrees_east')
+    data = np.arange(48, dtype=np.float32).reshape(12, 2, 2) + year
+    cube = Cube(data,
+                standard_name='surface_temperature',
+                var_name='ts',
+                units='K',
+                dim_coords_and_dims=[(time, 0), (lat, 1), (lon, 2)])
+    filename = str(path / f'ts_Amon_{year}01-{year}12.nc')
+    iris.save(cube, filename)
+    return filename
+
+
+def _create_product(tmp_path, **kwargs):
+    files = [
+        _create_yearly_file(tmp_path, year) for year in range(1850, 1854)
+    ]
+    fix = {
+        'project': 'CMIP6',
+        'dataset': 'CanESM5',
+        'short_name': 'ts',
+        'mip': 'Amon',
+    }
+    settings = {
+        'load': {
+            'callback': concatenate_callback
+        },
+        'fix_metadata': dict(fix, frequency='mon'),
+    }
+    attributes = {'filename': str(tmp_path / 'out' / 'ts.nc')}
+    ancestors = [TrackedFile(f, {}) for f in files]
+    return PreprocessorFile(attributes, settings, ancestors, **kwargs)
+
+
+def _load(product):
+    product.apply('fix_metadata')
+    return product.cubes
+
+
+@pytest.mark.parametrize('max_load_workers', [2, 4])
+def test_parallel_load(tmp_path, max_load_workers):
+    reference = _load(_create_product(tmp_path))
+    assert len(reference) == 4
+    assert reference[0].long_name == 'Surface Temperature'
+
+    product = _create_product(tmp_path, max_load_workers=max_load_workers)
+    cubes = _load(product)
+    assert product._file_steps == ('load', 'fix_metadata')
+    assert len(cubes) == len(reference)
+    for cube, reference_cube in zip(cubes, reference):
+        assert cube.long_name == reference_cube.long_name
+        assert cube.attributes == reference_cube.attributes
+        assert cube.coords() == reference_cube.coords()
+        np.testing.assert_array_equal(cube.data, reference_cube.data)
+
+
+def test_no_parallel_fix_with_derive(tmp_path):
+    product = _create_product(tmp_path, max_load_workers=2)
+    product.settings['derive'] = {}
+    assert product.cubes[0].long_name is None
+    assert product._file_steps == ('load', )
+
+
+def test_no_parallel_load_in_daemon(tmp_path, monkeypatch):
+    """Test that files are loaded one after another in a daemonic process."""
+    product = _create_product(tmp_path, max_load_workers=4)
+    monkeypatch.setattr(multiprocessing.current_process(), 'daemon', True)
+    monkeypatch.setattr(esmvalcore.preprocessor, 'ProcessPoolExecutor', None)
+    cubes = _load(product)
+    assert len(cubes) == 4
+    assert product._file_steps == ('load', 'fix_metadata')
+
+
+def test_parallel_load_in_task(tmp_path, monkeypatch):
+    """Test that a task loads files in parallel if tasks run one by one."""
+    max_workers = []
+
+    class _ProcessPoolExecutor(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            max_workers.append(kwargs['max_workers'])
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(esmvalcore.preprocessor, 'ProcessPoolExecutor',
+                        _ProcessPoolExecutor)
+    product = _create_product(tmp_path, max_load_workers=2)
+    product.settings['concatenate'] = {}
+    task = PreprocessingTask(
+        [product], order=['load', 'fix_metadata', 'concatenate', 'save'])
+    task.initialize_provenance(get_recipe_provenance({}, 'recipe.yml'))
+    TaskSet([task]).run(max_parallel_tasks=1)
+
+    assert max_workers == [2]
+    assert product._file_steps == ('load', 'fix_metadata')
+    assert iris.load_cube(product.filename).shape == (48, 2, 2)
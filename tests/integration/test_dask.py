@@ -0,0 +1,95 @@
+"""Tests for the dask scheduler configuration."""
+import dask
+import dask.array as da
+import iris
+import numpy as np
+import pytest
+from iris.cube import Cube
+
+from esmvalcore._dask import (
+    fetch_from_cluster,
+    get_distributed_client,
+    get_task_threads,
+    start_scheduler,
+    use_scheduler,
+)
+from esmvalcore.preprocessor._io import save
+
+distributed = pytest.importorskip('dask.distributed')
+
+
+@pytest.mark.parametrize('settings, threads', [
+    ({}, 1),
+    ({'threads_per_worker': 2}, 2),
+    ({'scheduler': 'synchronous', 'threads_per_worker': 2}, 1),
+    ({'scheduler': 'local', 'threads_per_worker': 2}, 1),
+])
+def test_get_task_threads(settings, threads):
+    assert get_task_threads(settings) == threads
+
+
+def test_use_scheduler_threads():
+    settings = {'scheduler': 'threads', 'threads_per_worker': 2}
+    with use_scheduler(settings):
+        assert dask.config.get('scheduler') == 'threads'
+        assert dask.config.get('num_workers') == 2
+        assert get_distributed_client() is None
+
+
+def test_start_scheduler_not_distributed():
+    with start_scheduler({'scheduler': 'threads'}) as address:
+        assert address is None
+
+
+@pytest.fixture(scope='module')
+def scheduler_address():
+    settings = {'scheduler': 'local', 'n_workers': 1, 'threads_per_worker': 1}
+    with start_scheduler(settings) as address:
+        yield address
+
+
+def test_use_scheduler_distributed(scheduler_address):
+    with use_scheduler({}, scheduler_address):
+        client = get_distributed_client()
+        assert client.scheduler.address == scheduler_address
+        assert da.arange(10).sum().compute() == 45
+    assert get_distributed_client() is None
+
+
+def test_save_distributed(scheduler_address, tmp_path):
+    data = da.ma.masked_equal(da.arange(24., chunks=5).reshape(4, 6), 7)
+    cube = Cube(data, var_name='tas', units='K')
+    filename = str(tmp_path / 'tas.nc')
+    with use_scheduler({}, scheduler_address):
+        save([cube], filename)
+    assert cube.has_lazy_data()
+
+    loaded = iris.load_cube(filename)
+    np.testing.assert_array_equal(loaded.data, data.compute())
+    assert loaded.data.mask[1, 1]
+
+
+def _record_block(block, filename):
+    """Record that a block was computed."""
+    with open(filename, 'a') as file:
+        file.write('computed\n')
+    return block
+
+
+def test_fetch_from_cluster(scheduler_address, tmp_path):
+    record = tmp_path / 'computed.txt'
+    data = da.map_blocks(_record_block,
+                         da.arange(24., chunks=5),
+                         filename=str(record),
+                         meta=np.array((), dtype=np.float64))
+    # The mean is shared by all chunks of the result
+    data = (data - data.mean()).reshape(4, 6)
+    with use_scheduler({}, scheduler_address):
+        client = get_distributed_client()
+        fetched = fetch_from_cluster(client, data)
+        assert fetched.chunks == data.chunks
+        with dask.config.set(scheduler='threads'):
+            np.testing.assert_array_equal(fetched.compute(),
+                                          np.arange(24.).reshape(4, 6) - 11.5)
+    # Every input chunk is only computed once on the cluster
+    assert record.read_text().count('computed') == 5
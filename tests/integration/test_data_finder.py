@@ -8,6 +8,7 @@ import yaml
 
 import esmvalcore._config
 from esmvalcore._data_finder import get_input_filelist, get_output_file
+from esmvalcore._data_index import DataIndex
 from esmvalcore.cmor.table import read_cmor_tables
 
 # Initialize with standard config developer file
@@ -100,3 +101,26 @@ def test_get_input_filelist(root, cfg):
     assert sorted(input_filelist) == sorted(ref_files)
     assert sorted(dirnames) == sorted(ref_dirs)
     assert sorted(filenames) == sorted(ref_patterns)
+
+
+@pytest.mark.parametrize('cfg', CONFIG['get_input_filelist'])
+def test_get_input_filelist_indexed(root, cfg):
+    """Test retrieving input filelist from an index of the input data."""
+    create_tree(root, cfg.get('available_files'),
+                cfg.get('available_symlinks'))
+    index_file = os.path.join(os.path.dirname(root), 'index.sqlite')
+    data_index = DataIndex(index_file)
+    data_index.update(root)
+    data_index.close()
+
+    # Find files
+    rootpath = {cfg['variable']['project']: [root]}
+    drs = {cfg['variable']['project']: cfg['drs']}
+    reference = get_input_filelist(dict(cfg['variable']), rootpath, drs)
+    result = get_input_filelist(dict(cfg['variable']),
+                                rootpath,
+                                drs,
+                                data_index=index_file)
+
+    for ref_paths, paths in zip(reference, result):
+        assert sorted(paths) == sorted(ref_paths)
@@ -13,7 +13,7 @@ from unittest.mock import patch
 import pytest
 from fire.core import FireExit
 
-from esmvalcore._main import Config, ESMValTool, Recipes, run
+from esmvalcore._main import Config, Data, ESMValTool, Recipes, run
 
 
 def wrapper(f):
@@ -178,3 +178,52 @@ def test_get_config_user_bad_option_fails():
                    '--bad_option=path'):
         with pytest.raises(FireExit):
             run()
+
+
+@patch('esmvalcore._main.Data.index', new=wrapper(Data.index))
+def test_data_index():
+    """Test data index command"""
+    with arguments('esmvaltool', 'data', 'index'):
+        run()
+
+
+def test_data_index_with_config(tmp_path):
+    """Test data index command with a config file"""
+    root = tmp_path / 'data'
+    (root / 'CMIP6').mkdir(parents=True)
+    config_file = tmp_path / 'config-user.yml'
+    index_file = tmp_path / 'index.sqlite'
+    config_file.write_text(f"data_index: {index_file}\n"
+                           f"rootpath:\n  default: {root}\n")
+    with arguments('esmvaltool', 'data', 'index',
+                   f'--config_file={config_file}'):
+        run()
+    assert index_file.is_file()
+
+
+def test_cache_list_and_prune(tmp_path, capsys):
+    """Test cache list and prune commands"""
+    from esmvalcore._product_cache import ProductCache
+    cache_dir = tmp_path / 'cache'
+    source = tmp_path / 'tas.nc'
+    source.write_bytes(b'a' * 10)
+    cache = ProductCache(str(cache_dir))
+    cache.store('0123456789abcdef', str(source))
+    cache.close()
+    config_file = tmp_path / 'config-user.yml'
+    config_file.write_text(f"product_cache: {cache_dir}\n"
+                           "rootpath: {}\n")
+
+    with arguments('esmvaltool', 'cache', 'list',
+                   f'--config_file={config_file}'):
+        run()
+    output = capsys.readouterr().out
+    assert '0123456789ab tas.nc' in output
+    assert '1 files' in output
+
+    with arguments('esmvaltool', 'cache', 'prune',
+                   f'--config_file={config_file}'):
+        run()
+    cache = ProductCache(str(cache_dir))
+    assert cache.entries() == []
+    cache.close()
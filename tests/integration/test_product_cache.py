@@ -0,0 +1,126 @@
+"""Tests for the cache of preprocessed files."""
+import iris
+import numpy as np
+import pytest
+from iris.cube import Cube
+
+import esmvalcore.preprocessor
+from esmvalcore._product_cache import ProductCache, get_product_key
+from esmvalcore._provenance import TrackedFile, get_recipe_provenance
+from esmvalcore.preprocessor import PreprocessingTask, PreprocessorFile
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    cube = Cube(np.arange(4.), var_name='tas', units='K')
+    filename = str(tmp_path / 'input' / 'tas.nc')
+    (tmp_path / 'input').mkdir()
+    iris.save(cube, filename)
+    return filename
+
+
+def _create_product(input_file, output_dir, **settings):
+    settings.setdefault('load', {})
+    attributes = {'filename': str(output_dir / 'preproc' / 'tas.nc')}
+    ancestors = [TrackedFile(input_file, {})]
+    return PreprocessorFile(attributes, settings, ancestors)
+
+
+def _run_task(product, cache_dir):
+    task = PreprocessingTask([product],
+                             product_cache=str(cache_dir),
+                             product_cache_size=1.)
+    task.initialize_provenance(get_recipe_provenance({}, 'recipe.yml'))
+    return task._run_steps()
+
+
+def test_product_key(input_file, tmp_path):
+    key = get_product_key(_create_product(input_file, tmp_path / 'run1'))
+    assert len(key) == 64
+    # The output location does not matter
+    assert get_product_key(_create_product(input_file,
+                                           tmp_path / 'run2')) == key
+    # The preprocessor settings do
+    other = _create_product(input_file, tmp_path / 'run1',
+                            convert_units={'units': 'degC'})
+    assert get_product_key(other) != key
+    # And so does the input data
+    iris.save(Cube(np.arange(5.), var_name='tas', units='K'), input_file)
+    assert get_product_key(_create_product(input_file,
+                                           tmp_path / 'run1')) != key
+
+
+def test_product_key_settings_files(input_file, tmp_path):
+    shapefile = tmp_path / 'region.shp'
+    shapefile.write_bytes(b'a')
+    product = _create_product(input_file,
+                              tmp_path,
+                              extract_shape={'shapefile': str(shapefile)})
+    key = get_product_key(product)
+    # A file used by the settings that changes in place changes the key
+    shapefile.write_bytes(b'ab')
+    assert get_product_key(product) != key
+
+
+def test_product_key_missing_input(tmp_path):
+    product = _create_product(str(tmp_path / 'missing.nc'), tmp_path)
+    assert get_product_key(product) is None
+
+
+def test_product_key_derived(input_file, tmp_path):
+    ancestor = _create_product(input_file, tmp_path / 'derive_input')
+    settings = {'derive': {'short_name': 'tas_derived'}}
+    attributes = {'filename': str(tmp_path / 'preproc' / 'derived.nc')}
+    product = PreprocessorFile(attributes, settings, [ancestor])
+    key = get_product_key(product)
+    assert key is not None
+    assert key != get_product_key(ancestor)
+
+
+def test_store_restore_prune(tmp_path):
+    cache = ProductCache(str(tmp_path / 'cache'))
+    source = tmp_path / 'source.nc'
+    source.write_bytes(b'a' * 1000)
+    target = tmp_path / 'preproc' / 'target.nc'
+
+    assert not cache.restore('abc', str(target))
+    cache.store('abc', str(source))
+    cache.store('def', str(source))
+    assert cache.restore('abc', str(target))
+    assert target.read_bytes() == source.read_bytes()
+    assert cache.size() == 2000
+
+    # Modifying the restored file does not modify the cached file
+    target.write_bytes(b'b' * 1000)
+    assert cache.restore('abc', str(target))
+    assert target.read_bytes() == source.read_bytes()
+
+    # 'def' is now the least recently used file
+    assert [entry[0] for entry in cache.entries()] == ['def', 'abc']
+    assert cache.prune(1500 / 2**30) == 1
+    assert [entry[0] for entry in cache.entries()] == ['abc']
+    assert not cache.restore('def', str(target))
+    assert cache.prune() == 1
+    assert cache.entries() == []
+    cache.close()
+
+
+def test_run_with_cache(input_file, tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    settings = {'convert_units': {'units': 'degC'}}
+    product = _create_product(input_file, tmp_path / 'run1', **settings)
+    _run_task(product, cache_dir)
+    result = iris.load_cube(product.filename)
+    np.testing.assert_allclose(result.data, np.arange(4.) - 273.15)
+    assert len(ProductCache(str(cache_dir)).entries()) == 1
+
+    def load(*args, **kwargs):
+        raise AssertionError("Cached product should not be loaded")
+
+    monkeypatch.setattr(esmvalcore.preprocessor, 'load', load)
+    product = _create_product(input_file, tmp_path / 'run2', **settings)
+    metadata_files = _run_task(product, cache_dir)
+    cached = iris.load_cube(product.filename)
+    np.testing.assert_array_equal(cached.data, result.data)
+    assert metadata_files == [str(tmp_path / 'run2' / 'preproc' /
+                                  'metadata.yml')]
@@ -177,7 +177,7 @@ def patched_datafinder(tmp_path, monkeypatch):
 
     tracking_id = tracking_ids()
 
-    def find_files(_, filenames):
+    def find_files(_, filenames, data_index=None):
         # Any occurrence of [something] in filename should have
         # been replaced before this function is called.
         for filename in filenames:
@@ -196,7 +196,7 @@ def patched_failing_datafinder(tmp_path, monkeypatch):
 
     tracking_id = tracking_ids()
 
-    def find_files(_, filenames):
+    def find_files(_, filenames, data_index=None):
         # Any occurrence of [something] in filename should have
         # been replaced before this function is called.
         for filename in filenames:
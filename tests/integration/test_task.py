@@ -1,11 +1,16 @@
+import contextlib
 import os
+import threading
+import time
 from functools import partial
 from multiprocessing.pool import ThreadPool
 
+import numpy as np
 import pytest
 
 import esmvalcore
-from esmvalcore._task import BaseTask, TaskSet
+from esmvalcore import _cache
+from esmvalcore._task import BaseTask, TaskSet, get_memory_record
 
 
 @pytest.fixture
@@ -79,3 +84,158 @@ def test_runner_uses_priority(monkeypatch, runner, example_tasks):
     print(order)
     assert len(order) == 12
     assert order == sorted(order)
+
+
+def test_run_parallel_memory_budget(monkeypatch):
+    """Check that running tasks stay within the memory budget."""
+    lock = threading.Lock()
+    running = []
+    max_used = []
+
+    def _run(self, input_files):
+        with lock:
+            running.append(self)
+            max_used.append(sum(t.memory for t in running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(self)
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'Pool', ThreadPool)
+
+    tasks = TaskSet()
+    for i in range(8):
+        task = BaseTask(name=f'task{i}')
+        task.memory = 3. if i % 4 == 0 else 1.
+        tasks.add(task)
+    big_task = BaseTask(name='big_task')
+    big_task.memory = 10.
+    tasks.add(big_task)
+
+    tasks.run(max_parallel_tasks=4, max_memory=4.)
+
+    assert all(task.output_files for task in tasks)
+    assert max(max_used) == 10.
+    assert sorted(max_used)[-2] <= 4.
+
+
+def test_run_parallel_threads(monkeypatch):
+    """Check that tasks using several threads occupy several processes."""
+    lock = threading.Lock()
+    running = []
+    max_used = []
+
+    def _run(self, input_files):
+        with lock:
+            running.append(self)
+            max_used.append(sum(t.threads for t in running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(self)
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'Pool', ThreadPool)
+
+    tasks = TaskSet()
+    for i in range(6):
+        task = BaseTask(name=f'task{i}')
+        task.threads = 2
+        tasks.add(task)
+
+    tasks.run(max_parallel_tasks=5)
+
+    assert all(task.output_files for task in tasks)
+    assert max(max_used) == 4
+
+
+def test_run_parallel_fails(monkeypatch, example_tasks):
+    """Check that an error in a task is raised."""
+    def _run(self, input_files):
+        raise ValueError(f"{self.name} failed")
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'Pool', ThreadPool)
+
+    with pytest.raises(ValueError, match='failed'):
+        example_tasks.run(max_parallel_tasks=2)
+
+
+def test_memory_record(monkeypatch, tmp_path, example_tasks):
+    """Check that the peak memory use of tasks is recorded and reused."""
+    def _run(self, input_files):
+        data = np.ones(2**25)  # 256 MB
+        time.sleep(0.3)
+        del data
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    memory_record = str(tmp_path / 'cache' / 'recipe_test.yml')
+
+    example_tasks.estimate_memory(memory_record)
+    assert all(task.memory == 0. for task in example_tasks.flatten())
+
+    example_tasks.run(max_parallel_tasks=1, max_memory=100.)
+    # Only the memory used by the task itself is recorded
+    assert all(0.1 < task.peak_memory < 1.
+               for task in example_tasks.flatten())
+    example_tasks.save_memory_record(memory_record)
+
+    for task in example_tasks.flatten():
+        task.peak_memory = None
+    example_tasks.estimate_memory(memory_record)
+    assert all(task.memory > 0. for task in example_tasks.flatten())
+
+
+def test_get_memory_record(monkeypatch, tmp_path):
+    """Check that the memory record is only stored in the cache."""
+    monkeypatch.setattr(_cache, 'CACHE_DIR', None)
+    assert get_memory_record('recipe_test.yml') is None
+
+    monkeypatch.setattr(_cache, 'CACHE_DIR', str(tmp_path))
+    record = get_memory_record(str(tmp_path / 'a' / 'recipe_test.yml'))
+    assert os.path.dirname(record) == str(tmp_path / 'task_memory')
+    assert os.path.basename(record).startswith('recipe_test_')
+    other = get_memory_record(str(tmp_path / 'b' / 'recipe_test.yml'))
+    assert other != record
+
+
+def test_no_memory_record_without_limit(monkeypatch, example_tasks):
+    """Check that memory use is only measured if it is limited."""
+    def _run(self, input_files):
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'peak_memory_monitor', None)
+
+    example_tasks.run(max_parallel_tasks=1)
+    assert all(task.peak_memory is None for task in example_tasks.flatten())
+
+
+def test_start_scheduler_after_pool(monkeypatch, example_tasks):
+    """Check that the dask cluster is started after forking the workers."""
+    events = []
+
+    class _Pool(ThreadPool):
+        def __init__(self, *args, **kwargs):
+            events.append('pool')
+            super().__init__(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def start_scheduler(settings):
+        events.append('scheduler')
+        yield 'tcp://127.0.0.1:8786'
+
+    def _run(self, input_files):
+        assert self.scheduler_address == 'tcp://127.0.0.1:8786'
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'Pool', _Pool)
+    monkeypatch.setattr(esmvalcore._task, 'start_scheduler', start_scheduler)
+
+    example_tasks.run(max_parallel_tasks=2,
+                      dask_settings={'scheduler': 'local'})
+    assert events == ['pool', 'scheduler']
+    assert all(task.output_files for task in example_tasks.flatten())
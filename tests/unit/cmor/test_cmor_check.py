@@ -2,6 +2,7 @@
 
 import unittest
 
+import dask.array as da
 import iris
 import iris.coord_categorisation
 import iris.coords
@@ -829,6 +830,39 @@ class TestCMORCheck(unittest.TestCase):
         )
         self._check_debug_messages_on_metadata(automatic_fixes=True)
 
+    def test_lazy_coord_not_realized(self):
+        """Test that lazy coordinates are checked without realizing them."""
+        lat = self.cube.coord('latitude')
+        self.cube.remove_coord(lat)
+        lazy_lat = iris.coords.AuxCoord(
+            da.asarray(lat.points, chunks=5),
+            bounds=da.asarray(lat.bounds, chunks=5),
+            standard_name=lat.standard_name,
+            var_name=lat.var_name,
+            units=lat.units,
+        )
+        self.cube.add_aux_coord(lazy_lat, 1)
+        self.cube.data = self.cube.lazy_data()
+        self._check_cube()
+        self.assertTrue(self.cube.coord('latitude').has_lazy_points())
+        self.assertTrue(self.cube.coord('latitude').has_lazy_bounds())
+        self.assertTrue(self.cube.has_lazy_data())
+
+    def test_lazy_coord_not_monotonic(self):
+        """Fail if a lazy coordinate is not monotonic."""
+        lat = self.cube.coord('latitude')
+        self.cube.remove_coord(lat)
+        points = lat.points.copy()
+        points[[3, 4]] = points[[4, 3]]
+        lazy_lat = iris.coords.AuxCoord(
+            da.asarray(points, chunks=5),
+            standard_name=lat.standard_name,
+            var_name=lat.var_name,
+            units=lat.units,
+        )
+        self.cube.add_aux_coord(lazy_lat, 1)
+        self._check_fails_in_metadata()
+
     def test_bad_out_name_onedim_latitude(self):
         """Warning if onedimensional lat has bad var_name at metadata"""
         self.var_info.table_type = 'CMIP6'
@@ -0,0 +1,110 @@
+"""Unit tests for :class:`esmvalcore._data_index.DataIndex`."""
+import os
+import sqlite3
+
+import pytest
+
+from esmvalcore._data_finder import _get_data_index
+from esmvalcore._data_index import DataIndex
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Create a small directory tree with some files."""
+    root = tmp_path / 'root'
+    for filename in [
+            'CMIP6/MOHC/v20190101/tas_Amon_1850-1900.nc',
+            'CMIP6/MOHC/v20200101/tas_Amon_1850-1900.nc',
+            'CMIP6/MOHC/v20200101/pr_Amon_1850-1900.nc',
+            'CMIP6/NCC/v20190101/tas_Amon_1850-1900.nc',
+    ]:
+        path = root / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    return root
+
+
+@pytest.fixture
+def data_index(tmp_path, tree):
+    """Create an index of the directory tree."""
+    data_index = DataIndex(str(tmp_path / 'index.sqlite'))
+    yield data_index
+    data_index.close()
+
+
+def test_update(data_index, tree):
+    assert data_index.update(str(tree)) == 7
+    assert data_index.roots == {str(tree)}
+    assert data_index.covers(str(tree / 'CMIP6'))
+    assert not data_index.covers(str(tree) + 'x')
+    assert data_index.isdir(str(tree / 'CMIP6' / 'MOHC'))
+    assert sorted(data_index.listdir(str(tree / 'CMIP6'))) == ['MOHC', 'NCC']
+
+
+def test_update_incremental(data_index, tree):
+    data_index.update(str(tree))
+    assert data_index.update(str(tree)) == 0
+
+    (tree / 'CMIP6' / 'MOHC' / 'v20190101' / 'pr_Amon_1850-1900.nc').touch()
+    os.rename(tree / 'CMIP6' / 'NCC', tree / 'CMIP6' / 'NorESM')
+    assert data_index.update(str(tree)) == 4
+    assert sorted(data_index.listdir(str(tree / 'CMIP6'))) == [
+        'MOHC', 'NorESM'
+    ]
+    assert not data_index.isdir(str(tree / 'CMIP6' / 'NCC' / 'v20190101'))
+    files = data_index.find_files([str(tree / 'CMIP6' / 'MOHC')],
+                                  ['pr_*.nc'])
+    assert sorted(files) == [
+        str(tree / 'CMIP6' / 'MOHC' / 'v20190101' / 'pr_Amon_1850-1900.nc'),
+        str(tree / 'CMIP6' / 'MOHC' / 'v20200101' / 'pr_Amon_1850-1900.nc'),
+    ]
+
+
+def test_persistent(tmp_path, tree):
+    filename = str(tmp_path / 'index.sqlite')
+    data_index = DataIndex(filename)
+    data_index.update(str(tree))
+    data_index.close()
+
+    data_index = DataIndex(filename)
+    assert data_index.roots == {str(tree)}
+    assert data_index.update(str(tree)) == 0
+    data_index.close()
+
+
+def test_glob_dirs(data_index, tree):
+    data_index.update(str(tree))
+    pattern = str(tree / 'CMIP6' / '*' / 'v2019*')
+    assert data_index.glob_dirs(pattern) == [
+        str(tree / 'CMIP6' / 'MOHC' / 'v20190101'),
+        str(tree / 'CMIP6' / 'NCC' / 'v20190101'),
+    ]
+    assert data_index.glob_dirs(str(tree / 'CMIP6' / 'NCC')) == [
+        str(tree / 'CMIP6' / 'NCC')
+    ]
+    assert data_index.glob_dirs(str(tree / 'CMIP6' / 'IPSL')) == []
+
+
+def test_find_files(data_index, tree):
+    data_index.update(str(tree))
+    files = data_index.find_files([str(tree / 'CMIP6')], ['tas_*.nc'])
+    assert len(files) == 3
+    assert all(os.path.basename(f) == 'tas_Amon_1850-1900.nc' for f in files)
+
+
+def test_get_data_index_missing(tmp_path):
+    filename = str(tmp_path / 'missing.sqlite')
+    assert _get_data_index(filename) is None
+    assert not os.path.exists(filename)
+
+
+def test_get_data_index_read_only(tmp_path, tree):
+    filename = str(tmp_path / 'index.sqlite')
+    data_index = DataIndex(filename)
+    data_index.update(str(tree))
+    data_index.close()
+
+    data_index = _get_data_index(filename)
+    assert data_index.roots == {str(tree)}
+    with pytest.raises(sqlite3.OperationalError):
+        data_index.update(str(tree))
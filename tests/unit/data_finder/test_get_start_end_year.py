@@ -1,8 +1,13 @@
 """Unit tests for :func:`esmvalcore._data_finder.regrid._stock_cube`"""
 
+import os
+
 import iris
 import pytest
+from netCDF4 import Dataset
 
+import esmvalcore._cache
+import esmvalcore._data_finder
 from esmvalcore._data_finder import get_start_end_year
 
 FILENAME_CASES = [
@@ -31,6 +36,25 @@ def test_get_start_end_year(case):
     assert case_end == end
 
 
+@pytest.fixture(autouse=True)
+def time_range_cache(monkeypatch, tmp_path):
+    """Use a temporary time range cache."""
+    monkeypatch.setattr(esmvalcore._cache, 'CACHE_DIR',
+                        str(tmp_path / 'cache'))
+    return str(tmp_path / 'cache' / 'time_ranges.sqlite')
+
+
+def write_time_file(filename, points, calendar='standard'):
+    """Write a file with only a time variable."""
+    with Dataset(filename, 'w') as dataset:
+        dataset.createDimension('time', len(points))
+        time = dataset.createVariable('time', 'f8', ('time', ))
+        time.standard_name = 'time'
+        time.units = 'days since 1990-01-01'
+        time.calendar = calendar
+        time[:] = points
+
+
 def test_read_time_from_cube(monkeypatch, tmp_path):
     """Try to get time from cube if no date in filename"""
     monkeypatch.chdir(tmp_path)
@@ -50,3 +74,51 @@ def test_fails_if_no_date_present():
     """Test raises if no date is present"""
     with pytest.raises((ValueError, OSError)):
         get_start_end_year('var_whatever')
+
+
+def test_read_time_calendar(tmp_path):
+    """Test that the calendar of the time variable is used."""
+    filename = str(tmp_path / 'test.nc')
+    write_time_file(filename, [0, 365 * 3 - 1], calendar='365_day')
+    assert get_start_end_year(filename) == (1990, 1992)
+
+
+def test_read_time_cached(mocker, tmp_path, time_range_cache):
+    """Test that the time range of a file is only read once."""
+    filename = str(tmp_path / 'test.nc')
+    write_time_file(filename, [0, 366])
+    read = mocker.spy(esmvalcore._data_finder, '_read_time_range')
+    assert get_start_end_year(filename) == (1990, 1991)
+    assert get_start_end_year(filename) == (1990, 1991)
+    read.assert_called_once()
+    assert os.path.exists(time_range_cache)
+
+
+def test_read_time_cache_outdated(mocker, tmp_path):
+    """Test that the time range is read again if the file changed."""
+    filename = str(tmp_path / 'test.nc')
+    write_time_file(filename, [0, 366])
+    assert get_start_end_year(filename) == (1990, 1991)
+    write_time_file(filename, [0, 366, 731])
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert get_start_end_year(filename) == (1990, 1992)
+
+
+def test_read_time_cache_disabled(monkeypatch, tmp_path, time_range_cache):
+    """Test that nothing is stored on disk if the cache is disabled."""
+    monkeypatch.setattr(esmvalcore._cache, 'CACHE_DIR', None)
+    filename = str(tmp_path / 'test.nc')
+    write_time_file(filename, [0, 366])
+    assert get_start_end_year(filename) == (1990, 1991)
+    assert not os.path.exists(time_range_cache)
+
+
+def test_read_time_unwritable_cache(mocker, tmp_path):
+    """Test that the time range is read if the cache cannot be used."""
+    mocker.patch.object(esmvalcore._data_finder,
+                        '_get_time_range_cache',
+                        return_value=None)
+    filename = str(tmp_path / 'test.nc')
+    write_time_file(filename, [0, 366])
+    assert get_start_end_year(filename) == (1990, 1991)
@@ -2,16 +2,19 @@
 import unittest
 from pathlib import Path
 
+import dask.array as da
 import fiona
 import iris
 import numpy as np
 import pytest
+import shapely.vectorized
 from cf_units import Unit
 from iris.cube import Cube
 from shapely.geometry import Polygon, mapping
 
 import tests
 import esmvalcore.preprocessor
+from esmvalcore.preprocessor import _area, _shared
 from esmvalcore.preprocessor._area import (_crop_cube, area_statistics,
                                            extract_named_regions,
                                            extract_region, extract_shape)
@@ -794,5 +797,92 @@ def test_extract_shape_wrong_method_raises():
                              "'contains', 'representative'.")
 
 
+@pytest.mark.parametrize('irregular', [True, False])
+def test_select_contained_points(irregular):
+    """Test that prefiltering the points does not change the selection."""
+    shape = Polygon([(10., 5.), (40., -20.), (60., 30.), (20., 40.)])
+    lon, lat = np.meshgrid(np.arange(0., 90., 2.5), np.arange(-45., 45., 5.))
+    if irregular:
+        lon = lon + 0.1 * lat
+    result = _area._select_contained_points(shape, lon, lat)
+    expected = shapely.vectorized.contains(shape, lon, lat)
+    assert expected.any()
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_select_contained_points_outside_grid():
+    shape = Polygon([(100., 50.), (110., 50.), (110., 60.)])
+    lon, lat = np.meshgrid(np.arange(0., 90., 10.), np.arange(-40., 40., 10.))
+    result = _area._select_contained_points(shape, lon, lat)
+    assert not result.any()
+
+
+def test_extract_shape_cached(make_testcube, square_shape, tmp_path,
+                              monkeypatch):
+    """Test that the selections are reused for the same grid."""
+    monkeypatch.setattr(_area, '_SHAPE_SELECTIONS', _area.OrderedDict())
+    shapefile = tmp_path / 'test_shape.shp'
+    expected = extract_shape(make_testcube, shapefile, crop=False)
+    assert len(_area._SHAPE_SELECTIONS) == 1
+
+    def get_masks(*args, **kwargs):
+        raise AssertionError("Cached selections should be used")
+
+    monkeypatch.setattr(_area, '_get_masks_from_geometries', get_masks)
+    result = extract_shape(make_testcube, shapefile, crop=False)
+    np.testing.assert_array_equal(result.data.data, expected.data.data)
+    np.testing.assert_array_equal(result.data.mask, expected.data.mask)
+
+
+def test_area_statistics_cached_weights(monkeypatch):
+    """Test that the area weights are reused for the same grid."""
+    monkeypatch.setattr(_shared, '_GRID_AREAS', _shared.OrderedDict())
+    data = np.ma.masked_array(np.arange(50.).reshape(2, 5, 5), mask=False)
+    data[0, 0, 0] = np.ma.masked
+    times = iris.coords.DimCoord([0., 1.],
+                                 standard_name='time',
+                                 units='days since 2000-01-01')
+    lats = iris.coords.DimCoord(np.linspace(-40., 40., 5),
+                                standard_name='latitude',
+                                units='degrees_north')
+    lons = iris.coords.DimCoord(np.linspace(0., 80., 5),
+                                standard_name='longitude',
+                                units='degrees_east')
+    cube = Cube(da.from_array(data, chunks=(1, 2, 5)),
+                dim_coords_and_dims=[(times, 0), (lats, 1), (lons, 2)])
+    lats.guess_bounds()
+    lons.guess_bounds()
+
+    expected = cube.collapsed(
+        ['longitude', 'latitude'],
+        iris.analysis.MEAN,
+        weights=iris.analysis.cartography.area_weights(cube),
+    )
+    result = area_statistics(cube, 'mean')
+    assert result.has_lazy_data()
+    assert len(_shared._GRID_AREAS) == 1
+    assert result.metadata == expected.metadata
+    assert result.coords() == expected.coords()
+    np.testing.assert_allclose(result.data, expected.data)
+
+    def area_weights(*args, **kwargs):
+        raise AssertionError("Cached area weights should be used")
+
+    monkeypatch.setattr(iris.analysis.cartography, 'area_weights',
+                        area_weights)
+    result = area_statistics(cube[:1], 'mean')
+    np.testing.assert_allclose(result.data, expected.data[:1])
+
+
+def test_load_last_fx_data(monkeypatch):
+    """Test that the grid cell areas are read from the last fx file."""
+    monkeypatch.setattr(_shared, 'load_fx_data', lambda fx_file: fx_file)
+    fx_files = {'areacella': 'areacella.nc', 'areacello': 'areacello.nc',
+                'sftlf': None}
+    assert _shared.load_last_fx_data(fx_files) == 'areacello.nc'
+    assert _shared.load_last_fx_data({'areacella': None}) is None
+    assert _shared.load_last_fx_data(None) is None
+
+
 if __name__ == '__main__':
     unittest.main()
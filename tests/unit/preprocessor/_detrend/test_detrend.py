@@ -53,5 +53,28 @@ def test_decadal_average(method):
     assert_array_almost_equal(result.data, expected)
 
 
+def test_detrend_masked():
+    """Test linear detrending with masked values."""
+    cube = _create_sample_cube()
+    data = np.ma.masked_array(cube.data * 2.0, mask=False)
+    data[0, 5:10] = 1000.0
+    data[0, 5:10] = np.ma.masked
+    data[1, :-1] = np.ma.masked
+    cube.data = data
+
+    result = detrend(cube, 'time', 'linear')
+    assert result.has_lazy_data()
+    expected = np.ma.masked_array(np.zeros([2, 24]), mask=data.mask)
+    assert_array_almost_equal(result.data, expected)
+    np.testing.assert_array_equal(result.data.mask, data.mask)
+
+
+def test_detrend_invalid_method():
+    """Test detrending with an unknown method."""
+    cube = _create_sample_cube()
+    with pytest.raises(ValueError):
+        detrend(cube, 'time', 'quadratic')
+
+
 if __name__ == '__main__':
     unittest.main()
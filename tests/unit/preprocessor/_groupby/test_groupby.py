@@ -0,0 +1,160 @@
+"""Unit tests for :mod:`esmvalcore.preprocessor._groupby`."""
+import dask.array as da
+import iris
+import iris.coord_categorisation
+import numpy as np
+import pytest
+from cf_units import Unit
+
+from esmvalcore.preprocessor import _groupby
+from esmvalcore.preprocessor._groupby import aggregated_by, aggregated_by_all
+
+OPERATORS = [
+    iris.analysis.MEAN,
+    iris.analysis.SUM,
+    iris.analysis.MIN,
+    iris.analysis.MAX,
+    iris.analysis.STD_DEV,
+    iris.analysis.VARIANCE,
+    iris.analysis.RMS,
+]
+
+
+def _create_cube(lazy, masked):
+    """Create a cube with 3 years of daily data."""
+    n_times = 3 * 360
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(n_times, 2, 3)).astype(np.float32)
+    if masked:
+        data = np.ma.masked_array(data, mask=rng.random(data.shape) < 0.3)
+        data[:40, 0, 0] = np.ma.masked
+    if lazy:
+        data = da.from_array(data, chunks=(100, 2, 2))
+    time = iris.coords.DimCoord(
+        np.arange(n_times) + 0.5,
+        bounds=np.stack([np.arange(n_times), np.arange(n_times) + 1], -1),
+        standard_name='time',
+        units=Unit('days since 2000-01-01', calendar='360_day'),
+    )
+    lat = iris.coords.DimCoord([0., 10.], standard_name='latitude',
+                               units='degrees')
+    cube = iris.cube.Cube(
+        data,
+        var_name='tas',
+        units='K',
+        dim_coords_and_dims=[(time, 0), (lat, 1)],
+    )
+    cube.add_cell_measure(
+        iris.coords.CellMeasure(np.ones((2, 3)), measure='area'), (1, 2))
+    iris.coord_categorisation.add_year(cube, 'time')
+    iris.coord_categorisation.add_month_number(cube, 'time')
+    return cube
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+@pytest.mark.parametrize('masked', [True, False])
+@pytest.mark.parametrize('coords', [
+    'year',
+    'month_number',
+    ['month_number', 'year'],
+])
+def test_aggregated_by_all(lazy, masked, coords):
+    """Test that :func:`aggregated_by_all` gives the same result as iris."""
+    cube = _create_cube(lazy, masked)
+    results = aggregated_by_all(cube, coords, OPERATORS)
+    assert len(results) == len(OPERATORS)
+    for operator, result in zip(OPERATORS, results):
+        expected = cube.aggregated_by(coords, operator)
+        assert result.has_lazy_data() == lazy
+        assert result.dtype == expected.dtype
+        assert result.metadata == expected.metadata
+        assert result.coords() == expected.coords()
+        assert result.cell_measures() == expected.cell_measures()
+        np.testing.assert_array_equal(np.ma.getmaskarray(result.data),
+                                      np.ma.getmaskarray(expected.data))
+        np.testing.assert_allclose(result.data,
+                                   expected.data,
+                                   rtol=1e-4,
+                                   atol=1e-6)
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+@pytest.mark.parametrize('masked', [True, False])
+def test_aggregated_by_single_value(lazy, masked):
+    """Test that groups with a single value are masked for the variance."""
+    data = np.arange(18, dtype=np.float64).reshape(9, 2)
+    if masked:
+        data = np.ma.masked_array(data)
+        data[2:5, 1] = np.ma.masked
+    if lazy:
+        data = da.from_array(data, chunks=(4, 2))
+    time = iris.coords.DimCoord(np.arange(9.),
+                                standard_name='time',
+                                units='days since 2000-01-01')
+    cube = iris.cube.Cube(data, var_name='x', dim_coords_and_dims=[(time, 0)])
+    cube.add_aux_coord(
+        iris.coords.AuxCoord([5, 5, 1, 1, 1, 1, 7, 7, 9], long_name='label'),
+        0)
+
+    operators = [iris.analysis.STD_DEV, iris.analysis.VARIANCE]
+    results = aggregated_by_all(cube, 'label', operators)
+    for operator, result in zip(operators, results):
+        # For input without a mask, iris returns NaN instead
+        expected = np.ma.masked_invalid(
+            cube.aggregated_by('label', operator).data)
+        mask = [[False, False], [False, masked], [False, False], [True, True]]
+        np.testing.assert_array_equal(np.ma.getmaskarray(result.data), mask)
+        np.testing.assert_array_equal(np.ma.getmaskarray(expected), mask)
+        np.testing.assert_allclose(result.data.compressed(),
+                                   expected.compressed())
+
+
+def test_aggregated_by_fallback():
+    """Test that unsupported operators are computed by iris."""
+    cube = _create_cube(lazy=True, masked=False)
+    result = aggregated_by(cube, 'year', iris.analysis.MEDIAN)
+    expected = cube.aggregated_by('year', iris.analysis.MEDIAN)
+    assert result == expected
+
+
+def test_aggregated_by_graph_size():
+    """Test that the task graph does not grow with the number of groups."""
+    cube = _create_cube(lazy=True, masked=False)
+    result = aggregated_by(cube, 'month_number', iris.analysis.MEAN)
+    n_chunks = cube.lazy_data().npartitions
+    assert len(result.lazy_data().dask) < 10 * n_chunks
+
+
+def test_aggregated_by_day_of_year_partial_size(monkeypatch):
+    """Test that chunks only hold their own groups for a climatology."""
+    sizes = {'partial': [], 'merged': []}
+    original_partial = _groupby._partial_statistics
+    original_merge = _groupby._merge_statistics
+
+    def partial_statistics(block, *args, block_info=None):
+        result = original_partial(block, *args, block_info=block_info)
+        sizes['partial'].append((block.shape[0], result.shape[1]))
+        return result
+
+    def merge_statistics(blocks, *args):
+        result = original_merge(blocks, *args)
+        sizes['merged'].append(
+            (sum(block.shape[1] for block in blocks), result.shape[1]))
+        return result
+
+    cube = _create_cube(lazy=True, masked=True)
+    cube.data = cube.lazy_data().rechunk((32, 2, 3))
+    iris.coord_categorisation.add_day_of_year(cube, 'time')
+    expected = cube.aggregated_by('day_of_year', iris.analysis.MEAN)
+
+    monkeypatch.setattr(_groupby, '_partial_statistics', partial_statistics)
+    monkeypatch.setattr(_groupby, '_merge_statistics', merge_statistics)
+    result = aggregated_by(cube, 'day_of_year', iris.analysis.MEAN)
+    np.testing.assert_allclose(result.data, expected.data, rtol=1e-5)
+
+    assert len(sizes['partial']) == cube.lazy_data().numblocks[0]
+    for n_times, n_groups in sizes['partial']:
+        assert n_groups <= n_times <= 32
+    for n_input, n_groups in sizes['merged']:
+        assert n_groups <= min(n_input, 32)
+    assert sum(n for _, n in sizes['merged']) >= 360
@@ -2,6 +2,7 @@
 from unittest import mock
 
 import cf_units
+import dask.array as da
 import iris
 import numpy as np
 
@@ -9,6 +10,8 @@ import tests
 from esmvalcore.preprocessor._mapping import (get_empty_data, map_slices,
                                               ref_to_dims_index)
 
+SRC_DATA = np.ma.masked_greater(np.arange(360.).reshape(3, 4, 5, 6), 300.)
+
 
 class TestHelpers(tests.Test):
     """Unit tests for all helper methods."""
@@ -222,7 +225,7 @@ class Test(tests.Test):
             attributes={},
             cell_methods={},
             aux_coords=[],
-            __getitem__=lambda a, b: mock.sentinel.src_data,
+            lazy_data=lambda: da.from_array(SRC_DATA, chunks=(1, 4, 5, 6)),
         )
         self.src_repr = mock.Mock(
             spec=iris.cube.Cube,
@@ -239,20 +242,18 @@ class Test(tests.Test):
             aux_coords=[],
         )
 
-    @mock.patch('esmvalcore.preprocessor._mapping.get_empty_data')
     @mock.patch('iris.cube.Cube')
-    def test_map_slices(self, mock_cube, mock_get_empty_data):
+    def test_map_slices(self, mock_cube):
         """Test map_slices."""
-        mock_get_empty_data.return_value = mock.sentinel.empty_data
         mock_cube.aux_coords = []
-        dst = map_slices(self.src_cube, lambda s: np.ones((2, 2)),
-                         self.src_repr, self.dst_repr)
+        func = mock.Mock(side_effect=lambda s: 2 * s[:, :4])
+        dst = map_slices(self.src_cube, func, self.src_repr, self.dst_repr)
         self.assertEqual(dst, mock_cube.return_value)
         dim_coords = self.src_cube.coords(dim_coords=True)[:2] \
             + self.dst_repr.coords(dim_coords=True)
         dim_coords_and_dims = [(c, i) for i, c in enumerate(dim_coords)]
         mock_cube.assert_called_once_with(
-            data=mock.sentinel.empty_data,
+            data=mock.ANY,
             standard_name=self.src_cube.standard_name,
             long_name=self.src_cube.long_name,
             var_name=self.src_cube.var_name,
@@ -262,3 +263,13 @@ class Test(tests.Test):
             dim_coords_and_dims=dim_coords_and_dims,
             aux_coords_and_dims=[],
         )
+        data = mock_cube.call_args[1]['data']
+        self.assertIsInstance(data, da.Array)
+        func.assert_not_called()
+        expected = 2 * SRC_DATA.reshape(3, 4, 30)[..., :4].reshape(
+            3, 4, 2, 2)
+        result = data.compute()
+        self.assert_array_equal(result, expected)
+        self.assert_array_equal(result.mask, expected.mask)
+        # The slices are mapped in chunks, not one by one
+        self.assertLess(func.call_count, 12)
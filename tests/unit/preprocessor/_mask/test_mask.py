@@ -1,14 +1,20 @@
 """Unit test for the :func:`esmvalcore.preprocessor._mask` function."""
 
+import os
 import unittest
+from collections import OrderedDict
 
+import dask.array as da
 import numpy as np
 
+import esmvalcore._cache
+import esmvalcore.preprocessor._mask
 import iris
 import tests
 from cf_units import Unit
 from esmvalcore.preprocessor._mask import (_apply_fx_mask, _check_dims,
                                            count_spells, _get_fx_mask,
+                                           _get_shp_mask,
                                            mask_above_threshold,
                                            mask_below_threshold,
                                            mask_glaciated, mask_inside_range,
@@ -108,6 +114,21 @@ class Test(tests.Test):
                                                      [False, False]]))
         self.assert_array_equal(result.data, expected)
 
+    def test_mask_glaciated_lazy(self):
+        """Test that the NE mask is applied lazily to all time steps."""
+        cube = iris.cube.Cube(da.ma.masked_equal(
+            da.arange(8.).reshape(2, 2, 2), 7.))
+        cube.add_dim_coord(self.time_cube.coord('time')[:2], 0)
+        cube.add_dim_coord(self.arr.coord('longitude'), 2)
+        cube.add_dim_coord(self.arr.coord('latitude'), 1)
+        result = mask_glaciated(cube, mask_out='glaciated')
+        self.assertTrue(result.has_lazy_data())
+        mask = [[True, True], [False, False]]
+        expected = np.ma.masked_array(np.arange(8.).reshape(2, 2, 2),
+                                      mask=[mask, mask])
+        expected[1, 1, 1] = np.ma.masked
+        self.assert_array_equal(result.data, expected)
+
     def test_mask_above_threshold(self):
         """Test to mask above a threshold."""
         result = mask_above_threshold(self.arr, 1.5)
@@ -133,5 +154,29 @@ class Test(tests.Test):
         self.assert_array_equal(result.data, expected)
 
 
+def test_get_shp_mask_cached(monkeypatch, tmp_path):
+    """Test that masks from shapefiles are cached."""
+    monkeypatch.setattr(esmvalcore._cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(esmvalcore.preprocessor._mask, '_SHAPEFILE_MASKS',
+                        OrderedDict())
+    shapefile = os.path.join(os.path.dirname(esmvalcore.preprocessor.__file__),
+                             'ne_masks', 'ne_10m_land.shp')
+    lon = np.array([0., 20.])
+    lat = np.array([0., 50.])
+    mask = _get_shp_mask(lon, lat, shapefile, [0])
+    np.testing.assert_array_equal(mask, [[False, True], [False, True]])
+    assert len(list(tmp_path.glob('shapefile_masks/*.npy'))) == 1
+
+    def compute(*args):
+        raise AssertionError("The mask should be read from the cache")
+
+    monkeypatch.setattr(esmvalcore.preprocessor._mask, '_compute_shp_mask',
+                        compute)
+    assert _get_shp_mask(lon, lat, shapefile, [0]) is mask
+    esmvalcore.preprocessor._mask._SHAPEFILE_MASKS.clear()
+    np.testing.assert_array_equal(_get_shp_mask(lon, lat, shapefile, [0]),
+                                  mask)
+
+
 if __name__ == '__main__':
     unittest.main()
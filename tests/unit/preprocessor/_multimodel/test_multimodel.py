@@ -2,6 +2,7 @@
 
 import unittest
 
+import dask.array as da
 import iris
 import numpy as np
 from cf_units import Unit
@@ -9,10 +10,9 @@ from cf_units import Unit
 import tests
 from esmvalcore.preprocessor import multi_model_statistics
 from esmvalcore.preprocessor._multimodel import (
+    _align_time,
     _assemble_data,
-    _compute_statistic,
-    _get_time_slice,
-    _plev_fix,
+    _compute_statistics,
     _put_in_cube,
     _unify_time_coordinates,
 )
@@ -84,13 +84,12 @@ class Test(tests.Test):
 
     def test_compute_statistic(self):
         """Test statistic."""
-        data = [self.cube1.data[0], self.cube2.data[0]]
-        stat_mean = _compute_statistic(data, "mean")
-        stat_median = _compute_statistic(data, "median")
+        data = np.ma.array([self.cube1.data[:1], self.cube2.data[:1]])
+        stats = _compute_statistics(data, ["mean", "median"])
         expected_mean = np.ma.ones((3, 2, 2))
         expected_median = np.ma.ones((3, 2, 2))
-        self.assert_array_equal(stat_mean, expected_mean)
-        self.assert_array_equal(stat_median, expected_median)
+        self.assert_array_equal(stats[0, 0], expected_mean)
+        self.assert_array_equal(stats[1, 0], expected_median)
 
     def test_compute_full_statistic_mon_cube(self):
         data = [self.cube1, self.cube2]
@@ -130,35 +129,81 @@ class Test(tests.Test):
 
     def test_compute_std(self):
         """Test statistic."""
-        data = [self.cube1.data[0], self.cube2.data[0] * 2]
-        stat = _compute_statistic(data, "std")
+        data = np.ma.array(
+            [self.cube1.data[:1], self.cube2.data[:1] * 2])
+        stat = _compute_statistics(data, ["std"])[0, 0]
         expected = np.ma.ones((3, 2, 2)) * 0.5
         expected[0, 0, 0] = 0
         self.assert_array_equal(stat, expected)
 
     def test_compute_max(self):
         """Test statistic."""
-        data = [self.cube1.data[0] * 0.5, self.cube2.data[0] * 2]
-        stat = _compute_statistic(data, "max")
+        data = np.ma.array(
+            [self.cube1.data[:1] * 0.5, self.cube2.data[:1] * 2])
+        stat = _compute_statistics(data, ["max"])[0, 0]
         expected = np.ma.ones((3, 2, 2)) * 2
         expected[0, 0, 0] = 0.5
         self.assert_array_equal(stat, expected)
 
     def test_compute_min(self):
         """Test statistic."""
-        data = [self.cube1.data[0] * 0.5, self.cube2.data[0] * 2]
-        stat = _compute_statistic(data, "min")
+        data = np.ma.array(
+            [self.cube1.data[:1] * 0.5, self.cube2.data[:1] * 2])
+        stat = _compute_statistics(data, ["min"])[0, 0]
         expected = np.ma.ones((3, 2, 2)) * 0.5
         self.assert_array_equal(stat, expected)
 
     def test_compute_percentile(self):
         """Test statistic."""
-        data = [self.cube1.data[0] * 0.5, self.cube2.data[0] * 2]
-        stat = _compute_statistic(data, "p75")
+        data = np.ma.array(
+            [self.cube1.data[:1] * 0.5, self.cube2.data[:1] * 2])
+        stat = _compute_statistics(data, ["p75"])[0, 0]
         expected = np.ma.ones((3, 2, 2)) * 1.625
         expected[0, 0, 0] = 0.5
         self.assert_array_equal(stat, expected)
 
+    def test_compute_statistics(self):
+        """Test computing several statistics at once."""
+        data = np.ma.array([self.cube1.data * 0.5, self.cube1.data * 2])
+        data[1, 0, 0] = np.ma.masked
+        stats = _compute_statistics(data, ['mean', 'max', 'p50'])
+        self.assertEqual(stats.shape, (3, 2, 3, 2, 2))
+        self.assertEqual(stats.dtype, np.float32)
+        expected_mean = np.ma.ones((2, 3, 2, 2)) * 1.25
+        expected_mean.mask = np.zeros((2, 3, 2, 2))
+        expected_mean.mask[0, 0] = True
+        self.assert_array_equal(stats[0], expected_mean)
+        self.assert_array_equal(stats[1], expected_mean * 1.6)
+        self.assert_array_equal(stats[2], expected_mean)
+
+    def test_compute_statistics_no_levels(self):
+        """Test that time points with only one valid dataset are masked."""
+        data = np.ma.ones((3, 2, 2, 2))
+        data.mask = np.zeros((3, 2, 2, 2))
+        data.mask[1:, 0] = True
+        stats = _compute_statistics(data, ['mean'])
+        expected = np.ma.ones((1, 2, 2, 2))
+        expected.mask = np.zeros((1, 2, 2, 2))
+        expected.mask[0, 0] = True
+        self.assert_array_equal(stats, expected)
+
+    def test_compute_statistic_unknown(self):
+        """Test that an unknown statistic raises an error."""
+        data = np.ma.array([self.cube1.data[:1], self.cube2.data[:1]])
+        with self.assertRaises(ValueError):
+            _compute_statistics(data, ['mode'])
+
+    def test_align_time(self):
+        """Test lazy alignment of cube data on a new time axis."""
+        new_times = np.array([14., 45., 73.])
+        result = _align_time(self.cube2, new_times)
+        self.assertTrue(isinstance(result, da.Array))
+        expected = np.ma.ones((3, 3, 2, 2))
+        expected.mask = np.zeros((3, 3, 2, 2))
+        expected.mask[0] = True
+        expected.mask[1, 0, 0, 0] = True
+        self.assert_array_equal(result.compute(), expected)
+
     def test_put_in_cube(self):
         """Test put in cube."""
         cube_data = np.ma.ones((2, 3, 2, 2))
@@ -167,27 +212,24 @@ class Test(tests.Test):
 
     def test_assemble_overlap_data(self):
         """Test overlap data."""
-        comp_ovlap_mean = _assemble_data([self.cube1, self.cube1],
-                                         "mean",
+        comp_ovlap_mean = _assemble_data([self.cube1, self.cube1], ["mean"],
                                          span='overlap')
         expected_ovlap_mean = np.ma.ones((2, 3, 2, 2))
-        self.assert_array_equal(comp_ovlap_mean.data, expected_ovlap_mean)
+        self.assert_array_equal(comp_ovlap_mean['mean'].data,
+                                expected_ovlap_mean)
 
     def test_assemble_full_data(self):
         """Test full data."""
-        comp_full_mean = _assemble_data([self.cube1, self.cube2],
-                                        "mean",
-                                        span='full')
+        comp_full_stats = _assemble_data([self.cube1, self.cube2],
+                                         ["mean", "min"],
+                                         span='full')
         expected_full_mean = np.ma.ones((5, 3, 2, 2))
         expected_full_mean.mask = np.ones((5, 3, 2, 2))
         expected_full_mean.mask[1] = False
-        self.assert_array_equal(comp_full_mean.data, expected_full_mean)
-
-    def test_plev_fix(self):
-        """Test plev fix."""
-        fixed_data = _plev_fix(self.cube2.data, 1)
-        expected_data = np.ma.ones((3, 2, 2))
-        self.assert_array_equal(expected_data, fixed_data)
+        self.assert_array_equal(comp_full_stats['mean'].data,
+                                expected_full_mean)
+        self.assert_array_equal(comp_full_stats['min'].data,
+                                expected_full_mean)
 
     def test_unify_time_coordinates(self):
         """Test set common calenar."""
@@ -204,22 +246,6 @@ class Test(tests.Test):
         _unify_time_coordinates([cube1, cube2])
         self.assertEqual(cube1.coord('time'), cube2.coord('time'))
 
-    def test_get_time_slice_all(self):
-        """Test get time slice if all cubes have data."""
-        cubes = [self.cube1, self.cube2]
-        result = _get_time_slice(cubes, time=45)
-        expected = [self.cube1[1].data, self.cube2[0].data]
-        self.assert_array_equal(expected, result)
-
-    def test_get_time_slice_part(self):
-        """Test get time slice if all cubes have data."""
-        cubes = [self.cube1, self.cube2]
-        result = _get_time_slice(cubes, time=14)
-        masked = np.ma.empty(list(cubes[0].shape[1:]))
-        masked.mask = True
-        expected = [self.cube1[0].data, masked]
-        self.assert_array_equal(expected, result)
-
 
 if __name__ == '__main__':
     unittest.main()
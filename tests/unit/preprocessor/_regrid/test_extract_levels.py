@@ -4,6 +4,7 @@ import os
 import unittest
 from unittest import mock
 
+import dask.array as da
 import iris
 import numpy as np
 from numpy import ma
@@ -71,84 +72,74 @@ class Test(tests.Test):
             with self.assertRaisesRegex(ValueError, emsg):
                 extract_levels(self.cube, levels, 'linear')
 
-    def test_interpolation(self):
-        new_data = np.array(True)
-        levels = np.array([0.5, 1.5])
-        scheme = 'linear'
-        with mock.patch(
-                'stratify.interpolate', return_value=new_data) as mocker:
-            result = extract_levels(self.cube, levels, scheme)
-            self.assertEqual(result, self.created_cube)
-            args, kwargs = mocker.call_args
-            # Check the stratify.interpolate args ...
-            self.assertEqual(len(args), 3)
-            self.assert_array_equal(args[0], levels)
-            pts = self.cube.coord(axis='z', dim_coords=True).points
-            src_levels_broadcast = np.broadcast_to(
-                pts.reshape(self.z, 1, 1), self.cube.shape)
-            self.assert_array_equal(args[1], src_levels_broadcast)
-            self.assert_array_equal(args[2], self.cube.data)
-            # Check the stratify.interpolate kwargs ...
-            self.assertEqual(
-                kwargs, dict(
-                    axis=0, interpolation=scheme, extrapolation='nan'))
+    def _check_stratify_call(self, mocker, cube, levels, scheme):
+        args, kwargs = mocker.call_args
+        # Check the stratify.interpolate args ...
+        self.assertEqual(len(args), 3)
+        self.assert_array_equal(args[0], levels)
+        pts = cube.coord(axis='z', dim_coords=True).points
+        # The 1d source levels are not broadcast, instead the vertical
+        # dimension is moved to the end
+        self.assert_array_equal(args[1], pts)
+        data = np.ma.filled(cube.data.astype(float), np.nan)
+        self.assert_array_equal(args[2], np.moveaxis(data, 0, -1))
+        # Check the stratify.interpolate kwargs ...
+        self.assertEqual(
+            kwargs, dict(axis=-1, interpolation=scheme, extrapolation='nan'))
+
+    def _check_create_cube_call(self, cube, new_data, levels):
         args, kwargs = self.mock_create_cube.call_args
         # Check the _create_cube args ...
         self.assertEqual(len(args), 4)
-        self.assertEqual(args[0], self.cube)
-        self.assert_array_equal(args[1], new_data)
+        self.assertEqual(args[0], cube)
+        self.assertTrue(isinstance(args[1], da.Array))
+        data = args[1].compute()
+        self.assertEqual(ma.isMaskedArray(data), ma.is_masked(new_data))
+        self.assert_array_equal(data, new_data)
         self.assert_array_equal(
             args[2], self.cube.coord(axis='z', dim_coords=True))
         self.assert_array_equal(args[3], levels)
         # Check the _create_cube kwargs ...
         self.assertEqual(kwargs, dict())
 
+    def test_interpolation(self):
+        new_data = np.arange(4.).reshape(2, 1, 2)
+        levels = np.array([0.5, 1.5])
+        scheme = 'linear'
+        with mock.patch(
+                'stratify.interpolate', return_value=new_data) as mocker:
+            result = extract_levels(self.cube, levels, scheme)
+            self.assertEqual(result, self.created_cube)
+            self._check_create_cube_call(self.cube, np.moveaxis(new_data, -1,
+                                                                0), levels)
+            self._check_stratify_call(mocker, self.cube, levels, scheme)
+
     def test_interpolation__extrapolated_nan_filling(self):
-        new_data = np.array([0, np.nan])
+        new_data = np.array([[[0., np.nan]], [[1., 2.]]])
         levels = [0.5, 1.5]
         scheme = 'nearest'
         with mock.patch(
                 'stratify.interpolate', return_value=new_data) as mocker:
             result = extract_levels(self.cube, levels, scheme)
             self.assertEqual(result, self.created_cube)
-            args, kwargs = mocker.call_args
-            # Check the stratify.interpolate args ...
-            self.assertEqual(len(args), 3)
-            self.assert_array_equal(args[0], levels)
-            pts = self.cube.coord(axis='z', dim_coords=True).points
-            src_levels_broadcast = np.broadcast_to(
-                pts.reshape(self.z, 1, 1), self.cube.shape)
-            self.assert_array_equal(args[1], src_levels_broadcast)
-            self.assert_array_equal(args[2], self.cube.data)
-            # Check the stratify.interpolate kwargs ...
+            expected = ma.masked_invalid(np.moveaxis(new_data, -1, 0))
+            self._check_create_cube_call(self.cube, expected, levels)
+            self._check_stratify_call(mocker, self.cube, levels, scheme)
             self.assertEqual(
-                kwargs, dict(
-                    axis=0, interpolation=scheme, extrapolation='nan'))
-        args, kwargs = self.mock_create_cube.call_args
-        # Check the _create_cube args ...
-        self.assertEqual(len(args), 4)
-        self.assert_array_equal(args[0], self.cube)
-        new_data[np.isnan(new_data)] = _MDI
-        new_data_mask = np.zeros(new_data.shape, bool)
-        new_data_mask[new_data == _MDI] = True
-        new_data = np.ma.array(new_data, mask=new_data_mask)
-        self.assert_array_equal(args[1], new_data)
-        self.assert_array_equal(
-            args[2], self.cube.coord(axis='z', dim_coords=True))
-        self.assert_array_equal(args[3], levels)
-        # Check the _create_cube kwargs ...
-        self.assertEqual(kwargs, dict())
+                self.mock_create_cube.call_args[0][1].compute().fill_value,
+                _MDI)
 
     def test_interpolation__masked(self):
         levels = np.array([0.5, 1.5])
         new_data = np.empty([len(levels)] + list(self.shape[1:]), dtype=float)
         new_data[:, 0, :] = np.nan
-        new_data_mask = np.isnan(new_data)
+        new_data = np.moveaxis(new_data, 0, -1)
         scheme = 'linear'
         mask = [[[False], [True]], [[True], [False]], [[False], [False]]]
         masked = ma.empty(self.shape)
         masked.mask = mask
         cube = _make_cube(masked, dtype=self.dtype)
+        expected = ma.masked_invalid(np.moveaxis(new_data, -1, 0))
         # save cube to test the lazy data interpolation too
         iris.save(cube, self.filename)
         with mock.patch(
@@ -157,43 +148,13 @@ class Test(tests.Test):
             loaded_cube = iris.load_cube(self.filename)
             result_from_lazy = extract_levels(loaded_cube, levels, scheme)
             self.assertEqual(result_from_lazy, self.created_cube)
+            self.assertTrue(loaded_cube.has_lazy_data())
+            self._check_create_cube_call(loaded_cube, expected, levels)
             # then test realized
             result = extract_levels(cube, levels, scheme)
             self.assertEqual(result, self.created_cube)
-            args, kwargs = mocker.call_args
-            # Check the stratify.interpolate args ...
-            self.assertEqual(len(args), 3)
-            self.assert_array_equal(args[0], levels)
-            pts = cube.coord(axis='z', dim_coords=True).points
-            src_levels_broadcast = np.broadcast_to(
-                pts.reshape(self.z, 1, 1), cube.shape)
-            self.assert_array_equal(args[1], src_levels_broadcast)
-            self.assert_array_equal(args[2], cube.data)
-            # Check the stratify.interpolate kwargs ...
-            self.assertEqual(
-                kwargs, dict(
-                    axis=0, interpolation=scheme, extrapolation='nan'))
-        args, kwargs = self.mock_create_cube.call_args
-        input_cube = args[0]
-        # in-place for new extract_levels with nan's
-        new_data[np.isnan(new_data)] = _MDI
-        # Check the _create_cube args ...
-        self.assertEqual(len(args), 4)
-        self.assertEqual(input_cube.metadata, cube.metadata)
-        self.assertEqual(input_cube.coords, cube.coords)
-        self.assertEqual(input_cube.coord_dims, cube.coord_dims)
-        self.assert_array_equal(args[0].data, cube.data)
-        new_data_mask = np.zeros(new_data.shape, bool)
-        new_data_mask[new_data == _MDI] = True
-        new_data = np.ma.array(new_data, mask=new_data_mask)
-        self.assert_array_equal(args[1], new_data)
-        self.assertTrue(ma.isMaskedArray(args[1]))
-        self.assert_array_equal(args[1].mask, new_data_mask)
-        self.assert_array_equal(
-            args[2], self.cube.coord(axis='z', dim_coords=True))
-        self.assert_array_equal(args[3], levels)
-        # Check the _create_cube kwargs ...
-        self.assertEqual(kwargs, dict())
+            self._check_create_cube_call(cube, expected, levels)
+            self._check_stratify_call(mocker, cube, levels, scheme)
 
 
 if __name__ == '__main__':
@@ -3,31 +3,41 @@ Unit tests for the :func:`esmvalcore.preprocessor.regrid.regrid` function.
 
 """
 
+import os
 import unittest
 from unittest import mock
 
 import iris
+import numpy as np
 
+import esmvalcore.preprocessor._regrid
 import tests
 from esmvalcore.preprocessor import regrid
-from esmvalcore.preprocessor._regrid import _CACHE, HORIZONTAL_SCHEMES
+from esmvalcore.preprocessor._regrid import (
+    _CACHE,
+    _GRID_FILES,
+    _REGRIDDERS,
+    HORIZONTAL_SCHEMES,
+    _get_regridder,
+    _load_target_grid,
+)
 
 
 class Test(tests.Test):
     def _check(self, tgt_grid, scheme, spec=False):
-        expected_scheme = HORIZONTAL_SCHEMES[scheme]
-
         if spec:
             spec = tgt_grid
-            self.assertIn(spec, _CACHE)
-            self.assertEqual(_CACHE[spec], self.tgt_grid)
-            self.coord_system.asset_called_once()
+            self.assertIn((spec, True, True), _CACHE)
+            self.assertEqual(_CACHE[(spec, True, True)], self.tgt_grid)
+            self.coord_system.assert_called_once()
             expected_calls = [
                 mock.call(axis='x', dim_coords=True),
                 mock.call(axis='y', dim_coords=True)
             ]
-            self.assertEqual(self.tgt_grid_coord.mock_calls, expected_calls)
-            self.regrid.assert_called_once_with(self.tgt_grid, expected_scheme)
+            self.assertEqual(self.tgt_grid_copy.coord.mock_calls,
+                             expected_calls)
+            self.get_regridder.assert_called_once_with(
+                self.src_cube, self.tgt_grid_copy, scheme)
         else:
             if scheme == 'unstructured_nearest':
                 expected_calls = [
@@ -37,7 +47,9 @@ class Test(tests.Test):
                 self.assertEqual(self.coords.mock_calls, expected_calls)
                 expected_calls = [mock.call(self.coord), mock.call(self.coord)]
                 self.assertEqual(self.remove_coord.mock_calls, expected_calls)
-            self.regrid.assert_called_once_with(tgt_grid, expected_scheme)
+            self.get_regridder.assert_called_once_with(
+                self.src_cube, tgt_grid, scheme)
+        self.regridder.assert_called_once_with(self.src_cube)
 
         # Reset the mocks to enable multiple calls per test-case.
         for mocker in self.mocks:
@@ -48,17 +60,18 @@ class Test(tests.Test):
         self.coord = mock.sentinel.coord
         self.coords = mock.Mock(return_value=[self.coord])
         self.remove_coord = mock.Mock()
-        self.regridded_cube = mock.sentinel.regridded_cube
-        self.regrid = mock.Mock(return_value=self.regridded_cube)
+        self.regridded_cube = mock.Mock(spec=iris.cube.Cube,
+                                        coords=mock.Mock(return_value=[]))
+        self.regridder = mock.Mock(return_value=self.regridded_cube)
         self.src_cube = mock.Mock(
             spec=iris.cube.Cube,
             coord_system=self.coord_system,
             coords=self.coords,
-            remove_coord=self.remove_coord,
-            regrid=self.regrid)
-        self.tgt_grid_coord = mock.Mock()
+            remove_coord=self.remove_coord)
+        self.tgt_grid_copy = mock.Mock(spec=iris.cube.Cube)
         self.tgt_grid = mock.Mock(
-            spec=iris.cube.Cube, coord=self.tgt_grid_coord)
+            spec=iris.cube.Cube,
+            copy=mock.Mock(return_value=self.tgt_grid_copy))
         self.regrid_schemes = [
             'linear', 'linear_extrapolate', 'nearest', 'area_weighted',
             'unstructured_nearest'
@@ -70,9 +83,13 @@ class Test(tests.Test):
         self.mock_stock = self.patch(
             'esmvalcore.preprocessor._regrid._stock_cube',
             side_effect=_return_mock_stock_cube)
+        self.get_regridder = self.patch(
+            'esmvalcore.preprocessor._regrid._get_regridder',
+            return_value=self.regridder)
         self.mocks = [
-            self.coord_system, self.coords, self.regrid, self.src_cube,
-            self.tgt_grid_coord, self.tgt_grid, self.mock_stock
+            self.coord_system, self.coords, self.regridder, self.src_cube,
+            self.tgt_grid_copy, self.tgt_grid, self.mock_stock,
+            self.get_regridder
         ]
 
     def test_invalid_tgt_grid__unknown(self):
@@ -110,10 +127,89 @@ class Test(tests.Test):
             result = regrid(self.src_cube, spec, scheme)
             self.assertEqual(result, self.regridded_cube)
             self._check(spec, scheme, spec=True)
-        self.assertEqual(set(_CACHE.keys()), set(specs))
+        self.assertEqual(set(_CACHE.keys()),
+                         {(spec, True, True) for spec in specs})
+
+        # The stock cubes are only created once
+        for spec in specs:
+            regrid(self.src_cube, spec, scheme)
+        self.mock_stock.assert_not_called()
 
         _CACHE.clear()
 
 
+def _create_cube(lat_offset=0.):
+    cube = iris.cube.Cube(np.arange(16.).reshape(4, 4), var_name='tas')
+    lat = iris.coords.DimCoord(np.arange(4.) * 40 - 60 + lat_offset,
+                               standard_name='latitude',
+                               units='degrees')
+    lon = iris.coords.DimCoord(np.arange(4.) * 90 + 45,
+                               standard_name='longitude',
+                               units='degrees')
+    for coord in (lat, lon):
+        coord.guess_bounds()
+    cube.add_dim_coord(lat, 0)
+    cube.add_dim_coord(lon, 1)
+    return cube
+
+
+def test_get_regridder_cached(monkeypatch):
+    monkeypatch.setattr(esmvalcore.preprocessor._regrid, '_REGRIDDERS',
+                        type(_REGRIDDERS)())
+    target = _create_cube(lat_offset=10.)
+    regridder = _get_regridder(_create_cube(), target, 'linear')
+    assert _get_regridder(_create_cube(), target.copy(),
+                          'linear') is regridder
+    assert _get_regridder(_create_cube(), target,
+                          'nearest') is not regridder
+    assert _get_regridder(_create_cube(lat_offset=5.), target,
+                          'linear') is not regridder
+
+    # The least recently used regridder is removed when the cache is full
+    monkeypatch.setattr(esmvalcore.preprocessor._regrid,
+                        '_MAX_CACHED_REGRIDDERS', 3)
+    _get_regridder(_create_cube(lat_offset=1.), target, 'linear')
+    assert _get_regridder(_create_cube(), target, 'linear') is not regridder
+
+
+def test_regrid_does_not_share_coords():
+    target = _create_cube(lat_offset=10.)
+    cube1 = regrid(_create_cube(), target, 'linear')
+    cube2 = regrid(_create_cube(), target, 'linear')
+    np.testing.assert_allclose(cube1.data, cube2.data, equal_nan=True)
+    cube1.coord('latitude').points = cube1.coord('latitude').points + 1.
+    assert cube2.coord('latitude') == target.coord('latitude')
+
+
+def test_load_target_grid_cached(monkeypatch, tmp_path):
+    monkeypatch.setattr(esmvalcore.preprocessor._regrid, '_GRID_FILES',
+                        type(_GRID_FILES)())
+    cache = esmvalcore.preprocessor._regrid._GRID_FILES
+    filename = str(tmp_path / 'grid.nc')
+    iris.save(_create_cube(), filename)
+    grid = _load_target_grid(filename)
+    assert _load_target_grid(filename) is grid
+
+    # A changed file replaces the grid loaded before
+    iris.save(_create_cube(lat_offset=10.), filename)
+    os.utime(filename, ns=(0, 0))
+    changed = _load_target_grid(filename)
+    assert changed is not grid
+    np.testing.assert_array_equal(
+        changed.coord('latitude').points,
+        _create_cube(lat_offset=10.).coord('latitude').points)
+    assert len(cache) == 1
+
+    # The least recently used grid is removed when the cache is full
+    monkeypatch.setattr(esmvalcore.preprocessor._regrid,
+                        '_MAX_CACHED_GRID_FILES', 2)
+    for i in range(2):
+        other = str(tmp_path / f'grid{i}.nc')
+        iris.save(_create_cube(), other)
+        _load_target_grid(other)
+    assert len(cache) == 2
+    assert os.path.realpath(filename) not in cache
+
+
 if __name__ == '__main__':
     unittest.main()
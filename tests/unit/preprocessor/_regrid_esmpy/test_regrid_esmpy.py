@@ -1,4 +1,5 @@
 """Unit tests for the esmvalcore.preprocessor._regrid_esmpy module."""
+import collections
 import sys
 from unittest import mock
 
@@ -7,11 +8,16 @@ import iris
 import numpy as np
 import pytest
 from iris.exceptions import CoordinateNotFoundError
+from scipy import sparse
 
 import tests
+from esmvalcore import _cache
+from esmvalcore.preprocessor import _regrid_esmpy
 from esmvalcore.preprocessor._regrid_esmpy import (
     build_regridder,
-    build_regridder_2d,
+    compute_weights,
+    compute_weights_2d,
+    compute_weights_3d,
     coords_iris_to_esmpy,
     cube_to_empty_field,
     get_grid,
@@ -464,37 +470,55 @@ class TestHelpers(tests.Test):
     @mock.patch('esmvalcore.preprocessor._regrid_esmpy.cube_to_empty_field',
                 mock_cube_to_empty_field)
     @mock.patch('ESMF.Regrid')
-    def test_build_regridder_2d_unmasked_data(self, mock_regrid):
-        """Test building of 2d regridder for unmasked data."""
+    def test_compute_weights_2d_unmasked_data(self, mock_regrid):
+        """Test computing 2d regridding weights for unmasked data."""
+        mock_regrid.return_value.get_weights_dict.return_value = {
+            'row_dst': np.array([1, 2, 2]),
+            'col_src': np.array([1, 1, 16]),
+            'weights': np.array([1., .5, .5]),
+        }
         self.cube.data = self.cube.data.data
         self.cube.field = mock.Mock()
-        mock.sentinel.dst_rep.field = mock.Mock()
-        build_regridder_2d(self.cube, mock.sentinel.dst_rep,
-                           mock.sentinel.regrid_method, .99)
+        dst_rep = mock.Mock(shape=(1, 2), field=mock.Mock())
+        weights, dst_mask = compute_weights_2d(self.cube, dst_rep,
+                                               mock.sentinel.regrid_method,
+                                               .99)
         expected_kwargs = {
             'src_mask_values': np.array([1]),
             'dst_mask_values': np.array([1]),
             'regrid_method': mock.sentinel.regrid_method,
             'srcfield': self.cube.field,
-            'dstfield': mock.sentinel.dst_rep.field,
+            'dstfield': dst_rep.field,
             'unmapped_action': mock.sentinel.ua_ignore,
             'ignore_degenerate': True,
+            'factors': True,
         }
         mock_regrid.assert_called_once_with(**expected_kwargs)
+        self.assertEqual(weights.shape, (2, 16))
+        expected_weights = np.zeros((2, 16))
+        expected_weights[0, 0] = 1.
+        expected_weights[1, (0, 15)] = .5
+        self.assert_array_equal(weights.toarray(), expected_weights)
+        self.assert_array_equal(dst_mask, np.zeros((1, 2), dtype=bool))
 
     @mock.patch('esmvalcore.preprocessor._regrid_esmpy.cube_to_empty_field',
                 mock_cube_to_empty_field)
     @mock.patch('ESMF.Regrid')
-    def test_build_regridder_2d_masked_data(self, mock_regrid):
-        """Test building of 2d regridder for masked data."""
+    def test_compute_weights_2d_masked_data(self, mock_regrid):
+        """Test computing 2d regridding weights for masked data."""
         mock_regrid.return_value = mock.Mock(return_value=mock.Mock(
             data=self.data.T))
+        mock_regrid.return_value.get_weights_dict.return_value = {
+            'row_dst': np.array([], dtype=int),
+            'col_src': np.array([], dtype=int),
+            'weights': np.array([]),
+        }
         regrid_method = mock.sentinel.rm_bilinear
-        src_rep = mock.MagicMock(data=self.data)
-        dst_rep = mock.MagicMock()
+        src_rep = mock.MagicMock(data=self.data, shape=self.data.shape)
+        dst_rep = mock.MagicMock(shape=self.data.shape)
         src_rep.field = mock.MagicMock(data=self.data.copy())
         dst_rep.field = mock.MagicMock()
-        build_regridder_2d(src_rep, dst_rep, regrid_method, .99)
+        _, dst_mask = compute_weights_2d(src_rep, dst_rep, regrid_method, .99)
         expected_calls = [
             mock.call(src_mask_values=np.array([]),
                       dst_mask_values=np.array([]),
@@ -509,7 +533,8 @@ class TestHelpers(tests.Test):
                       srcfield=src_rep.field,
                       dstfield=dst_rep.field,
                       unmapped_action=mock.sentinel.ua_ignore,
-                      ignore_degenerate=True),
+                      ignore_degenerate=True,
+                      factors=True),
         ]
         kwargs = mock_regrid.call_args_list[0][-1]
         expected_kwargs = expected_calls[0][-1]
@@ -521,60 +546,132 @@ class TestHelpers(tests.Test):
             else:
                 self.assertEqual(expected_kwargs[key], kwargs[key])
         self.assertTrue(mock_regrid.call_args_list[1] == expected_calls[1])
+        self.assert_array_equal(dst_mask, self.data < .99)
+
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.get_weights')
+    def test_regridder_unmasked_data(self, mock_get_weights):
+        """Test applying the regridding weights to unmasked data."""
+        weights = np.zeros((2, 16))
+        weights[0, 0] = 1.
+        weights[1, (0, 15)] = .5
+        dst_mask = np.zeros((1, 2), dtype=bool)
+        mock_get_weights.return_value = (sparse.csr_matrix(weights),
+                                         dst_mask)
+        src_rep = mock.Mock(data=self.data.data)
+        regridder = build_regridder(src_rep, mock.sentinel.dst_rep, 'linear')
+        mock_get_weights.assert_called_once_with(src_rep,
+                                                 mock.sentinel.dst_rep,
+                                                 'linear', .99)
+        src = self.data.data.astype(np.float32).reshape(1, 16)
+        result = regridder(src)
+        self.assertEqual(result.dtype, np.float32)
+        self.assert_array_equal(result, np.ma.masked_array([[0., 7.5]]))
+        self.assertFalse(np.ma.is_masked(result))
+
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.get_weights')
+    def test_regridder_masked_data(self, mock_get_weights):
+        """Test applying the regridding weights to masked data."""
+        weights = np.zeros((2, 16))
+        weights[0, 0] = 1.
+        weights[1, 15] = 1.
+        dst_mask = np.array([[True, False]])
+        mock_get_weights.return_value = (sparse.csr_matrix(weights),
+                                         dst_mask)
+        regridder = build_regridder(mock.Mock(data=self.data),
+                                    mock.sentinel.dst_rep, 'linear')
+        result = regridder(self.data.reshape(1, 16))
+        expected = np.ma.masked_array([[0., 15.]], mask=[[True, False]])
+        self.assert_array_equal(result, expected)
+        self.assert_array_equal(result.mask, expected.mask)
+
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.get_weights')
+    def test_regridder_varying_mask(self, mock_get_weights):
+        """Test applying the weights to slices with different masks."""
+        weights = np.zeros((3, 4))
+        weights[0, 0] = 1.
+        weights[1, (1, 2)] = .5
+        weights[2, (2, 3)] = (.996, .004)
+        mock_get_weights.return_value = (sparse.csr_matrix(weights),
+                                         np.zeros((3, ), dtype=bool))
+        regridder = build_regridder(mock.Mock(data=np.zeros(4)),
+                                    mock.sentinel.dst_rep, 'linear')
+        src = np.ma.masked_array(
+            [[1., 2., 4., 8.], [1., 2., 4., 8.]],
+            mask=[[False, False, False, False], [True, True, False, True]],
+        )
+        result = regridder(src)
+        expected = np.ma.masked_array(
+            [[1., 3., 4.016], [0., 0., 4.]],
+            mask=[[False, False, False], [True, True, False]],
+        )
+        np.testing.assert_allclose(result.filled(0.), expected.filled(0.))
+        self.assert_array_equal(result.mask, expected.mask)
+
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.get_weights')
+    def test_regridder_representant_mask(self, mock_get_weights):
+        """Test that the weights are not renormalized for the rep mask."""
+        # Conservative weights near a coast, where the first source point
+        # is land, and at the edge of the source grid
+        weights = np.zeros((3, 4))
+        weights[0, 1] = .995
+        weights[1, (1, 2)] = .5
+        weights[2, 3] = .5
+        mock_get_weights.return_value = (sparse.csr_matrix(weights),
+                                         np.array([False, False, True]))
+        src_rep = mock.Mock(data=np.ma.masked_array(
+            np.zeros(4), mask=[True, False, False, False]))
+        regridder = build_regridder(src_rep, mock.sentinel.dst_rep,
+                                    'area_weighted')
+        src = np.ma.masked_array(
+            [[1., 2., 4., 8.], [1., 2., 4., 8.]],
+            mask=[[True, False, False, False], [True, False, True, False]],
+        )
+        result = regridder(src)
+        expected = np.ma.masked_array(
+            [[1.99, 3., 0.], [1.99, 0., 0.]],
+            mask=[[False, False, True], [False, True, True]],
+        )
+        np.testing.assert_allclose(result.filled(0.), expected.filled(0.))
+        self.assert_array_equal(result.mask, expected.mask)
 
-    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.cube_to_empty_field',
-                mock_cube_to_empty_field)
-    @mock.patch('ESMF.Regrid')
-    def test_regridder_2d_unmasked_data(self, mock_regrid):
-        """Test regridder for unmasked 2d data."""
-        field_regridder = mock.Mock(return_value=mock.Mock(data=self.data.T))
-        mock_regrid.return_value = field_regridder
-        regrid_method = mock.sentinel.rm_bilinear
-        src_rep = mock.MagicMock(data=self.data, dtype=np.float32)
-        dst_rep = mock.MagicMock(shape=(4, 4))
-        regridder = build_regridder_2d(src_rep, dst_rep, regrid_method, .99)
-        field_regridder.reset_mock()
-        regridder(src_rep)
-        field_regridder.assert_called_once_with(src_rep.field, dst_rep.field)
-
-    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.cube_to_empty_field',
-                mock_cube_to_empty_field)
-    @mock.patch('ESMF.Regrid')
-    def test_regridder_2d_masked_data(self, mock_regrid):
-        """Test regridder for masked 2d data."""
-        field_regridder = mock.Mock(return_value=mock.Mock(data=self.data.T))
-        mock_regrid.return_value = field_regridder
-        regrid_method = mock.sentinel.rm_bilinear
-        src_rep = mock.MagicMock(data=self.data)
-        dst_rep = mock.MagicMock(shape=(4, 4))
-        regridder = build_regridder_2d(src_rep, dst_rep, regrid_method, .99)
-        field_regridder.reset_mock()
-        regridder(self.cube)
-        field_regridder.assert_called_once_with(src_rep.field, dst_rep.field)
-
-    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.build_regridder_3d')
-    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.build_regridder_2d')
-    def test_build_regridder_2(self, mock_regridder_2d, mock_regridder_3d):
-        """Test build regridder for 2d data."""
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.compute_weights_3d')
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.compute_weights_2d')
+    def test_compute_weights_2(self, mock_weights_2d, mock_weights_3d):
+        """Test computing weights for 2d data."""
         # pylint: disable=no-self-use
         src_rep = mock.Mock(ndim=2)
         dst_rep = mock.Mock(ndim=2)
-        build_regridder(src_rep, dst_rep, 'nearest')
-        mock_regridder_2d.assert_called_once_with(
+        compute_weights(src_rep, dst_rep, 'nearest')
+        mock_weights_2d.assert_called_once_with(
             src_rep, dst_rep, mock.sentinel.rm_nearest_stod, .99)
-        mock_regridder_3d.assert_not_called()
+        mock_weights_3d.assert_not_called()
 
-    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.build_regridder_3d')
-    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.build_regridder_2d')
-    def test_build_regridder_3(self, mock_regridder_2d, mock_regridder_3d):
-        """Test build regridder for 3d data."""
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.compute_weights_3d')
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.compute_weights_2d')
+    def test_compute_weights_3(self, mock_weights_2d, mock_weights_3d):
+        """Test computing weights for 3d data."""
         # pylint: disable=no-self-use
         src_rep = mock.Mock(ndim=3)
         dst_rep = mock.Mock(ndim=3)
-        build_regridder(src_rep, dst_rep, 'nearest')
-        mock_regridder_3d.assert_called_once_with(
+        compute_weights(src_rep, dst_rep, 'nearest')
+        mock_weights_3d.assert_called_once_with(
             src_rep, dst_rep, mock.sentinel.rm_nearest_stod, .99)
-        mock_regridder_2d.assert_not_called()
+        mock_weights_2d.assert_not_called()
+
+    @mock.patch('esmvalcore.preprocessor._regrid_esmpy.compute_weights_2d')
+    def test_compute_weights_3d(self, mock_weights_2d):
+        """Test that the weights of all levels are combined."""
+        mock_weights_2d.side_effect = [
+            (sparse.csr_matrix(np.array([[1., 0.]])), np.array([[False]])),
+            (sparse.csr_matrix(np.array([[0., 1.]])), np.array([[True]])),
+        ]
+        src_rep = mock.MagicMock(shape=(2, 1, 2))
+        dst_rep = mock.MagicMock(shape=(2, 1, 1))
+        weights, dst_mask = compute_weights_3d(src_rep, dst_rep,
+                                               mock.sentinel.rm_bilinear, .99)
+        expected = np.array([[1., 0., 0., 0.], [0., 0., 0., 1.]])
+        self.assert_array_equal(weights.toarray(), expected)
+        self.assert_array_equal(dst_mask, [[[False]], [[True]]])
 
     @mock.patch('esmvalcore.preprocessor._regrid_esmpy.get_representant')
     def test_get_grid_representant_2d(self, mock_get_representant):
@@ -674,3 +771,67 @@ class TestHelpers(tests.Test):
         mock_map_slices.assert_called_once_with(self.cube_3d,
                                                 mock.sentinel.regridder,
                                                 self.cube_3d, self.cube)
+
+
+def _create_grid_cube(n_lat, n_lon, mask=False):
+    lat = iris.coords.DimCoord(np.linspace(-60., 60., n_lat),
+                               standard_name='latitude',
+                               units='degrees')
+    lon = iris.coords.DimCoord(np.linspace(0., 300., n_lon),
+                               standard_name='longitude',
+                               units='degrees')
+    data = np.ma.masked_array(np.zeros((n_lat, n_lon)), mask=mask)
+    return iris.cube.Cube(data, dim_coords_and_dims=[(lat, 0), (lon, 1)])
+
+
+@mock.patch('esmvalcore.preprocessor._regrid_esmpy.compute_weights')
+def test_get_weights_cached(mock_compute_weights, tmp_path, monkeypatch):
+    """Test that regridding weights are cached in memory and on disk."""
+    monkeypatch.setattr(_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(_regrid_esmpy, '_WEIGHTS', collections.OrderedDict())
+    weights = sparse.csr_matrix(np.eye(6, 12))
+    dst_mask = np.zeros((2, 3), dtype=bool)
+    mock_compute_weights.return_value = (weights, dst_mask)
+    src_rep = _create_grid_cube(3, 4)
+    dst_rep = _create_grid_cube(2, 3)
+
+    result = _regrid_esmpy.get_weights(src_rep, dst_rep, 'linear')
+    assert result == (weights, dst_mask)
+    assert len(list(tmp_path.glob('regrid_weights/*.npz'))) == 1
+    assert _regrid_esmpy.get_weights(src_rep, dst_rep, 'linear') is result
+    mock_compute_weights.assert_called_once_with(src_rep, dst_rep, 'linear',
+                                                 .99)
+
+    # Weights are read from disk in a new process
+    _regrid_esmpy._WEIGHTS.clear()
+    cached_weights, cached_mask = _regrid_esmpy.get_weights(
+        src_rep, dst_rep, 'linear')
+    assert mock_compute_weights.call_count == 1
+    np.testing.assert_array_equal(cached_weights.toarray(),
+                                  weights.toarray())
+    np.testing.assert_array_equal(cached_mask, dst_mask)
+
+    # Different method, grid or mask need new weights
+    _regrid_esmpy.get_weights(src_rep, dst_rep, 'nearest')
+    _regrid_esmpy.get_weights(_create_grid_cube(3, 5), dst_rep, 'linear')
+    masked_src_rep = _create_grid_cube(3, 4, mask=np.eye(3, 4, dtype=bool))
+    _regrid_esmpy.get_weights(masked_src_rep, dst_rep, 'linear')
+    assert mock_compute_weights.call_count == 4
+    assert len(list(tmp_path.glob('regrid_weights/*.npz'))) == 4
+
+
+@mock.patch('esmvalcore.preprocessor._regrid_esmpy.compute_weights')
+def test_get_weights_cache_disabled(mock_compute_weights, monkeypatch):
+    """Test that regridding weights are only cached in memory by default."""
+    monkeypatch.setattr(_cache, 'CACHE_DIR', None)
+    monkeypatch.setattr(_regrid_esmpy, '_WEIGHTS', collections.OrderedDict())
+    mock_compute_weights.return_value = (sparse.csr_matrix(np.eye(6, 12)),
+                                         np.zeros((2, 3), dtype=bool))
+    src_rep = _create_grid_cube(3, 4)
+    dst_rep = _create_grid_cube(2, 3)
+
+    result = _regrid_esmpy.get_weights(src_rep, dst_rep, 'linear')
+    assert _regrid_esmpy.get_weights(src_rep, dst_rep, 'linear') is result
+    _regrid_esmpy._WEIGHTS.clear()
+    _regrid_esmpy.get_weights(src_rep, dst_rep, 'linear')
+    assert mock_compute_weights.call_count == 2
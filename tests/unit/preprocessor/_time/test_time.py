@@ -3,6 +3,7 @@
 import copy
 import unittest
 
+import dask.array as da
 import iris
 import iris.coord_categorisation
 import iris.coords
@@ -13,6 +14,7 @@ from iris.cube import Cube
 from numpy.testing import assert_array_almost_equal, assert_array_equal
 
 import tests
+from esmvalcore.preprocessor import _time
 from esmvalcore.preprocessor._time import (
     annual_statistics,
     anomalies,
@@ -25,6 +27,7 @@ from esmvalcore.preprocessor._time import (
     extract_time,
     get_time_weights,
     hourly_statistics,
+    low_pass_weights,
     monthly_statistics,
     regrid_time,
     resample_hours,
@@ -32,6 +35,7 @@ from esmvalcore.preprocessor._time import (
     seasonal_statistics,
     timeseries_filter,
 )
+from esmvalcore.preprocessor._shared import get_iris_analysis_operation
 
 
 def _create_sample_cube():
@@ -238,6 +242,22 @@ class TestExtractSeason(tests.Test):
         assert_array_equal(np.array([1, 2, 1, 2]),
                            sliced.coord('month_number').points)
 
+    def test_season_coords(self):
+        """Test that the season coordinates are the same as from iris."""
+        sliced = extract_season(self.cube, 'JJAS')
+        expected = self.cube.copy()
+        expected.remove_coord('clim_season')
+        expected.remove_coord('season_year')
+        seasons = ['JJAS', 'ONDJFMAM']
+        iris.coord_categorisation.add_season(expected, 'time',
+                                             name='clim_season',
+                                             seasons=seasons)
+        iris.coord_categorisation.add_season_year(expected, 'time',
+                                                  name='season_year',
+                                                  seasons=seasons)
+        assert self.cube == expected
+        assert sliced == expected[[5, 6, 7, 8, 17, 18, 19, 20]]
+
 
 class TestClimatology(tests.Test):
     """Test class for :func:`esmvalcore.preprocessor._time.climatology`"""
@@ -1008,6 +1028,31 @@ class TestTimeseriesFilter(tests.Test):
         assert_array_almost_equal(filtered_cube.data, expected_data)
         assert len(filtered_cube.coord('time').points) == 18
 
+    def test_timeseries_filter_lazy(self):
+        """Test timeseries_filter on chunked, masked data against iris."""
+        data = np.ma.masked_array(np.arange(1., 25.), mask=False)
+        data[3:12] = np.ma.masked
+        self.cube.data = da.from_array(data, chunks=4)
+        weights = low_pass_weights(7, 1. / 14)
+        for filter_stats in ('sum', 'mean'):
+            filtered_cube = timeseries_filter(self.cube,
+                                              7,
+                                              14,
+                                              filter_type='lowpass',
+                                              filter_stats=filter_stats)
+            assert filtered_cube.has_lazy_data()
+            expected = self.cube.copy().rolling_window(
+                'time',
+                get_iris_analysis_operation(filter_stats),
+                len(weights),
+                weights=weights,
+            )
+            assert filtered_cube.coords() == expected.coords()
+            assert filtered_cube.metadata == expected.metadata
+            assert_array_almost_equal(filtered_cube.data, expected.data)
+            self.assert_array_equal(filtered_cube.data.mask,
+                                    expected.data.mask)
+
     def test_timeseries_filter_timecoord(self):
         """Test missing time axis."""
         import iris.exceptions
@@ -1264,6 +1309,42 @@ def test_anomalies_custom_season():
     assert_array_equal(result.coord('time').points, cube.coord('time').points)
 
 
+def test_standardized_anomalies_month():
+    cube = make_map_data(number_years=2)
+    result = anomalies(cube, 'month', standardize=True)
+    data = cube.data.reshape(2, 12, 30, 2, 2)
+    expected = data - data.mean(axis=(0, 2), keepdims=True)
+    expected /= expected.std(axis=(0, 2), keepdims=True, ddof=1)
+    expected = np.ma.masked_invalid(expected.reshape(720, 2, 2))
+    assert_array_almost_equal(result.data, expected)
+    assert result.units == '1'
+    assert not result.coords('month_number')
+
+
+def test_anomalies_lazy():
+    cube = make_map_data(number_years=2)
+    cube.data = cube.lazy_data().rechunk((30, 2, 2))
+    result = anomalies(cube, 'day')
+    assert result.has_lazy_data()
+    expected = np.concatenate((np.ones(360) * -180, np.ones(360) * 180))
+    assert_array_equal(result.data, expected[:, None, None] * [[0, 1],
+                                                               [1, 0]])
+
+
+def test_anomalies_missing_reference_period():
+    cube = make_map_data(number_years=2)
+    reference = {
+        'start_year': 1950,
+        'start_month': 1,
+        'start_day': 1,
+        'end_year': 1950,
+        'end_month': 7,
+        'end_day': 1,
+    }
+    with pytest.raises(ValueError, match='No data for month_number 7'):
+        anomalies(cube, 'month', reference)
+
+
 def get_0d_time():
     """Get 0D time coordinate."""
     time = iris.coords.AuxCoord(15.0,
@@ -1540,5 +1621,31 @@ class TestResampleTime(tests.Test):
         assert_array_equal(result.data, expected)
 
 
+def test_get_time_index_cached(monkeypatch):
+    """Test that the decoded time coordinate is reused."""
+    monkeypatch.setattr(_time, '_TIME_INDICES', _time.OrderedDict())
+    cube = _create_sample_cube()
+    index = _time._get_time_index(cube)
+    assert_array_equal(index['year'], np.repeat([1950, 1951], 12))
+    assert_array_equal(index['month'], np.tile(np.arange(1, 13), 2))
+    assert not index['month'].flags.writeable
+    assert _time._get_time_index(cube.copy()) is index
+    assert _time._get_time_index(cube[1:]) is not index
+    assert len(_time._TIME_INDICES) == 2
+
+
+def test_select_time_points():
+    """Test that selecting time points works like extract."""
+    cube = _create_sample_cube()
+    assert _time._select_time_points(cube, np.zeros(24, dtype=bool)) is None
+    select = np.zeros(24, dtype=bool)
+    select[3] = True
+    result = _time._select_time_points(cube, select)
+    assert result == cube[3]
+    assert result.ndim == 0
+    select[[5, 6]] = True
+    assert _time._select_time_points(cube, select) == cube[[3, 5, 6]]
+
+
 if __name__ == '__main__':
     unittest.main()
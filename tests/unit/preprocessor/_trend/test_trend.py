@@ -369,3 +369,22 @@ def test_linear_trend_stderr_longitude(cube_3_time):
     assert cube_stderr.units == 'kg m-1'
     assert (iris.coords.CellMethod('trend_stderr', coords=('longitude',)) in
             cube_stderr.cell_methods)
+
+
+def test_linear_trend_masked_lazy():
+    """Test lazy calculation of trend and stderr with masked values."""
+    cube = get_cube(times=[0.0, 1.0, 2.0, 3.0, 4.0])
+    data = np.ma.masked_array(
+        [1.0, 2.0, 0.0, 5.0, 6.0, 1.0, 2.0, 3.0, 4.0, 5.0],
+        mask=[0, 0, 1, 0, 0, 1, 1, 1, 1, 0],
+    )
+    cube = cube[:, 0, :]
+    cube.data = da.from_array(data.reshape(2, 5).T, chunks=2)
+    cube_trend = linear_trend(cube)
+    cube_stderr = linear_trend_stderr(cube)
+    assert cube_trend.has_lazy_data()
+    assert cube_stderr.has_lazy_data()
+    assert_masked_array_equal(cube_trend.data,
+                              np.ma.masked_invalid([1.3, np.nan]))
+    assert_masked_array_equal(cube_stderr.data,
+                              np.ma.masked_invalid([np.sqrt(0.005), np.nan]))
@@ -1,13 +1,18 @@
 """Unit test for :func:`esmvalcore.preprocessor._volume`."""
 
+import os
+import shutil
+import tempfile
 import unittest
 
+import dask.array as da
 import iris
 import numpy as np
 from cf_units import Unit
 
 import tests
 from esmvalcore.preprocessor._volume import (volume_statistics,
+                                             calculate_volume,
                                              depth_integration,
                                              extract_trajectory,
                                              extract_transect, extract_volume)
@@ -76,6 +81,9 @@ class Test(tests.Test):
         iris.util.guess_coord_axis(self.grid_4d.coord('zcoord'))
         iris.util.guess_coord_axis(self.grid_4d_2.coord('zcoord'))
 
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
     def test_extract_volume(self):
         """Test to extract the top two layers of a 3 layer depth column."""
         result = extract_volume(self.grid_3d, 0., 10.)
@@ -120,6 +128,67 @@ class Test(tests.Test):
         expected = np.ma.array([1., 1], mask=[True, False])
         self.assert_array_equal(result.data, expected)
 
+    def test_volume_statistics_weighted(self):
+        """Test the volume weighted mean, sum and rms of lazy data."""
+        data = np.ma.arange(1., 25.).reshape(2, 3, 2, 2)
+        data[0, 1, 0, 0] = np.ma.masked
+        cube = self.grid_4d.copy(da.from_array(data, chunks=(1, 3, 2, 2)))
+        volume = calculate_volume(cube)
+        weights = np.ma.masked_array(np.broadcast_to(volume, data.shape),
+                                     mask=data.mask)
+        for operator in ('mean', 'sum', 'rms'):
+            result = volume_statistics(cube, operator)
+            self.assertTrue(result.has_lazy_data())
+            self.assertEqual(result.shape, (2, ))
+            self.assertEqual(result.coord('time'), cube.coord('time'))
+            self.assertEqual(result.cell_methods[-1].coord_names,
+                             ('zcoord', 'longitude', 'latitude'))
+            self.assertEqual(result.coord('zcoord').shape, (1, ))
+            sum_weights = weights.sum(axis=(1, 2, 3))
+            if operator == 'rms':
+                expected = np.sqrt((data**2 * weights).sum(axis=(1, 2, 3)) /
+                                   sum_weights)
+            else:
+                expected = (data * weights).sum(axis=(1, 2, 3))
+            if operator == 'mean':
+                expected = expected / sum_weights
+            np.testing.assert_allclose(result.data, expected)
+
+    def test_volume_statistics_unweighted(self):
+        """Test volume statistics that are not weighted."""
+        data = np.ma.arange(1., 13.).reshape(3, 2, 2)
+        data[-1] = np.ma.masked
+        cube = self.grid_3d.copy(data)
+        self.assertEqual(volume_statistics(cube, 'max').data, 8.)
+        self.assertEqual(volume_statistics(cube, 'min').data, 1.)
+
+    def test_volume_statistics_invalid_operator(self):
+        """Test that an invalid operator raises an error."""
+        with self.assertRaises(ValueError):
+            volume_statistics(self.grid_4d, 'wibble')
+
+    def test_volume_statistics_wrong_shape(self):
+        """Test that a grid volume with the wrong shape raises an error."""
+        fx_cube = self.grid_3d[:2]
+        fx_file = os.path.join(self.temp_dir, 'volcello.nc')
+        iris.save(fx_cube, fx_file)
+        with self.assertRaises(ValueError):
+            volume_statistics(self.grid_4d, 'mean', {'volcello': fx_file})
+
+    def test_volume_statistics_last_fx_file(self):
+        """Test that the grid volume is read from the last fx file."""
+        fx_files = {}
+        for name, factor in (('volcello', 1.), ('areacello', 2.)):
+            fx_cube = self.grid_4d[0].copy(np.ones((3, 2, 2)) * factor)
+            fx_files[name] = os.path.join(self.temp_dir, f'{name}.nc')
+            iris.save(fx_cube, fx_files[name])
+        fx_files['sftlf'] = None
+        data = np.ma.arange(1., 25.).reshape(2, 3, 2, 2)
+        cube = self.grid_4d.copy(data)
+        result = volume_statistics(cube, 'sum', fx_files)
+        expected = 2. * data.sum(axis=(1, 2, 3))
+        self.assert_array_equal(result.data, expected)
+
     def test_depth_integration_1d(self):
         """Test to take the depth integration of a 3 layer cube."""
         result = depth_integration(self.grid_3d[:, 0, 0])
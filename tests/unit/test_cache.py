@@ -0,0 +1,52 @@
+"""Tests for :mod:`esmvalcore._cache`."""
+import os
+
+import pytest
+
+from esmvalcore import _cache
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    """Use a temporary cache directory."""
+    path = tmp_path / 'cache'
+    path.mkdir()
+    monkeypatch.setattr(_cache, 'CACHE_DIR', str(path))
+    monkeypatch.setattr(_cache, 'MAX_CACHE_SIZE', None)
+    return path
+
+
+def test_get_cache_path(cache_dir):
+    path = _cache.get_cache_path('sub', 'file.npy')
+    assert path == os.path.join(str(cache_dir), 'sub', 'file.npy')
+
+
+def test_get_cache_path_disabled(monkeypatch):
+    monkeypatch.setattr(_cache, 'CACHE_DIR', None)
+    assert _cache.get_cache_path('file.npy') is None
+
+
+def test_prune(monkeypatch, cache_dir):
+    (cache_dir / 'sub').mkdir()
+    files = [
+        cache_dir / 'time_ranges.sqlite',
+        cache_dir / 'sub' / 'a.npy',
+        cache_dir / 'sub' / 'b.npy',
+        cache_dir / 'c.npy',
+    ]
+    for i, path in enumerate(files):
+        path.write_bytes(b'x' * 1024)
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+    _cache.touch(files[1])
+
+    monkeypatch.setattr(_cache, 'MAX_CACHE_SIZE', 2.5 * 1024 / 2**30)
+    _cache.prune()
+
+    assert [p.exists() for p in files] == [True, True, False, False]
+
+
+def test_prune_no_limit(cache_dir):
+    path = cache_dir / 'a.npy'
+    path.write_bytes(b'x')
+    _cache.prune()
+    assert path.exists()
@@ -1,8 +1,10 @@
 """Tests for :mod:`esmvalcore.iris_helpers`."""
 import iris
+import numpy as np
 import pytest
+from cf_units import Unit
 
-from esmvalcore.iris_helpers import var_name_constraint
+from esmvalcore.iris_helpers import date_components, var_name_constraint
 
 
 @pytest.fixture
@@ -35,3 +37,65 @@ def test_var_name_constraint(cubes):
         cubes.extract_cube(var_name_constraint('b'))
     out_cube = cubes.extract_cube(var_name_constraint('c'))
     assert out_cube == iris.cube.Cube(0.0, var_name='c', long_name='d')
+
+
+@pytest.mark.parametrize('calendar', [
+    '360_day',
+    '365_day',
+    'noleap',
+    '366_day',
+    'all_leap',
+    'gregorian',
+    'standard',
+    'proleptic_gregorian',
+])
+@pytest.mark.parametrize('units, per_day', [
+    ('days since 1850-01-01', 1),
+    ('hours since 2000-03-01 12:30:00', 24),
+    ('seconds since 1000-01-01', 86400),
+])
+def test_date_components(calendar, units, per_day):
+    """Test that the dates are decoded like cftime does."""
+    units = Unit(units, calendar=calendar)
+    hourly = np.arange(-48., 48.) / 24.
+    days = np.concatenate([
+        np.random.default_rng(0).uniform(-1000., 100000., 200),
+        hourly,
+        hourly - 1e-12,
+        hourly + 1e-12,
+    ])
+    points = (days * per_day).reshape(2, -1)
+
+    components = date_components(units, points)
+    assert components.shape == points.shape + (5, )
+    dates = units.num2date(points, only_use_cftime_datetimes=True)
+    for i, name in enumerate(['year', 'month', 'day', 'hour', 'dayofyr']):
+        np.testing.assert_array_equal(
+            components[..., i],
+            [[getattr(date, name) for date in row] for row in dates])
+
+
+def test_date_components_standard(monkeypatch):
+    """Test the standard calendar across a leap year and month boundaries."""
+    units = Unit('hours since 2000-02-28 22:30:00', calendar='standard')
+    points = np.arange(0., 2 * 366 * 24, 0.5)
+
+    num2date = Unit.num2date
+    sizes = []
+
+    def count_num2date(self, time_value, *args, **kwargs):
+        sizes.append(np.size(time_value))
+        return num2date(self, time_value, *args, **kwargs)
+
+    monkeypatch.setattr(Unit, 'num2date', count_num2date)
+    components = date_components(units, points)
+    # Only the reference date is decoded with cftime
+    assert sizes == [1]
+    monkeypatch.undo()
+
+    dates = units.num2date(points, only_use_cftime_datetimes=True)
+    expected = [[date.year, date.month, date.day, date.hour, date.dayofyr]
+                for date in dates]
+    np.testing.assert_array_equal(components, expected)
+    assert [2000, 2, 29, 0, 60] in components.tolist()
+    assert [2001, 3, 1, 0, 60] in components.tolist()